@@ -747,7 +747,10 @@ class VncApi(object):
 
     def resource_list(self, obj_type, parent_id=None, parent_fq_name=None,
                       back_ref_id=None, obj_uuids=None, fields=None,
-                      detail=False, count=False, filters=None):
+                      detail=False, count=False, filters=None,
+                      page_limit=None):
+        # with page_limit, the list is fetched from the server page_limit
+        # entries at a time and returned as a whole
         if not obj_type:
             raise ResourceTypeUnknownError(obj_type)
 
@@ -795,29 +798,46 @@ class VncApi(object):
             query_params['filters'] = ','.join(
                 '%s==%s' %(k,json.dumps(v)) for k,v in filters.items())
 
-        if do_post_for_list:
-            uri = self._action_uri.get('list-bulk-collection')
-            if not uri:
-                raise
-
-            # use same keys as in GET with additional 'type'
-            query_params['type'] = obj_type
-            json_body = json.dumps(query_params)
-            content = self._request_server(rest.OP_POST,
-                                           uri, json_body)
-        else: # GET /<collection>
-            try:
+        if page_limit and not count:
+            query_params['page_limit'] = page_limit
+
+        def _list_request(query_params):
+            if do_post_for_list:
+                uri = self._action_uri.get('list-bulk-collection')
+                if not uri:
+                    raise
+
+                # use same keys as in GET with additional 'type'
+                query_params['type'] = obj_type
+                json_body = json.dumps(query_params)
+                content = self._request_server(rest.OP_POST,
+                                               uri, json_body)
+            else: # GET /<collection>
                 content = self._request_server(rest.OP_GET,
                                obj_class.create_uri,
                                data = query_params)
-            except NoIdError:
-                # dont allow NoIdError propagate to user
-                return []
+            return json.loads(content)
+
+        try:
+            list_result = _list_request(query_params)
+            # follow page markers, server without pagination sends none
+            while list_result.get('marker'):
+                query_params['page_marker'] = list_result.pop('marker')
+                page_result = _list_request(query_params)
+                list_result['%ss' %(obj_type)].extend(
+                    page_result['%ss' %(obj_type)])
+                list_result['marker'] = page_result.get('marker')
+            list_result.pop('marker', None)
+        except NoIdError:
+            # dont allow NoIdError propagate to user
+            if do_post_for_list:
+                raise
+            return []
 
         if not detail:
-            return json.loads(content)
+            return list_result
 
-        resource_dicts = json.loads(content)['%ss' %(obj_type)]
+        resource_dicts = list_result['%ss' %(obj_type)]
         resource_objs = []
         for resource_dict in resource_dicts:
             obj_dict = resource_dict['%s' %(obj_type)]
@@ -829,6 +849,48 @@ class VncApi(object):
         return resource_objs
     #end resource_list
 
+    def bulk(self, operations):
+        """Create, update and delete objects in one request.
+
+        operations is a list of (oper, obj) with oper one of 'CREATE',
+        'UPDATE' or 'DELETE', applied by api-server in order. Objects
+        created get their uuid set. Returns the per operation results.
+        """
+        ops = []
+        for oper, obj in operations:
+            res_type = obj.get_type()
+            op = {'oper': oper, 'type': res_type}
+            if oper != 'CREATE':
+                if not obj.uuid:
+                    obj.uuid = self.fq_name_to_id(res_type,
+                                                  obj.get_fq_name())
+                op['uuid'] = obj.uuid
+            if oper != 'DELETE':
+                # refs go along with the rest of the object
+                obj._pending_field_updates |= obj._pending_ref_updates
+                obj._pending_ref_updates = set([])
+                op['data'] = obj
+            ops.append(op)
+
+        json_body = json.dumps({'operations': ops},
+                               default=self._obj_serializer)
+        uri = self._action_uri['bulk']
+        content = self._request_server(rest.OP_POST, uri, data=json_body)
+
+        results = json.loads(content)['results']
+        for (oper, obj), result in zip(operations, results):
+            obj_dict = result[obj.get_type()]
+            if oper == 'CREATE':
+                obj.uuid = obj_dict['uuid']
+                if 'parent_uuid' in obj_dict:
+                    obj.parent_uuid = obj_dict['parent_uuid']
+                obj.set_server_conn(self)
+            elif oper == 'UPDATE':
+                obj.clear_pending_updates()
+
+        return results
+    #end bulk
+
     def set_auth_token(self, token):
         """Park user token for forwarding to API server for RBAC."""
         self._headers['X-AUTH-TOKEN'] = token
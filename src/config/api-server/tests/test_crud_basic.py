@@ -24,6 +24,7 @@ import json
 import copy
 from lxml import etree
 import inspect
+import tempfile
 import pycassa
 import kombu
 import requests
@@ -37,6 +38,7 @@ from vnc_api.gen.resource_test import *
 import cfgm_common
 from cfgm_common import vnc_plugin_base
 from cfgm_common import imid
+from cfgm_common.vnc_cassandra import VncCassandraClient
 
 sys.path.append('../common/tests')
 from test_utils import *
@@ -1540,8 +1542,369 @@ class TestVncCfgApiServer(test_case.ApiServerTestCase):
         delete_vn_and_policies()
     # end test_delete_after_unref
 
+    def test_read_back_refs_bulk_fq_name_lookup(self):
+        vn_obj = VirtualNetwork('%s-vn' %(self.id()))
+        self._vnc_lib.virtual_network_create(vn_obj)
+        port_uuids = []
+        for i in range(10):
+            port_obj = VirtualMachineInterface(
+                '%s-port-%s' %(self.id(), i), parent_obj=Project())
+            port_obj.add_virtual_network(vn_obj)
+            port_uuids.append(
+                self._vnc_lib.virtual_machine_interface_create(port_obj))
+
+        db_client = self._api_server._db_conn._cassandra_db
+        for port_uuid in port_uuids:
+            db_client.cache_uuid_to_fq_name_del(port_uuid)
+
+        obj_uuid_cf = db_client._obj_uuid_cf
+        orig_get = obj_uuid_cf.get
+        orig_multiget = obj_uuid_cf.multiget
+        fq_name_reads = []
+        def counting_get(key, columns=None, *args, **kwargs):
+            if columns == ['fq_name', 'type']:
+                fq_name_reads.append([key])
+            return orig_get(key, columns, *args, **kwargs)
+        def counting_multiget(keys, columns=None, *args, **kwargs):
+            if columns == ['fq_name', 'type']:
+                fq_name_reads.append(list(keys))
+            return orig_multiget(keys, columns, *args, **kwargs)
+
+        obj_uuid_cf.get = counting_get
+        obj_uuid_cf.multiget = counting_multiget
+        try:
+            ret_vn = self._vnc_lib.virtual_network_read(id=vn_obj.uuid)
+        finally:
+            obj_uuid_cf.get = orig_get
+            obj_uuid_cf.multiget = orig_multiget
+
+        back_refs = ret_vn.get_virtual_machine_interface_back_refs()
+        self.assertEqual(set(port_uuids), set(r['uuid'] for r in back_refs))
+        self.assertEqual(len(fq_name_reads), 1)
+        self.assertEqual(set(port_uuids), set(fq_name_reads[0]))
+    # end test_read_back_refs_bulk_fq_name_lookup
+
+    def test_list_paginated(self):
+        vn_objs = self._create_test_objects(count=5)
+        vn_uuids = set(vn_obj.uuid for vn_obj in vn_objs)
+
+        # walk pages by hand, each has at most page_limit entries
+        listed_uuids = []
+        query_params = {'page_limit': 2}
+        while True:
+            status, content = self._http_get('/virtual-networks',
+                                             query_params=query_params)
+            self.assertEqual(status, 200)
+            result = json.loads(content)
+            self.assertTrue(len(result['virtual-networks']) <= 2)
+            listed_uuids.extend(vn['uuid']
+                                for vn in result['virtual-networks'])
+            if not result['marker']:
+                break
+            query_params['page_marker'] = result['marker']
+        self.assertEqual(len(listed_uuids), len(set(listed_uuids)))
+        self.assertTrue(vn_uuids <= set(listed_uuids))
+
+        # library follows markers transparently
+        read_vn_objs = self._vnc_lib.resource_list('virtual-network',
+                                                   detail=True, page_limit=2)
+        self.assertTrue(vn_uuids <= set(o.uuid for o in read_vn_objs))
+
+        # streamed body is the same document
+        status, content = self._http_get('/virtual-networks',
+            query_params={'detail': True, 'stream': True})
+        self.assertEqual(status, 200)
+        streamed = json.loads(content)['virtual-networks']
+        self.assertTrue(vn_uuids <=
+            set(vn['virtual-network']['uuid'] for vn in streamed))
+    # end test_list_paginated
+
+    def test_bulk_create_update_delete(self):
+        db_client = self._api_server._db_conn._cassandra_db
+        obj_uuid_cf = db_client._obj_uuid_cf
+        sends = []
+        orig_send = obj_uuid_cf.send
+        def counting_send(*args, **kwargs):
+            sends.append(1)
+            return orig_send(*args, **kwargs)
+
+        vn_objs = [VirtualNetwork('%s-vn-%s' %(self.id(), i))
+                   for i in range(3)]
+        obj_uuid_cf.send = counting_send
+        try:
+            self._vnc_lib.bulk([('CREATE', vn_obj) for vn_obj in vn_objs])
+        finally:
+            obj_uuid_cf.send = orig_send
+        # all creates written in one batch
+        self.assertEqual(len(sends), 1)
+        for vn_obj in vn_objs:
+            read_obj = self._vnc_lib.virtual_network_read(id=vn_obj.uuid)
+            self.assertEqual(read_obj.get_fq_name(), vn_obj.get_fq_name())
+
+        vn_objs[0].display_name = '%s-renamed' %(self.id())
+        obj_uuid_cf.send = counting_send
+        try:
+            self._vnc_lib.bulk([('UPDATE', vn_objs[0]),
+                                ('DELETE', vn_objs[1]),
+                                ('DELETE', vn_objs[2])])
+        finally:
+            obj_uuid_cf.send = orig_send
+        # updates and deletes of unrelated objects are batched too
+        self.assertEqual(len(sends), 2)
+        read_obj = self._vnc_lib.virtual_network_read(id=vn_objs[0].uuid)
+        self.assertEqual(read_obj.display_name, vn_objs[0].display_name)
+        for vn_obj in vn_objs[1:]:
+            with ExpectedException(NoIdError):
+                self._vnc_lib.virtual_network_read(id=vn_obj.uuid)
+
+        # deleting a network reads its refs from the interface deleted
+        # before it in the same request
+        vn_obj = VirtualNetwork('%s-vn' %(self.id()))
+        self._vnc_lib.virtual_network_create(vn_obj)
+        vmi_obj = VirtualMachineInterface('%s-vmi' %(self.id()),
+                                          parent_obj=Project())
+        vmi_obj.add_virtual_network(vn_obj)
+        self._vnc_lib.virtual_machine_interface_create(vmi_obj)
+        self._vnc_lib.bulk([('DELETE', vmi_obj), ('DELETE', vn_obj)])
+        with ExpectedException(NoIdError):
+            self._vnc_lib.virtual_network_read(id=vn_obj.uuid)
+
+        # operations before a failing one stay applied
+        ipam_obj = NetworkIpam('%s-ipam' %(self.id()))
+        bad_vn_obj = VirtualNetwork('%s-bad-vn' %(self.id()),
+            parent_obj=Project('%s-no-project' %(self.id())))
+        with ExpectedException(HttpError):
+            self._vnc_lib.bulk([('CREATE', ipam_obj),
+                                ('CREATE', bad_vn_obj)])
+        self._vnc_lib.network_ipam_read(
+            fq_name=ipam_obj.get_fq_name())
+    # end test_bulk_create_update_delete
+
+    def test_bulk_send_failure(self):
+        obj_uuid_cf = self._api_server._db_conn._cassandra_db._obj_uuid_cf
+        def failing_send(*args, **kwargs):
+            raise Exception('Faking cassandra write failure')
+
+        vn_objs = [VirtualNetwork('%s-vn-%s' %(self.id(), i))
+                   for i in range(2)]
+        orig_send = obj_uuid_cf.send
+        obj_uuid_cf.send = failing_send
+        try:
+            with ExpectedException(HttpError):
+                self._vnc_lib.bulk([('CREATE', vn_obj) for vn_obj in vn_objs])
+        finally:
+            obj_uuid_cf.send = orig_send
+
+        # the names reserved by the failed creates are released
+        for vn_obj in vn_objs:
+            self._vnc_lib.virtual_network_create(vn_obj)
+    # end test_bulk_send_failure
+
+    def test_bulk_create_quota(self):
+        proj_obj = Project('%s-project' %(self.id()))
+        proj_obj.set_quota(QuotaType(virtual_network=2))
+        self._vnc_lib.project_create(proj_obj)
+        vn_objs = [VirtualNetwork('%s-vn-%s' %(self.id(), i), proj_obj)
+                   for i in range(3)]
+        # the quota check of each create sees the earlier ones
+        with ExpectedException(HttpError):
+            self._vnc_lib.bulk([('CREATE', vn_obj) for vn_obj in vn_objs])
+        proj_obj = self._vnc_lib.project_read(id=proj_obj.uuid)
+        self.assertEqual(len(proj_obj.get_virtual_networks()), 2)
+    # end test_bulk_create_quota
+
+    def test_db_walk_chunked(self):
+        vn_objs = self._create_test_objects(count=5)
+        db_conn = self._api_server._db_conn
+        db_client = db_conn._cassandra_db
+        walked_chunks = []
+        orig_dbe_read = db_conn._dbe_read
+        def recording_dbe_read(obj_type, obj_uuids):
+            walked_chunks.append((obj_type, list(obj_uuids)))
+            return orig_dbe_read(obj_type, obj_uuids)
+
+        db_client._WALK_CHUNK_SIZE = 2
+        db_conn._dbe_read = recording_dbe_read
+        try:
+            read_results = db_conn.db_read()
+        finally:
+            del db_client._WALK_CHUNK_SIZE
+            del db_conn._dbe_read
+
+        self.assertTrue(all(len(chunk) <= 2 for _, chunk in walked_chunks))
+        read_uuids = set(obj_dict['uuid'] for chunk_result in read_results
+                                          for obj_dict in chunk_result)
+        self.assertTrue(set(vn.uuid for vn in vn_objs) <= read_uuids)
+
+        walk_stats = db_client._walk_stats['read']
+        self.assertIsNotNone(walk_stats['end_time'])
+        self.assertEqual(walk_stats['objects_walked'],
+                         walk_stats['objects_scanned'])
+    # end test_db_walk_chunked
+
+    def test_ifmap_publish_interleaved_opers(self):
+        ifmap_db = self._api_server._db_conn._ifmap_db
+        vn_objs = self._create_test_objects(count=4)
+        # delete and recreate on same name while others are created
+        self._vnc_lib.virtual_network_delete(id=vn_objs[0].uuid)
+        vn_objs[0] = VirtualNetwork(vn_objs[0].name)
+        self._vnc_lib.virtual_network_create(vn_objs[0])
+        self._vnc_lib.virtual_network_delete(id=vn_objs[1].uuid)
+        vn_objs.extend(self._create_test_objects(count=2))
+
+        for _ in range(100):
+            if ifmap_db.is_idle():
+                break
+            gevent.sleep(0.1)
+        self.assertTrue(ifmap_db.is_idle())
+        self.assertEqual(ifmap_db._publish_inflight, [])
+
+        self.assertIn(imid.get_ifmap_id_from_fq_name('virtual-network',
+            vn_objs[0].get_fq_name()), FakeIfmapClient._graph)
+        self.assertNotIn(imid.get_ifmap_id_from_fq_name('virtual-network',
+            vn_objs[1].get_fq_name()), FakeIfmapClient._graph)
+        for vn_obj in vn_objs[2:]:
+            self.assertIn(imid.get_ifmap_id_from_fq_name('virtual-network',
+                vn_obj.get_fq_name()), FakeIfmapClient._graph)
+
+        batch_hist = ifmap_db._publish_histograms['batch_size']
+        self.assertEqual(batch_hist.count, ifmap_db._publish_count)
+        self.assertThat(0, LessThan(batch_hist.count))
+    # end test_ifmap_publish_interleaved_opers
+
 # end class TestVncCfgApiServer
 
+class TestPropIndex(test_case.ApiServerTestCase):
+    """ Tests to verify list filters answered from the property index."""
+    def __init__(self, *args, **kwargs):
+        super(TestPropIndex, self).__init__(*args, **kwargs)
+        self._config_knobs.extend(
+            [('DEFAULTS', 'indexed_props', 'virtual_network:display_name'),])
+
+    def test_filtered_list_from_index(self):
+        vn_objs = self._create_test_objects(count=3)
+        db_client = self._api_server._db_conn._cassandra_db
+        obj_uuid_cf = db_client._obj_uuid_cf
+        orig_multiget = obj_uuid_cf.multiget
+        def no_prop_multiget(keys, columns=None, *args, **kwargs):
+            if columns and columns[0].startswith('prop:'):
+                raise Exception('filter not answered from index')
+            return orig_multiget(keys, columns, *args, **kwargs)
+
+        obj_uuid_cf.multiget = no_prop_multiget
+        try:
+            def list_by_name(display_name):
+                resp = self._vnc_lib.virtual_networks_list(
+                    filters={'display_name': display_name})
+                return [vn['uuid'] for vn in resp['virtual-networks']]
+
+            self.assertEqual(list_by_name(vn_objs[1].display_name),
+                             [vn_objs[1].uuid])
+
+            vn_objs[1].display_name = '%s-renamed' %(self.id())
+            self._vnc_lib.virtual_network_update(vn_objs[1])
+            self.assertEqual(list_by_name(vn_objs[1].display_name),
+                             [vn_objs[1].uuid])
+
+            self._vnc_lib.virtual_network_delete(id=vn_objs[1].uuid)
+            self.assertEqual(list_by_name(vn_objs[1].display_name), [])
+        finally:
+            obj_uuid_cf.multiget = orig_multiget
+    # end test_filtered_list_from_index
+
+    def test_index_kept_by_other_clients(self):
+        vn_obj = self._create_test_objects(count=1)[0]
+        # other daemons open the same tables without indexed props
+        VncCassandraClient(['127.0.0.1:9160'], None, None,
+                           lambda *args, **kwargs: None)
+        resp = self._vnc_lib.virtual_networks_list(
+            filters={'display_name': vn_obj.display_name})
+        self.assertEqual([vn['uuid'] for vn in resp['virtual-networks']],
+                         [vn_obj.uuid])
+    # end test_index_kept_by_other_clients
+# end class TestPropIndex
+
+
+class TestConfigDbCacheStats(test_case.ApiServerTestCase):
+    def test_stats_of_all_clients(self):
+        db_client = self._api_server._db_conn._cassandra_db
+        other_client = VncCassandraClient(['127.0.0.1:9160'], None, None,
+                                          lambda *args, **kwargs: None)
+        resps = []
+        def resp_cls(caches):
+            resps.append(caches)
+            return flexmock(response=lambda context: None)
+        self.useFixture(fixtures.MonkeyPatch(
+            'cfgm_common.vnc_cassandra.ConfigDbCacheStatsResp', resp_cls))
+        cfgm_common.vnc_cassandra.ConfigDbCacheStatsReq.handle_request(
+            flexmock(context=lambda: None))
+        self.assertEqual(len(resps), 1)
+        stats = [(cache.name, cache.size) for cache in resps[0]]
+        for client in [db_client, other_client]:
+            cache_stats = client.cache_stats()
+            self.assertIn((cache_stats.name, cache_stats.size), stats)
+    # end test_stats_of_all_clients
+# end class TestConfigDbCacheStats
+
+class TestIfmapResyncSnapshot(test_case.ApiServerTestCase):
+    """ Tests to verify resync republishes only objects changed since
+        the last ifmap resync snapshot.
+    """
+    def __init__(self, *args, **kwargs):
+        super(TestIfmapResyncSnapshot, self).__init__(*args, **kwargs)
+        self._snapshot_file = os.path.join(tempfile.gettempdir(),
+            'ifmap-resync-snapshot-%s' %(uuid.uuid4()))
+        self._config_knobs.extend(
+            [('DEFAULTS', 'ifmap_resync_snapshot', self._snapshot_file),])
+
+    def tearDown(self):
+        if os.path.exists(self._snapshot_file):
+            os.remove(self._snapshot_file)
+        super(TestIfmapResyncSnapshot, self).tearDown()
+    # end tearDown
+
+    def _wait_for_published(self, obj_uuids, published=True):
+        db_conn = self._api_server._db_conn
+        for _ in range(100):
+            if all((obj_uuid in db_conn._ifmap_published) == published
+                   for obj_uuid in obj_uuids):
+                return
+            gevent.sleep(0.1)
+        self.fail('ifmap publish of %s not seen' %(obj_uuids))
+    # end _wait_for_published
+
+    def test_resync_republishes_changed_only(self):
+        vn_objs = self._create_test_objects(count=3)
+        self._wait_for_published([vn.uuid for vn in vn_objs])
+        db_conn = self._api_server._db_conn
+        db_conn._ifmap_snapshot_save()
+
+        vn_objs[0].display_name = '%s-renamed' %(self.id())
+        self._vnc_lib.virtual_network_update(vn_objs[0])
+        self._vnc_lib.virtual_network_delete(id=vn_objs[2].uuid)
+        self._wait_for_published([vn_objs[2].uuid], published=False)
+
+        ifmap_db = db_conn._ifmap_db
+        calls = []
+        def record(oper, method):
+            def wrapper(*args, **kwargs):
+                calls.append(oper)
+                return method(*args, **kwargs)
+            return wrapper
+        for oper in ('create', 'update', 'delete'):
+            method_name = '_ifmap_virtual_network_%s' %(oper)
+            setattr(ifmap_db, method_name,
+                    record(oper, getattr(ifmap_db, method_name)))
+
+        ifmap_db._id_to_metas = {}
+        db_conn.db_resync()
+        # vn_objs[1] is unchanged since the snapshot
+        self.assertEqual(sorted(calls), ['delete', 'update'])
+        self.assertIn(vn_objs[1].uuid, db_conn._ifmap_published)
+        self.assertNotIn(vn_objs[2].uuid, db_conn._ifmap_published)
+    # end test_resync_republishes_changed_only
+# end class TestIfmapResyncSnapshot
+
 class TestVncCfgApiServerRequests(test_case.ApiServerTestCase):
     """ Tests to verify the max_requests config parameter of api-server."""
     def __init__(self, *args, **kwargs):
@@ -404,6 +404,67 @@ class TestIpAlloc(test_case.ApiServerTestCase):
         self._vnc_lib.domain_delete(id=domain.uuid)
     #end
 
+    def test_bulk_ip_alloc_exhaust(self):
+        # Create Domain
+        domain = Domain('v4-bulk-domain')
+        self._vnc_lib.domain_create(domain)
+
+        # Create Project
+        project = Project('v4-bulk-proj', domain)
+        self._vnc_lib.project_create(project)
+
+        # Create NetworkIpam
+        ipam = NetworkIpam('default-network-ipam', project, IpamType("dhcp"))
+        self._vnc_lib.network_ipam_create(ipam)
+        ipam = self._vnc_lib.network_ipam_read(
+            fq_name=['v4-bulk-domain', 'v4-bulk-proj', 'default-network-ipam'])
+
+        # Create VN with a small subnet
+        ipam_sn_v4 = IpamSubnetType(subnet=SubnetType('11.1.2.0', 28))
+        vn = VirtualNetwork('v4-bulk-vn', project)
+        vn.add_network_ipam(ipam, VnSubnetsType([ipam_sn_v4]))
+        self._vnc_lib.virtual_network_create(vn)
+
+        count_data = json.dumps({"subnet_list" : ["11.1.2.0/28"]})
+        count_url = '/virtual-network/%s/subnet-ip-count' %(vn.uuid)
+        rv_json = self._vnc_lib._request_server(rest.OP_POST, count_url,
+                                                count_data)
+        reserved_count = json.loads(rv_json)['ip_count_list'][0]
+
+        # request to allocate 10 ip address using bulk allocation api
+        data = {"subnet" : "11.1.2.0/28", "count" : 10}
+        url = '/virtual-network/%s/ip-alloc' %(vn.uuid)
+        rv_json = self._vnc_lib._request_server(rest.OP_POST, url,
+                                                json.dumps(data))
+        ret_ip_addr = json.loads(rv_json)['ip_addr']
+        self.assertEqual(len(set(ret_ip_addr)), 10)
+
+        # more addresses than the subnet has left, the ones that could be
+        # allocated are released
+        data = {"subnet" : "11.1.2.0/28", "count" : 16}
+        with ExpectedException(HttpError):
+            self._vnc_lib._request_server(rest.OP_POST, url,
+                                          json.dumps(data))
+        rv_json = self._vnc_lib._request_server(rest.OP_POST, count_url,
+                                                count_data)
+        self.assertEqual(json.loads(rv_json)['ip_count_list'][0],
+                         reserved_count + 10)
+
+        data = {"subnet" : "11.1.2.0/28", "ip_addr" : ret_ip_addr}
+        url = '/virtual-network/%s/ip-free' %(vn.uuid)
+        self._vnc_lib._request_server(rest.OP_POST, url, json.dumps(data))
+        rv_json = self._vnc_lib._request_server(rest.OP_POST, count_url,
+                                                count_data)
+        self.assertEqual(json.loads(rv_json)['ip_count_list'][0],
+                         reserved_count)
+
+        # cleanup
+        self._vnc_lib.virtual_network_delete(id=vn.uuid)
+        self._vnc_lib.network_ipam_delete(id=ipam.uuid)
+        self._vnc_lib.project_delete(id=project.uuid)
+        self._vnc_lib.domain_delete(id=domain.uuid)
+    #end
+
     def test_v4_ip_allocation_exhaust(self):
         # Create Domain
         domain = Domain('v4-domain')
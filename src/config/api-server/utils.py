@@ -36,6 +36,9 @@ def parse_args(args_str):
         'ifmap_server_port': "8443",
         'ifmap_queue_size': 10000,
         'ifmap_max_message_size': 1024*1024,
+        'ifmap_max_inflight': 2,
+        'ifmap_resync_snapshot': '',
+        'ifmap_snapshot_interval': 300,
         'cassandra_server_list': "127.0.0.1:9160",
         'ifmap_username': "api-server",
         'ifmap_password': "api-server",
@@ -65,6 +68,8 @@ def parse_args(args_str):
         'rabbit_max_pending_updates': '4096',
         'cluster_id': '',
         'max_requests': 1024,
+        'uuid_cache_size': 100000,
+        'indexed_props': '',
     }
     # ssl options
     secopts = {
@@ -144,6 +149,16 @@ def parse_args(args_str):
     parser.add_argument(
         "--ifmap_max_message_size", type=int, help="Maximum size of message "
         "sent to ifmap server")
+    parser.add_argument(
+        "--ifmap_max_inflight", type=int, help="Maximum number of publish "
+        "requests to ifmap server awaiting response")
+    parser.add_argument(
+        "--ifmap_resync_snapshot", help="File to keep a snapshot of what was "
+        "published to ifmap server in, resync then republishes only objects "
+        "changed since (empty to disable)")
+    parser.add_argument(
+        "--ifmap_snapshot_interval", type=int, help="Seconds between writes "
+        "of the ifmap resync snapshot")
 
     # TODO should be from certificate
     parser.add_argument(
@@ -263,6 +278,14 @@ def parse_args(args_str):
     parser.add_argument(
         "--max_requests", type=int,
         help="Maximum number of concurrent requests served by api server")
+    parser.add_argument(
+        "--uuid_cache_size", type=int,
+        help="Maximum number of uuid to fq_name entries cached by api server")
+    parser.add_argument(
+        "--indexed_props",
+        help="List of <obj-type>:<property> to keep a secondary index for, "
+             "used by filtered list requests",
+        nargs='+')
     parser.add_argument("--cassandra_user",
             help="Cassandra user name")
     parser.add_argument("--cassandra_password",
@@ -274,6 +297,8 @@ def parse_args(args_str):
             args_obj.cassandra_server_list.split()
     if type(args_obj.collectors) is str:
         args_obj.collectors = args_obj.collectors.split()
+    if type(args_obj.indexed_props) is str:
+        args_obj.indexed_props = args_obj.indexed_props.split()
 
     return args_obj, remaining_argv
 # end parse_args
@@ -329,6 +329,11 @@ class Subnet(object):
         return None
     # end ip_alloc
 
+    def ip_alloc_batch(self, count, value=None):
+        addrs = self._db_conn.subnet_alloc_batch_req(self._name, count, value)
+        return [str(IPAddress(addr)) for addr in addrs]
+    # end ip_alloc_batch
+
     # free IP unless it is invalid, excluded or already freed
     @classmethod
     def ip_free_cls(cls, subnet_fq_name, ip_network, exclude_addrs, ip_addr):
@@ -344,6 +349,13 @@ class Subnet(object):
         Subnet.ip_free_cls(self._name, self._network, self._exclude, ip_addr)
     # end ip_free
 
+    def ip_free_batch(self, ip_addrs):
+        addrs = [int(ip_addr) for ip_addr in ip_addrs
+                 if ip_addr in self._network and ip_addr not in self._exclude]
+        if addrs and self._db_conn:
+            self._db_conn.subnet_free_batch_req(self._name, addrs)
+    # end ip_free_batch
+
     # check if IP address belongs to us
     @classmethod
     def ip_belongs_to(cls, ipnet, ipaddr):
@@ -426,6 +438,28 @@ class AddrMgmt(object):
         return subnet_dicts
     # end _get_subnet_dicts
 
+    def _get_subnet_obj(self, vn_fq_name_str, subnet_name, subnet_dict):
+        # create subnet_obj internally if it was created by some other
+        # api-server before
+        try:
+            return self._subnet_objs[vn_fq_name_str][subnet_name]
+        except KeyError:
+            pass
+        subnet_obj = Subnet('%s:%s' % (vn_fq_name_str, subnet_name),
+                            subnet_dict['ip_prefix'],
+                            subnet_dict['ip_prefix_len'],
+                            gw=subnet_dict['gw'],
+                            service_address=subnet_dict['dns_server_address'],
+                            enable_dhcp=subnet_dict['enable_dhcp'],
+                            dns_nameservers=subnet_dict['dns_nameservers'],
+                            alloc_pool_list=subnet_dict['allocation_pools'],
+                            addr_from_start=subnet_dict['addr_start'],
+                            should_persist=False)
+        self._subnet_objs.setdefault(vn_fq_name_str, {})[subnet_name] = \
+            subnet_obj
+        return subnet_obj
+    # end _get_subnet_obj
+
     def _create_subnet_objs(self, vn_fq_name_str, vn_dict, should_persist):
         self._subnet_objs[vn_fq_name_str] = {}
         # create subnet for each new subnet
@@ -864,27 +898,8 @@ class AddrMgmt(object):
             if sub and sub != subnet_name:
                 continue
 
-            # create subnet_obj internally if it was created by some other
-            # api-server before
-            try:
-                subnet_obj = self._subnet_objs[vn_fq_name_str][subnet_name]
-            except KeyError:
-                if vn_fq_name_str not in self._subnet_objs:
-                    self._subnet_objs[vn_fq_name_str] = {}
-
-                subnet_dict = subnet_dicts[subnet_name]
-                subnet_obj = Subnet('%s:%s' % (vn_fq_name_str,
-                                               subnet_name),
-                                    subnet_dict['ip_prefix'],
-                                    subnet_dict['ip_prefix_len'],
-                                    gw=subnet_dict['gw'],
-                                    service_address=subnet_dict['dns_server_address'],
-                                    enable_dhcp=subnet_dict['enable_dhcp'],
-                                    dns_nameservers=subnet_dict['dns_nameservers'],
-                                    alloc_pool_list=subnet_dict['allocation_pools'],
-                                    addr_from_start = subnet_dict['addr_start'],
-                                    should_persist=False)
-                self._subnet_objs[vn_fq_name_str][subnet_name] = subnet_obj
+            subnet_obj = self._get_subnet_obj(vn_fq_name_str, subnet_name,
+                                              subnet_dicts[subnet_name])
 
             if asked_ip_version != subnet_obj.get_version():
                 continue
@@ -920,6 +935,50 @@ class AddrMgmt(object):
         raise AddrMgmtSubnetExhausted(vn_fq_name, 'all')
     # end ip_alloc_req
 
+    # allocate count IP addresses for given virtual network, in as few
+    # zookeeper transactions as possible. Nothing is allocated if the
+    # subnets do not have count free addresses.
+    def ip_alloc_batch_req(self, vn_fq_name, count, sub=None, alloc_id=None):
+        vn_fq_name_str = ':'.join(vn_fq_name)
+        subnet_dicts = self._get_subnet_dicts(vn_fq_name)
+
+        if not subnet_dicts:
+            raise AddrMgmtSubnetUndefined(vn_fq_name_str)
+
+        allocated = []
+        remaining = count
+        try:
+            for subnet_name in subnet_dicts:
+                if sub and sub != subnet_name:
+                    continue
+
+                subnet_obj = self._get_subnet_obj(vn_fq_name_str, subnet_name,
+                                                  subnet_dicts[subnet_name])
+
+                if subnet_obj.get_version() != 4:
+                    continue
+                ip_addrs = subnet_obj.ip_alloc_batch(remaining, value=alloc_id)
+                allocated.append((subnet_obj, ip_addrs))
+                remaining -= len(ip_addrs)
+                if remaining <= 0:
+                    return [addr for _, subnet_addrs in allocated
+                            for addr in subnet_addrs]
+        except Exception as e:
+            self.config_log("Error: %s in ip_alloc_batch_req" %(str(e)),
+                            level=SandeshLevel.SYS_ERR)
+            self._ip_free_allocated(allocated)
+            raise AddrMgmtSubnetExhausted(vn_fq_name, sub or 'all')
+
+        self._ip_free_allocated(allocated)
+        raise AddrMgmtSubnetExhausted(vn_fq_name, sub or 'all')
+    # end ip_alloc_batch_req
+
+    def _ip_free_allocated(self, allocated):
+        for subnet_obj, ip_addrs in allocated:
+            subnet_obj.ip_free_batch([IPAddress(ip_addr)
+                                      for ip_addr in ip_addrs])
+    # end _ip_free_allocated
+
     def ip_alloc_notify(self, ip_addr, vn_fq_name):
         vn_fq_name_str = ':'.join(vn_fq_name)
         try:
@@ -928,27 +987,8 @@ class AddrMgmt(object):
             return
 
         for subnet_name in subnet_dicts:
-            # create subnet_obj internally if it was created by some other
-            # api-server before
-            try:
-                subnet_obj = self._subnet_objs[vn_fq_name_str][subnet_name]
-            except KeyError:
-                if vn_fq_name_str not in self._subnet_objs:
-                    self._subnet_objs[vn_fq_name_str] = {}
-
-                subnet_dict = subnet_dicts[subnet_name]
-                subnet_obj = Subnet('%s:%s' % (vn_fq_name_str,
-                                               subnet_name),
-                                    subnet_dict['ip_prefix'],
-                                    subnet_dict['ip_prefix_len'],
-                                    gw=subnet_dict['gw'],
-                                    service_address=subnet_dict['dns_server_address'],
-                                    enable_dhcp=subnet_dict['enable_dhcp'],
-                                    dns_nameservers=subnet_dict['dns_nameservers'],
-                                    alloc_pool_list=subnet_dict['allocation_pools'],
-                                    addr_from_start = subnet_dict['addr_start'],
-                                    should_persist=False)
-                self._subnet_objs[vn_fq_name_str][subnet_name] = subnet_obj
+            subnet_obj = self._get_subnet_obj(vn_fq_name_str, subnet_name,
+                                              subnet_dicts[subnet_name])
 
             if not subnet_obj.ip_belongs(ip_addr):
                 continue
@@ -967,25 +1007,8 @@ class AddrMgmt(object):
             # if we have subnet_obj free it via instance method,
             # updating inuse bitmask, else free it via class method
             # and there is no inuse bitmask to worry about
-            try:
-                subnet_obj = self._subnet_objs[vn_fq_name_str][subnet_name]
-            except KeyError:
-                if vn_fq_name_str not in self._subnet_objs:
-                    self._subnet_objs[vn_fq_name_str] = {}
-
-                subnet_dict = subnet_dicts[subnet_name]
-                subnet_obj = Subnet('%s:%s' % (vn_fq_name_str,
-                                               subnet_name),
-                                    subnet_dict['ip_prefix'],
-                                    subnet_dict['ip_prefix_len'],
-                                    gw=subnet_dict['gw'],
-                                    service_address=subnet_dict['dns_server_address'],
-                                    enable_dhcp=subnet_dict['enable_dhcp'],
-                                    dns_nameservers=subnet_dict['dns_nameservers'],
-                                    alloc_pool_list=subnet_dict['allocation_pools'],
-                                    addr_from_start = subnet_dict['addr_start'],
-                                    should_persist=False)
-                self._subnet_objs[vn_fq_name_str][subnet_name] = subnet_obj
+            subnet_obj = self._get_subnet_obj(vn_fq_name_str, subnet_name,
+                                              subnet_dicts[subnet_name])
 
             if Subnet.ip_belongs_to(IPNetwork(subnet_name),
                                     IPAddress(ip_addr)):
@@ -993,6 +1016,30 @@ class AddrMgmt(object):
                 break
     # end ip_free_req
 
+    def ip_free_batch_req(self, ip_addrs, vn_fq_name, sub=None):
+        vn_fq_name_str = ':'.join(vn_fq_name)
+        subnet_dicts = self._get_subnet_dicts(vn_fq_name)
+        ip_addrs = [IPAddress(ip_addr) for ip_addr in ip_addrs]
+        for subnet_name in subnet_dicts:
+            if not ip_addrs:
+                break
+            if sub and sub != subnet_name:
+                continue
+
+            ip_network = IPNetwork(subnet_name)
+            subnet_addrs = [ip_addr for ip_addr in ip_addrs
+                            if Subnet.ip_belongs_to(ip_network, ip_addr)]
+            if not subnet_addrs:
+                continue
+            ip_addrs = [ip_addr for ip_addr in ip_addrs
+                        if not Subnet.ip_belongs_to(ip_network, ip_addr)]
+
+            subnet_obj = self._get_subnet_obj(vn_fq_name_str, subnet_name,
+                                              subnet_dicts[subnet_name])
+
+            subnet_obj.ip_free_batch(subnet_addrs)
+    # end ip_free_batch_req
+
     def is_ip_allocated(self, ip_addr, vn_fq_name, sub=None):
         vn_fq_name_str = ':'.join(vn_fq_name)
         subnet_dicts = self._get_subnet_dicts(vn_fq_name)
@@ -1003,25 +1050,8 @@ class AddrMgmt(object):
             # if we have subnet_obj free it via instance method,
             # updating inuse bitmask, else free it via class method
             # and there is no inuse bitmask to worry about
-            try:
-                subnet_obj = self._subnet_objs[vn_fq_name_str][subnet_name]
-            except KeyError:
-                if vn_fq_name_str not in self._subnet_objs:
-                    self._subnet_objs[vn_fq_name_str] = {}
-
-                subnet_dict = subnet_dicts[subnet_name]
-                subnet_obj = Subnet('%s:%s' % (vn_fq_name_str,
-                                               subnet_name),
-                                    subnet_dict['ip_prefix'],
-                                    subnet_dict['ip_prefix_len'],
-                                    gw=subnet_dict['gw'],
-                                    service_address=subnet_dict['dns_server_address'],
-                                    enable_dhcp=subnet_dict['enable_dhcp'],
-                                    dns_nameservers=subnet_dict['dns_nameservers'],
-                                    alloc_pool_list=subnet_dict['allocation_pools'],
-                                    addr_from_start = subnet_dict['addr_start'],
-                                    should_persist=False)
-                self._subnet_objs[vn_fq_name_str][subnet_name] = subnet_obj
+            subnet_obj = self._get_subnet_obj(vn_fq_name_str, subnet_name,
+                                              subnet_dicts[subnet_name])
 
             if Subnet.ip_belongs_to(IPNetwork(subnet_name),
                                     IPAddress(ip_addr)):
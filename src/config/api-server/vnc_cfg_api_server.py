@@ -124,6 +124,8 @@ _ACTION_RESOURCES = [
      'method_name': 'stop_profile'},
     {'uri': '/list-bulk-collection', 'link_name': 'list-bulk-collection',
      'method_name': 'list_bulk_collection_http_post'},
+    {'uri': '/bulk', 'link_name': 'bulk',
+     'method_name': 'bulk_http_post'},
 ]
 
 
@@ -213,6 +215,8 @@ class VncApiServer(object):
     This is the manager class co-ordinating all classes present in the package
     """
     _INVALID_NAME_CHARS = set(':')
+    # max objects read from db at a time when building a list response
+    _LIST_READ_CHUNK_SIZE = 1000
 
     def __new__(cls, *args, **kwargs):
         obj = super(VncApiServer, cls).__new__(cls, *args, **kwargs)
@@ -412,6 +416,11 @@ class VncApiServer(object):
             self.config_object_error(None, fq_name_str, obj_type, 'http_post', result)
             bottle.abort(404, result)
 
+        # in a bulk request the object is written later, with the others
+        bulk_cleanup = bottle.request.environ.get('vnc.bulk_cleanup')
+        if bulk_cleanup is not None:
+            bulk_cleanup.extend(cleanup_on_failure)
+
         rsp_body = {}
         rsp_body['name'] = name
         rsp_body['fq_name'] = fq_name
@@ -830,9 +839,21 @@ class VncApiServer(object):
         else:
             filters = None
 
+        try:
+            page_limit = int(bottle.request.query.page_limit or 0) or None
+        except ValueError:
+            bottle.abort(400, 'Invalid page_limit ' +
+                              bottle.request.query.page_limit)
+        page_marker = bottle.request.query.page_marker or None
+
+        if 'stream' in bottle.request.query:
+            is_stream = 'true' in bottle.request.query.stream.lower()
+        else:
+            is_stream = False
+
         return self._list_collection(resource_type,
             parent_uuids, back_ref_uuids, obj_uuids, is_count, is_detail,
-            filters, req_fields)
+            filters, req_fields, page_marker, page_limit, is_stream)
     # end http_resource_list
 
     def create_default_children(self, resource_type, parent_obj):
@@ -1145,7 +1166,9 @@ class VncApiServer(object):
                                      self._args.collectors,
                                      'vnc_api_server_context',
                                      int(self._args.http_server_port),
-                                     ['cfgm_common'], self._disc,
+                                     ['cfgm_common',
+                                      'vnc_cfg_api_server.sandesh'],
+                                     self._disc,
                                      logger_class=self._args.logger_class,
                                      logger_config_file=self._args.logging_conf)
         self._sandesh.trace_buffer_create(name="VncCfgTraceBuf", size=1000)
@@ -1658,11 +1681,188 @@ class VncApiServer(object):
         if req_fields:
             req_fields = req_fields.split(',')
 
+        try:
+            page_limit = int(bottle.request.json.get('page_limit') or 0) or None
+        except ValueError:
+            bottle.abort(400, 'Invalid page_limit %s'
+                              %(bottle.request.json.get('page_limit')))
+        page_marker = bottle.request.json.get('page_marker')
+        is_stream = bottle.request.json.get('stream', False)
+
         return self._list_collection(res_type, parent_uuids, back_ref_uuids,
                                      obj_uuids, is_count, is_detail, filters,
-                                     req_fields)
+                                     req_fields, page_marker, page_limit,
+                                     is_stream)
     # end list_bulk_collection_http_post
 
+    def bulk_http_post(self):
+        """ Create, update and delete a list of resources in one request.
+
+        POST body is {'operations': [{'oper': 'CREATE'|'UPDATE'|'DELETE',
+        'type': <resource-type>, 'uuid': <id, not for CREATE>,
+        'data': <resource dict, not for DELETE>}, ...]}. Operations are
+        applied in order with their db writes and notifications coalesced.
+        On the first failing operation the ones before it stay applied
+        and the request fails with that operation's error.
+        """
+        operations = bottle.request.json.get('operations')
+        if not isinstance(operations, list):
+            bottle.abort(400, "Bad Request, no 'operations' list in POST body")
+
+        for op_idx, op in enumerate(operations):
+            if not isinstance(op, dict):
+                bottle.abort(400, 'Bad Request, operation %s is not a dict'
+                                  %(op_idx))
+            oper = op.get('oper')
+            res_type = op.get('type')
+            if oper not in ('CREATE', 'UPDATE', 'DELETE'):
+                bottle.abort(400, 'Bad Request, unknown oper %s in operation %s'
+                                  %(oper, op_idx))
+            if not res_type or not self.get_resource_class(res_type):
+                bottle.abort(400, 'Bad Request, unknown type %s in operation %s'
+                                  %(res_type, op_idx))
+            if oper != 'CREATE' and not op.get('uuid'):
+                bottle.abort(400, "Bad Request, no 'uuid' in operation %s"
+                                  %(op_idx))
+            if oper != 'DELETE' and not isinstance(op.get('data'), dict):
+                bottle.abort(400, "Bad Request, no 'data' in operation %s"
+                                  %(op_idx))
+
+        db_conn = self._db_conn
+        request_json = bottle.request.json
+        results = []
+        # fq_names and uuids of objects with writes held back, and types
+        # of the objects created
+        pending = set()
+        pending_types = set()
+        # cleanups of the creates held back, filled by the create handler
+        cleanup_on_failure = []
+        bottle.request.environ['vnc.bulk_cleanup'] = cleanup_on_failure
+        db_conn.dbe_bulk_begin()
+        try:
+            try:
+                for op_idx, op in enumerate(operations):
+                    if op['oper'] != 'CREATE' and op['uuid'] in pending:
+                        # the stored object is read below
+                        self._bulk_send(cleanup_on_failure)
+                        pending.clear()
+                        pending_types.clear()
+                    (op_objs, read_objs) = self._bulk_op_objects(op)
+                    if (read_objs & pending or
+                        self._bulk_op_counts_pending(op, pending_types)):
+                        self._bulk_send(cleanup_on_failure)
+                        pending.clear()
+                        pending_types.clear()
+                    try:
+                        result = self._bulk_op_apply(op)
+                    except bottle.HTTPError as e:
+                        bottle.abort(e.status_code,
+                            'Operation %s (%s %s) failed: %s'
+                            %(op_idx, op['oper'], op['type'], e.body))
+
+                    results.append(result)
+                    pending |= op_objs
+                    pending.add(result[op['type']]['uuid'])
+                    if op['oper'] == 'CREATE':
+                        pending_types.add(op['type'])
+            finally:
+                # operations before a failing one stay applied
+                self._bulk_send(cleanup_on_failure)
+        finally:
+            bottle.request.environ['bottle.request.json'] = request_json
+            del bottle.request.environ['vnc.bulk_cleanup']
+            db_conn.dbe_bulk_end()
+
+        return {'results': results}
+    # end bulk_http_post
+
+    def _bulk_send(self, cleanup_on_failure):
+        # when the held back writes fail none of the creates among them
+        # are stored, their fq_name reservations and allocations are
+        # released and the whole request fails
+        try:
+            self._db_conn.dbe_bulk_send()
+        except Exception as e:
+            for fail_cleanup_callable, cleanup_args in cleanup_on_failure:
+                try:
+                    fail_cleanup_callable(*cleanup_args)
+                except Exception:
+                    self.config_log('Bulk create cleanup failed: %s'
+                        %(cfgm_common.utils.detailed_traceback()),
+                        level=SandeshLevel.SYS_ERR)
+            del cleanup_on_failure[:]
+            bottle.abort(500, 'Failed to write bulk operations: %s' %(str(e)))
+        del cleanup_on_failure[:]
+    # end _bulk_send
+
+    def _bulk_op_objects(self, op):
+        # returns (uuid and fq_name of the object of the operation, uuids
+        # and fq_names of the objects whose rows it reads). It reads the
+        # object, its parent and refs, and deletes also check the back
+        # refs and children of the stored object.
+        obj_dict = op.get('data') or {}
+        op_objs = set()
+        read_objs = set()
+        refs = []
+        if op['oper'] == 'CREATE':
+            fq_name = obj_dict.get('fq_name', [])
+        else:
+            op_objs.add(op['uuid'])
+            r_class = self.get_resource_class(op['type'])
+            obj_fields = (list(r_class.ref_fields) +
+                          list(r_class.backref_fields) +
+                          list(r_class.children_fields))
+            try:
+                (ok, result) = self._db_conn.dbe_read(op['type'],
+                    {'uuid': op['uuid']}, obj_fields=obj_fields)
+            except NoIdError:
+                # fails in the handler
+                return (op_objs, op_objs)
+            if not ok:
+                return (op_objs, op_objs)
+            fq_name = result['fq_name']
+            for field in obj_fields:
+                refs.extend(result.get(field) or [])
+
+        if fq_name:
+            op_objs.add(tuple(fq_name))
+        if len(fq_name) > 1:
+            read_objs.add(tuple(fq_name[:-1]))
+        for field, field_refs in obj_dict.items():
+            if field.endswith('_refs'):
+                refs.extend(field_refs or [])
+        for ref in refs:
+            if ref.get('uuid'):
+                read_objs.add(ref['uuid'])
+            if ref.get('to'):
+                read_objs.add(tuple(ref['to']))
+        return (op_objs, read_objs | op_objs)
+    # end _bulk_op_objects
+
+    def _bulk_op_counts_pending(self, op, pending_types):
+        # the quota check of a create counts the objects of its type
+        if op['oper'] != 'CREATE' or op['type'] not in pending_types:
+            return False
+        return QuotaHelper.has_quota_limit(self._db_conn, op['type'],
+                                           op['data'].get('fq_name', []))
+    # end _bulk_op_counts_pending
+
+    def _bulk_op_apply(self, op):
+        # runs the regular handler of the operation with its data
+        # as request body
+        res_type = op['type']
+        obj_type = res_type.replace('-', '_')
+        bottle.request.environ['bottle.request.json'] = {
+            res_type: op.get('data')}
+        if op['oper'] == 'CREATE':
+            return getattr(self, '%ss_http_post' %(obj_type))()
+        if op['oper'] == 'UPDATE':
+            return getattr(self, '%s_http_put' %(obj_type))(op['uuid'])
+
+        getattr(self, '%s_http_delete' %(obj_type))(op['uuid'])
+        return {res_type: {'uuid': op['uuid']}}
+    # end _bulk_op_apply
+
     # Private Methods
     def _parse_args(self, args_str):
         '''
@@ -1881,12 +2081,14 @@ class VncApiServer(object):
     def _list_collection(self, resource_type, parent_uuids=None,
                          back_ref_uuids=None, obj_uuids=None,
                          is_count=False, is_detail=False, filters=None,
-                         req_fields=None):
+                         req_fields=None, page_marker=None, page_limit=None,
+                         is_stream=False):
         obj_type = resource_type.replace('-', '_') # e.g. virtual_network
 
         (ok, result) = self._db_conn.dbe_list(obj_type,
                              parent_uuids, back_ref_uuids, obj_uuids, is_count,
-                             filters)
+                             filters, paginate_start=page_marker,
+                             paginate_count=page_limit)
         if not ok:
             self.config_object_error(None, None, '%ss' %(obj_type),
                                      'dbe_list', result)
@@ -1897,85 +2099,136 @@ class VncApiServer(object):
             return {'%ss' %(resource_type): {'count': result}}
 
         fq_names_uuids = result
-        obj_dicts = []
-        if not is_detail:
-            if not self.is_admin_request():
-                obj_ids_list = [{'uuid': obj_uuid} 
-                                for _, obj_uuid in fq_names_uuids]
-                obj_fields = [u'id_perms']
-                if req_fields:
-                    obj_fields = obj_fields + req_fields
-                (ok, result) = self._db_conn.dbe_read_multi(
-                                    obj_type, obj_ids_list, obj_fields)
-                if not ok:
-                    bottle.abort(404, result)
-                for obj_result in result:
-                    if obj_result['id_perms'].get('user_visible', True):
+        # a full page means there may be more, marker is last entry's
+        next_marker = None
+        if page_limit and len(fq_names_uuids) >= page_limit:
+            next_marker = self._db_conn.list_page_marker(*fq_names_uuids[-1])
+
+        obj_dict_chunks = self._list_collection_obj_dicts(resource_type,
+            fq_names_uuids, is_detail, req_fields or [],
+            self.is_admin_request())
+        if is_stream:
+            bottle.response.content_type = 'application/json; charset="UTF-8"'
+            return self._list_collection_stream(resource_type,
+                obj_dict_chunks, page_limit, next_marker)
+
+        obj_dicts = [obj_dict for obj_dict_chunk in obj_dict_chunks
+                              for obj_dict in obj_dict_chunk]
+        ret_dict = {'%ss' %(resource_type): obj_dicts}
+        if page_limit:
+            ret_dict['marker'] = next_marker
+        return ret_dict
+    # end _list_collection
+
+    def _list_collection_obj_dicts(self, resource_type, fq_names_uuids,
+                                   is_detail, req_fields, is_admin):
+        # generates lists of obj_dicts, reading at most
+        # _LIST_READ_CHUNK_SIZE objects from db at a time
+        obj_type = resource_type.replace('-', '_')
+        obj_class = self.get_resource_class(obj_type)
+        for chunk_start in range(0, len(fq_names_uuids),
+                                 self._LIST_READ_CHUNK_SIZE):
+            chunk_fq_names_uuids = fq_names_uuids[
+                chunk_start:chunk_start + self._LIST_READ_CHUNK_SIZE]
+            obj_dicts = []
+            if not is_detail:
+                if not is_admin:
+                    obj_ids_list = [{'uuid': obj_uuid}
+                                    for _, obj_uuid in chunk_fq_names_uuids]
+                    obj_fields = [u'id_perms']
+                    if req_fields:
+                        obj_fields = obj_fields + req_fields
+                    (ok, result) = self._db_conn.dbe_read_multi(
+                                        obj_type, obj_ids_list, obj_fields)
+                    if not ok:
+                        bottle.abort(404, result)
+                    for obj_result in result:
+                        if obj_result['id_perms'].get('user_visible', True):
+                            obj_dict = {}
+                            obj_dict['uuid'] = obj_result['uuid']
+                            obj_dict['href'] = self.generate_url(
+                                resource_type, obj_result['uuid'])
+                            obj_dict['fq_name'] = obj_result['fq_name']
+                            for field in req_fields:
+                                try:
+                                    obj_dict[field] = obj_result[field]
+                                except KeyError:
+                                    pass
+                            obj_dicts.append(obj_dict)
+                else: # admin
+                    obj_results = {}
+                    if req_fields:
+                        obj_ids_list = [{'uuid': obj_uuid}
+                            for _, obj_uuid in chunk_fq_names_uuids]
+                        (ok, result) = self._db_conn.dbe_read_multi(
+                            obj_type, obj_ids_list, req_fields)
+                        if ok:
+                            obj_results = dict((elem['uuid'], elem)
+                                               for elem in result)
+                    for fq_name, obj_uuid in chunk_fq_names_uuids:
                         obj_dict = {}
-                        obj_dict['uuid'] = obj_result['uuid']
+                        obj_dict['uuid'] = obj_uuid
                         obj_dict['href'] = self.generate_url(resource_type,
-                                                         obj_result['uuid'])
-                        obj_dict['fq_name'] = obj_result['fq_name']
+                                                             obj_uuid)
+                        obj_dict['fq_name'] = fq_name
                         for field in req_fields:
-                            try:
-                                obj_dict[field] = obj_result[field]
-                            except KeyError:
-                                pass
+                           try:
+                               obj_dict[field] = obj_results[obj_uuid][field]
+                           except KeyError:
+                               pass
                         obj_dicts.append(obj_dict)
-            else: # admin
-                obj_results = {}
-                if req_fields:
-                    obj_ids_list = [{'uuid': obj_uuid}
-                                    for _, obj_uuid in fq_names_uuids]
-                    (ok, result) = self._db_conn.dbe_read_multi(
-                        obj_type, obj_ids_list, req_fields)
-                    if ok:
-                        obj_results = dict((elem['uuid'], elem)
-                                           for elem in result)
-                for fq_name, obj_uuid in fq_names_uuids:
-                    obj_dict = {}
-                    obj_dict['uuid'] = obj_uuid
-                    obj_dict['href'] = self.generate_url(resource_type,
-                                                         obj_uuid)
-                    obj_dict['fq_name'] = fq_name
-                    for field in req_fields or []:
-                       try:
-                           obj_dict[field] = obj_results[obj_uuid][field]
-                       except KeyError:
-                           pass
-                    obj_dicts.append(obj_dict)
-        else: #detail
-            obj_ids_list = [{'uuid': obj_uuid}
-                            for _, obj_uuid in fq_names_uuids]
-
-            obj_class = self.get_resource_class(obj_type)
-            obj_fields = list(obj_class.prop_fields) + \
-                         list(obj_class.ref_fields)
-            if req_fields:
-                obj_fields.extend(req_fields)
-            (ok, result) = self._db_conn.dbe_read_multi(
-                                obj_type, obj_ids_list, obj_fields)
+            else: #detail
+                obj_ids_list = [{'uuid': obj_uuid}
+                                for _, obj_uuid in chunk_fq_names_uuids]
 
-            if not ok:
-                bottle.abort(404, result)
+                obj_fields = list(obj_class.prop_fields) + \
+                             list(obj_class.ref_fields)
+                if req_fields:
+                    obj_fields.extend(req_fields)
+                (ok, result) = self._db_conn.dbe_read_multi(
+                                    obj_type, obj_ids_list, obj_fields)
 
-            for obj_result in result:
-                obj_dict = {}
-                obj_dict['name'] = obj_result['fq_name'][-1]
-                obj_dict['href'] = self.generate_url(
-                                        resource_type, obj_result['uuid'])
-                obj_dict.update(obj_result)
-                if 'id_perms' not in obj_dict:
-                    # It is possible that the object was deleted, but received
-                    # an update after that. We need to ignore it for now. In
-                    # future, we should clean up such stale objects
-                    continue
-                if (obj_dict['id_perms'].get('user_visible', True) or
-                    self.is_admin_request()):
-                    obj_dicts.append({resource_type: obj_dict})
+                if not ok:
+                    bottle.abort(404, result)
 
-        return {'%ss' %(resource_type): obj_dicts}
-    # end _list_collection
+                for obj_result in result:
+                    obj_dict = {}
+                    obj_dict['name'] = obj_result['fq_name'][-1]
+                    obj_dict['href'] = self.generate_url(
+                                            resource_type, obj_result['uuid'])
+                    obj_dict.update(obj_result)
+                    if 'id_perms' not in obj_dict:
+                        # It is possible that the object was deleted, but
+                        # received an update after that. We need to ignore
+                        # it for now. In future, we should clean up such
+                        # stale objects
+                        continue
+                    if (obj_dict['id_perms'].get('user_visible', True) or
+                        is_admin):
+                        obj_dicts.append({resource_type: obj_dict})
+
+            yield obj_dicts
+            # give chance to other requests between chunks
+            gevent.sleep(0)
+    # end _list_collection_obj_dicts
+
+    def _list_collection_stream(self, resource_type, obj_dict_chunks,
+                                page_limit, next_marker):
+        # same document as the non-streamed list, sent one chunk of
+        # objects at a time
+        yield '{"%ss": [' %(resource_type)
+        separator = ''
+        for obj_dicts in obj_dict_chunks:
+            if not obj_dicts:
+                continue
+            yield separator + ', '.join(json.dumps(obj_dict)
+                                        for obj_dict in obj_dicts)
+            separator = ', '
+        if page_limit:
+            yield '], "marker": %s}' %(json.dumps(next_marker))
+        else:
+            yield ']}'
+    # end _list_collection_stream
 
     def get_db_connection(self):
         return self._db_conn
@@ -10,6 +10,7 @@ from gevent import ssl, monkey
 monkey.patch_all()
 import gevent
 import gevent.event
+import gevent.pool
 from gevent.queue import Queue, Empty
 import sys
 import time
@@ -26,6 +27,7 @@ from netaddr import IPNetwork
 
 from cfgm_common.uve.vnc_api.ttypes import *
 from cfgm_common import ignore_exceptions
+from cfgm_common.utils import Histogram
 from cfgm_common.ifmap.client import client, namespaces
 from cfgm_common.ifmap.request import NewSessionRequest, PublishRequest
 from cfgm_common.ifmap.id import Identity
@@ -49,6 +51,7 @@ from datetime import datetime
 from pycassa.util import *
 
 import signal, os
+import cPickle
 
 
 #from cfgm_common import vnc_type_conv
@@ -66,6 +69,10 @@ from pysandesh.gen_py.sandesh.ttypes import SandeshLevel
 
 from sandesh.traces.ttypes import DBRequestTrace, MessageBusNotifyTrace, \
     IfmapTrace
+from sandesh.ifmap_publish.ttypes import IfmapPublishHistogramBucket, \
+    IfmapPublishHistogram, IfmapPublishStatsReq, IfmapPublishStatsResp
+from sandesh.db_walk.ttypes import DbWalkStats, DbWalkStatsReq, \
+    DbWalkStatsResp
 
 import logging
 logger = logging.getLogger(__name__)
@@ -113,6 +120,20 @@ class VncIfmapClient(object):
         self._password = passwd
         self._ssl_options = ssl_options
         self._dequeue_greenlet = None
+        # publish pipeline, see _publish_to_ifmap_dequeue
+        self._publish_generation = 0
+        self._publish_inflight = []
+        self._publish_pending = 0
+        self._publish_clients = []
+        self._publish_done = gevent.event.Event()
+        self._publish_count = 0
+        self._publish_errors = 0
+        self._publish_histograms = {
+            'queue_depth': Histogram([1, 10, 100, 1000, 10000]),
+            'batch_size': Histogram([1, 2, 5, 10, 50, 100, 500, 1000]),
+            'publish_latency': Histogram(
+                [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5]),
+        }
         self._CONTRAIL_XSD = "http://www.contrailsystems.com/vnc_cfg.xsd"
         self._IPERMS_NAME = "id-perms"
         self._NAMESPACES = {
@@ -136,6 +157,9 @@ class VncIfmapClient(object):
         # Set the signal handler
         signal.signal(signal.SIGUSR2, self.handler)
 
+        IfmapPublishStatsReq.handle_request = \
+            self.sandesh_publish_stats_handle_request
+
         # Initialize ifmap-id handler (alloc|convert|parse etc.)
         self._imid_handler = ImidGen()
 
@@ -359,6 +383,8 @@ class VncIfmapClient(object):
                            self._username, self._password,
                            self._NAMESPACES, self._ssl_options)
         self._mapclient = mapclient
+        # per in-flight publish clients, sharing session of _mapclient
+        self._publish_clients = []
 
         connected = False
         while not connected:
@@ -389,6 +415,16 @@ class VncIfmapClient(object):
         # what things to remove in ifmap server
         self._id_to_metas = {}
         self._queue = Queue(self._get_api_server()._args.ifmap_queue_size)
+        # forget publishes in flight, their completion is ignored
+        self._publish_generation += 1
+        self._publish_inflight = []
+        self._publish_pending = 0
+        self._publish_done.set()
+        # dequeue task may be blocked on the old queue, restart it
+        if (self._dequeue_greenlet is not None and
+            self._dequeue_greenlet is not gevent.getcurrent()):
+            self._dequeue_greenlet.kill()
+            self._dequeue_greenlet = None
         if self._dequeue_greenlet is None:
             self._dequeue_greenlet = gevent.spawn(self._ifmap_dequeue_task)
     # end _reset
@@ -423,12 +459,15 @@ class VncIfmapClient(object):
         return ifmap_trace
     # end _generate_ifmap_trace
 
-    def _publish_to_ifmap_enqueue(self, oper, oper_body, do_trace=True):
+    def _publish_to_ifmap_enqueue(self, oper, oper_body, do_trace=True,
+                                  imids=None):
         # safety check, if we proceed ifmap-server reports error
         # asking for update|delete in publish
         if not oper_body:
             return
-        self._queue.put((oper, oper_body, do_trace))
+        # imids are the identities oper_body touches, requests on same
+        # identity are published in order. None orders against all.
+        self._queue.put((oper, oper_body, do_trace, imids))
     # end _publish_to_ifmap_enqueue
 
     def _ifmap_dequeue_task(self):
@@ -440,70 +479,197 @@ class VncIfmapClient(object):
                 self.config_log(tb, level=SandeshLevel.SYS_ERR)
 
     def _publish_to_ifmap_dequeue(self):
-        def _publish(requests, traces, publish_discovery=False):
-            ok = True
-            if requests:
-                ok, msg = self._publish_to_ifmap(''.join(requests))
-            for trace in traces:
-                if ok:
-                    trace_msg(trace, 'IfmapTraceBuf', self._sandesh)
-                else:
-                    trace_msg(trace, 'IfmapTraceBuf', self._sandesh,
-                              error_msg=msg)
-            if publish_discovery and ok:
-                self._get_api_server().publish_ifmap_to_discovery()
-        # end _publish
-
+        # Queued requests are collected into one batch per oper, since
+        # ifmap does not like different operations in same message.
+        # A request is moved ahead of requests in the other batch unless
+        # they share an identity, in which case the other batch is sent
+        # first. Batches are sent on max message size or when queue
+        # drains, upto ifmap_max_inflight of them awaiting response.
+        def _new_batch(oper):
+            return {'oper': oper, 'requests': [], 'size': 0,
+                    'imids': set(), 'barrier': False, 'traces': []}
+
+        def _send(batches, oper):
+            self._publish_batch_send(batches[oper])
+            batches[oper] = _new_batch(oper)
+
+        args = self._get_api_server()._args
+        depth_hist = self._publish_histograms['queue_depth']
         while True:
             # block until there is data in the queue
-            (oper, oper_body, do_trace) = self._queue.get()
-            requests = []
-            requests_len = 0
-            traces = []
-            while True:
-                # drain the queue till empty or max message size
-                # or change of oper because ifmap does not like
-                # different operations in same message
+            queue = self._queue
+            item = queue.get()
+            batches = {'update': _new_batch('update'),
+                       'delete': _new_batch('delete')}
+            while item:
+                depth_hist.observe(queue.qsize() + 1)
+                (oper, oper_body, do_trace, imids) = item
                 if oper == 'publish_discovery':
-                    _publish(requests, traces, True)
+                    _send(batches, 'delete')
+                    _send(batches, 'update')
+                    self._publish_wait(lambda: not self._publish_inflight)
+                    if self._conn_state == ConnectionStatus.UP:
+                        self._get_api_server().publish_ifmap_to_discovery()
                     break
+
+                other = batches['delete' if oper == 'update' else 'update']
+                if other['requests'] and (imids is None or other['barrier']
+                    or not other['imids'].isdisjoint(imids)):
+                    _send(batches, other['oper'])
+
+                batch = batches[oper]
+                if imids is None:
+                    batch['barrier'] = True
+                else:
+                    batch['imids'].update(imids)
                 if do_trace:
                     trace = self._generate_ifmap_trace(oper, oper_body)
-                    traces.append(trace)
-                requests.append(oper_body)
-                requests_len += len(oper_body)
-                if (requests_len >
-                    self._get_api_server()._args.ifmap_max_message_size):
-                    _publish(requests, traces)
+                    batch['traces'].append(trace)
+                batch['requests'].append(oper_body)
+                batch['size'] += len(oper_body)
+                self._publish_pending += 1
+                if batch['size'] > args.ifmap_max_message_size:
+                    _send(batches, oper)
+
+                if queue is not self._queue:
+                    # connection reset, batches are stale
                     break
-                old_oper = oper
                 try:
-                    (oper, oper_body, do_trace) = self._queue.get_nowait()
-                    if oper != old_oper:
-                        _publish(requests, traces)
-                        requests = []
-                        requests_len = 0
-                        traces = []
-                        continue
+                    item = queue.get_nowait()
                 except Empty:
-                    _publish(requests, traces)
-                    break
+                    _send(batches, 'delete')
+                    _send(batches, 'update')
+                    item = None
     # end _publish_to_ifmap_dequeue
 
-    def _publish_to_ifmap(self, oper_body):
+    def _publish_wait(self, ready):
+        while not ready():
+            self._publish_done.clear()
+            self._publish_done.wait()
+    # end _publish_wait
+
+    def _publish_batch_send(self, batch):
+        if not batch['requests']:
+            return
+
+        def _ready():
+            max_inflight = max(1,
+                self._get_api_server()._args.ifmap_max_inflight)
+            if len(self._publish_inflight) >= max_inflight:
+                return False
+            # keep order with in flight batches on same identity
+            for sent in self._publish_inflight:
+                if (batch['barrier'] or sent['barrier'] or
+                    not batch['imids'].isdisjoint(sent['imids'])):
+                    return False
+            return True
+
+        generation = self._publish_generation
+        self._publish_wait(_ready)
+        if generation != self._publish_generation:
+            return
+
+        self._publish_histograms['batch_size'].observe(
+            len(batch['requests']))
+        batch['generation'] = generation
+        self._publish_inflight.append(batch)
+        if self._publish_clients:
+            mapclient = self._publish_clients.pop()
+        else:
+            mapclient = client(("%s" % (self._ifmap_srv_ip),
+                                "%s" % (self._ifmap_srv_port)),
+                               self._username, self._password,
+                               self._NAMESPACES, self._ssl_options)
+        gevent.spawn(self._publish_batch, batch, mapclient)
+    # end _publish_batch_send
+
+    def _publish_batch(self, batch, mapclient):
+        ok = False
+        msg = None
+        start_time = time.time()
+        try:
+            ok, msg = self._publish_to_ifmap(''.join(batch['requests']),
+                                             mapclient)
+        finally:
+            if batch['generation'] == self._publish_generation:
+                self._publish_inflight.remove(batch)
+                self._publish_pending -= len(batch['requests'])
+                self._publish_clients.append(mapclient)
+                self._publish_done.set()
+
+        self._publish_histograms['publish_latency'].observe(
+            time.time() - start_time)
+        self._publish_count += 1
+        if not ok:
+            self._publish_errors += 1
+        for trace in batch['traces']:
+            if ok:
+                trace_msg(trace, 'IfmapTraceBuf', self._sandesh)
+            else:
+                trace_msg(trace, 'IfmapTraceBuf', self._sandesh,
+                          error_msg=msg)
+    # end _publish_batch
+
+    def is_idle(self):
+        # everything enqueued so far has been sent to ifmap server
+        return self._queue.empty() and self._publish_pending == 0
+    # end is_idle
+
+    def sandesh_publish_stats_handle_request(self, req):
+        histograms = []
+        for name, hist in sorted(self._publish_histograms.items()):
+            buckets = [IfmapPublishHistogramBucket(le=le, count=count)
+                       for le, count in hist.buckets()]
+            histograms.append(IfmapPublishHistogram(name=name,
+                count=hist.count, sum=hist.sum, buckets=buckets))
+
+        resp = IfmapPublishStatsResp(queue_depth=self._queue.qsize(),
+                                     pending=self._publish_pending,
+                                     in_flight=len(self._publish_inflight),
+                                     publishes=self._publish_count,
+                                     publish_errors=self._publish_errors,
+                                     histograms=histograms)
+        resp.response(req.context())
+    # end sandesh_publish_stats_handle_request
+
+    def has_published_graph(self):
+        # ifmap server keeps metadata published with lifetime forever
+        # only while it runs, links from config-root to its children
+        # tell whether it still holds what was published before
+        root_cls = self._db_client_mgr.get_resource_class('config-root')
+        match_links = ' or '.join('contrail:%s' %(meta)
+            for meta in root_cls.children_field_metas.values())
+        try:
+            result = cfgm_common.imid.ifmap_read(self._mapclient,
+                'contrail:config-root:root', match_links, match_links)
+            return len(cfgm_common.imid.parse_search_result(result)) > 0
+        except Exception as e:
+            self.config_log('Error reading config-root from ifmap: %s'
+                            %(str(e)), level=SandeshLevel.SYS_ERR)
+            return False
+    # end has_published_graph
+
+    def _publish_to_ifmap(self, oper_body, mapclient=None):
+        if mapclient is None:
+            mapclient = self._mapclient
         try:
             not_published = True
             retry_count = 0
             resp_xml = None
             while not_published:
                 sess_id = self._mapclient.get_session_id()
+                mapclient.set_session_id(sess_id)
+                mapclient.set_publisher_id(self._mapclient.get_publisher_id())
                 req_xml = PublishRequest(sess_id, oper_body)
-                resp_xml = self._mapclient.call('publish', req_xml)
-
-                resp_doc = etree.parse(StringIO.StringIO(resp_xml))
-                err_codes = resp_doc.xpath(
-                    '/env:Envelope/env:Body/ifmap:response/errorResult/@errorCode',
-                    namespaces=self._NAMESPACES)
+                resp_xml = mapclient.call('publish', req_xml)
+
+                # parse response only when it is not a plain success
+                err_codes = None
+                if 'errorResult' in resp_xml:
+                    resp_doc = etree.parse(StringIO.StringIO(resp_xml))
+                    err_codes = resp_doc.xpath(
+                        '/env:Envelope/env:Body/ifmap:response/errorResult/@errorCode',
+                        namespaces=self._NAMESPACES)
                 if err_codes:
                     if retry_count == 0:
                         log_str = 'Error publishing to ifmap, req: %s, resp: %s' \
@@ -580,7 +746,7 @@ class VncIfmapClient(object):
         mapclient = self._mapclient
 
         del_str = self._build_request(self_imid, 'self', [meta_name], True)
-        self._publish_to_ifmap_enqueue('delete', del_str)
+        self._publish_to_ifmap_enqueue('delete', del_str, imids=[self_imid])
 
         # del meta from cache and del id if this was last meta
         if meta_name:
@@ -598,7 +764,8 @@ class VncIfmapClient(object):
         for id2, metadata in meta_list:
             del_str += self._build_request(id1, id2, [metadata], True)
 
-        self._publish_to_ifmap_enqueue('delete', del_str)
+        imids = [id1] + [id2 for id2, metadata in meta_list]
+        self._publish_to_ifmap_enqueue('delete', del_str, imids=imids)
 
         # del meta,id2 from cache and del id if this was last meta
         def _id_to_metas_delete(id1, id2, meta_name):
@@ -689,7 +856,8 @@ class VncIfmapClient(object):
                    self._id_to_metas[id2][meta_name] = [{'meta':m,
                                                          'id': self_imid}]
         upd_str = ''.join(requests)
-        self._publish_to_ifmap_enqueue('update', upd_str)
+        imids = [self_imid] + [id2 for id2 in update if id2 != 'self']
+        self._publish_to_ifmap_enqueue('update', upd_str, imids=imids)
     # end _publish_update
 
     def fq_name_to_ifmap_id(self, obj_type, fq_name):
@@ -708,6 +876,10 @@ class VncServerCassandraClient(VncCassandraClient):
     _USERAGENT_KEYSPACE_NAME = 'useragent'
     _USERAGENT_KV_CF_NAME = 'useragent_keyval_table'
 
+    # uuids read per call of the walk function and max calls in flight
+    _WALK_CHUNK_SIZE = 500
+    _WALK_POOL_SIZE = 10
+
     @classmethod
     def get_db_info(cls):
         db_info = VncCassandraClient.get_db_info() + \
@@ -716,7 +888,8 @@ class VncServerCassandraClient(VncCassandraClient):
     # end get_db_info
 
     def __init__(self, db_client_mgr, cass_srv_list, reset_config, db_prefix,
-                      cassandra_credential):
+                      cassandra_credential, cache_uuid_to_fq_name_size=None,
+                      indexed_props=None):
         self._db_client_mgr = db_client_mgr
         keyspaces = {
             self._USERAGENT_KEYSPACE_NAME: [(self._USERAGENT_KV_CF_NAME, None)]
@@ -729,8 +902,13 @@ class VncServerCassandraClient(VncCassandraClient):
         super(VncServerCassandraClient, self).__init__(
             cass_srv_list, db_prefix, keyspaces, self.config_log,
             generate_url=db_client_mgr.generate_url,
-            reset_config=reset_config,credential=cassandra_credential)
+            reset_config=reset_config,credential=cassandra_credential,
+            cache_uuid_to_fq_name_size=cache_uuid_to_fq_name_size,
+            indexed_props=indexed_props, build_prop_index=True)
         self._useragent_kv_cf = self._cf_dict[self._USERAGENT_KV_CF_NAME]
+        # walk name -> progress of last walk with that name
+        self._walk_stats = {}
+        DbWalkStatsReq.handle_request = self.sandesh_walk_stats_handle_request
     # end __init__
 
     def config_log(self, msg, level):
@@ -935,40 +1113,94 @@ class VncServerCassandraClient(VncCassandraClient):
         self._useragent_kv_cf.remove(key)
     # end useragent_kv_delete
 
-    def walk(self, fn):
+    def sandesh_walk_stats_handle_request(self, req):
+        walks = []
+        for walk_name, walk_stats in self._walk_stats.items():
+            end_time = walk_stats['end_time'] or datetime.datetime.utcnow()
+            elapsed = end_time - walk_stats['start_time']
+            elapsed_secs = elapsed.days * 86400 + elapsed.seconds + \
+                           elapsed.microseconds / 1e6
+            objects_per_sec = 0
+            if elapsed_secs:
+                objects_per_sec = walk_stats['objects_walked'] / elapsed_secs
+            walks.append(DbWalkStats(
+                name=walk_name,
+                in_progress=walk_stats['end_time'] is None,
+                start_time=str(walk_stats['start_time']),
+                elapsed_secs=elapsed_secs,
+                objects_scanned=walk_stats['objects_scanned'],
+                objects_walked=walk_stats['objects_walked'],
+                chunks_walked=walk_stats['chunks_walked'],
+                errors=walk_stats['errors'],
+                objects_per_sec=objects_per_sec))
+        resp = DbWalkStatsResp(walks=walks)
+        resp.response(req.context())
+    # end sandesh_walk_stats_handle_request
+
+    def walk(self, fn, walk_name='walk'):
+        # Objects are scanned once for (type, fq_name) and as soon as a
+        # type has _WALK_CHUNK_SIZE uuids they are handed to fn on a pool
+        # of _WALK_POOL_SIZE greenlets, so chunk reads overlap with each
+        # other and with the scan. Spawn blocks on a full pool which
+        # bounds reads in flight, fn's own consumer (e.g. the bounded
+        # ifmap publish queue) throttles it further.
         walk_results = []
-        obj_infos = [x for x in self._obj_uuid_cf.get_range(
-                                          columns=['type', 'fq_name'],
-                                          column_count=self._MAX_COL)]
+        walk_stats = {'start_time': datetime.datetime.utcnow(),
+                      'end_time': None,
+                      'objects_scanned': 0,
+                      'objects_walked': 0,
+                      'chunks_walked': 0,
+                      'errors': 0}
+        self._walk_stats[walk_name] = walk_stats
+        walk_pool = gevent.pool.Pool(self._WALK_POOL_SIZE)
+
+        def walk_chunk(obj_type, uuid_list):
+            try:
+                result = fn(obj_type, uuid_list)
+                if result:
+                    walk_results.append(result)
+            except Exception as e:
+                walk_stats['errors'] += 1
+                self.config_log('Error in db walk invoke %s' %(str(e)),
+                                level=SandeshLevel.SYS_ERR)
+            walk_stats['objects_walked'] += len(uuid_list)
+            walk_stats['chunks_walked'] += 1
+        # end walk_chunk
+
         type_to_object = {}
+        type_to_count = {}
+        obj_infos = self._obj_uuid_cf.get_range(columns=['type', 'fq_name'],
+                                                column_count=self._MAX_COL)
         for obj_uuid, obj_col in obj_infos:
             try:
                 obj_type = json.loads(obj_col['type'])
                 obj_fq_name = json.loads(obj_col['fq_name'])
                 # prep cache to avoid n/w round-trip in db.read for ref
                 self.cache_uuid_to_fq_name_add(obj_uuid, obj_fq_name, obj_type)
-
-                try:
-                    type_to_object[obj_type].append(obj_uuid)
-                except KeyError:
-                    type_to_object[obj_type] = [obj_uuid]
             except Exception as e:
+                walk_stats['errors'] += 1
                 self.config_log('Error in db walk read %s' %(str(e)),
                                 level=SandeshLevel.SYS_ERR)
                 continue
 
+            walk_stats['objects_scanned'] += 1
+            type_to_count[obj_type] = type_to_count.get(obj_type, 0) + 1
+            uuid_list = type_to_object.setdefault(obj_type, [])
+            uuid_list.append(obj_uuid)
+            if len(uuid_list) >= self._WALK_CHUNK_SIZE:
+                walk_pool.spawn(walk_chunk, obj_type, uuid_list)
+                type_to_object[obj_type] = []
+
         for obj_type, uuid_list in type_to_object.items():
-            try:
-                self.config_log('Resync: obj_type %s len %s'
-                                %(obj_type, len(uuid_list)),
-                                level=SandeshLevel.SYS_INFO)
-                result = fn(obj_type, uuid_list)
-                if result:
-                    walk_results.append(result)
-            except Exception as e:
-                self.config_log('Error in db walk invoke %s' %(str(e)),
-                                level=SandeshLevel.SYS_ERR)
-                continue
+            if uuid_list:
+                walk_pool.spawn(walk_chunk, obj_type, uuid_list)
+        walk_pool.join()
+
+        walk_stats['end_time'] = datetime.datetime.utcnow()
+        for obj_type, obj_count in type_to_count.items():
+            self.config_log('%s: obj_type %s len %s'
+                            %(walk_name, obj_type, obj_count),
+                            level=SandeshLevel.SYS_INFO)
 
         return walk_results
     # end walk
@@ -981,6 +1213,8 @@ class VncServerKombuClient(VncKombuClient):
         self._db_client_mgr = db_client_mgr
         self._sandesh = db_client_mgr._sandesh
         self._ifmap_db = ifmap_db
+        # greenlet -> notifications held back during a bulk request
+        self._bulk_pending = {}
         listen_port = db_client_mgr.get_server_port()
         q_name = 'vnc_config.%s-%s' %(socket.gethostname(), listen_port)
         super(VncServerKombuClient, self).__init__(
@@ -1009,6 +1243,31 @@ class VncServerKombuClient(VncKombuClient):
         return self.num_pending_messages()
     # end dbe_oper_publish_pending
 
+    def publish(self, message):
+        pending = self._bulk_pending.get(gevent.getcurrent())
+        if pending is not None:
+            pending.append(message)
+            return
+        super(VncServerKombuClient, self).publish(message)
+    # end publish
+
+    def bulk_begin(self):
+        self._bulk_pending[gevent.getcurrent()] = []
+    # end bulk_begin
+
+    def bulk_send(self):
+        # held back notifications go out as a single message
+        pending = self._bulk_pending.get(gevent.getcurrent())
+        if pending:
+            super(VncServerKombuClient, self).publish(list(pending))
+            del pending[:]
+    # end bulk_send
+
+    def bulk_end(self):
+        # drops notifications not sent yet
+        self._bulk_pending.pop(gevent.getcurrent(), None)
+    # end bulk_end
+
     @ignore_exceptions
     def _generate_msgbus_notify_trace(self, oper_info):
         req_id = oper_info.get('request-id',
@@ -1078,6 +1337,9 @@ class VncServerKombuClient(VncKombuClient):
             if not ok:
                 self.config_log(result, level=SandeshLevel.SYS_ERR)
                 raise Exception(result)
+            self._db_client_mgr.ifmap_published(obj_info['type'],
+                obj_info['uuid'], obj_dict, obj_info['imid'],
+                obj_info.get('parent_imid'))
     #end _dbe_create_notification
 
     def dbe_update_publish(self, obj_type, obj_ids):
@@ -1113,6 +1375,8 @@ class VncServerKombuClient(VncKombuClient):
             (ok, ifmap_result) = method(ifmap_id, new_obj_dict)
             if not ok:
                 raise Exception(ifmap_result)
+            self._db_client_mgr.ifmap_published(obj_info['type'],
+                obj_info['uuid'], new_obj_dict, ifmap_id)
     #end _dbe_update_notification
 
     def dbe_delete_publish(self, obj_type, obj_ids, obj_dict):
@@ -1144,6 +1408,7 @@ class VncServerKombuClient(VncKombuClient):
             if not ok:
                 self.config_log(ifmap_result, level=SandeshLevel.SYS_ERR)
                 raise Exception(ifmap_result)
+            self._db_client_mgr.ifmap_unpublished(obj_info['uuid'])
     #end _dbe_delete_notification
 
 # end class VncKombuClient
@@ -1196,7 +1461,7 @@ class VncZkClient(object):
                 self._zk_client, self._subnet_path+'/'+subnet+'/',
                 size=size, start_idx=start_subnet, reverse=not addr_from_start,
                 alloc_list=subnet_alloc_list,
-                max_alloc=self._MAX_SUBNET_ADDR_ALLOC)
+                max_alloc=self._MAX_SUBNET_ADDR_ALLOC, checkpoint=True)
     # end create_subnet_allocator
 
     def delete_subnet_allocator(self, subnet):
@@ -1248,6 +1513,17 @@ class VncZkClient(object):
             allocator.delete(addr)
     # end subnet_free_req
 
+    def subnet_alloc_batch_req(self, subnet, count, value=None):
+        allocator = self._get_subnet_allocator(subnet)
+        return allocator.alloc_batch(count, value=value)
+    # end subnet_alloc_batch_req
+
+    def subnet_free_batch_req(self, subnet, addrs):
+        allocator = self._get_subnet_allocator(subnet)
+        if allocator:
+            allocator.delete_batch(addrs)
+    # end subnet_free_batch_req
+
     def create_fq_name_to_uuid_mapping(self, obj_type, fq_name, id):
         fq_name_str = ':'.join(fq_name)
         zk_path = self._fq_name_to_uuid_path+'/%s:%s' %(obj_type.replace('-', '_'),
@@ -1270,6 +1546,8 @@ class VncZkClient(object):
 
 
 class VncDbClient(object):
+    _IFMAP_SNAPSHOT_VERSION = 1
+
     def __init__(self, api_svr_mgr, ifmap_srv_ip, ifmap_srv_port, uname,
                  passwd, cass_srv_list,
                  rabbit_servers, rabbit_port, rabbit_user, rabbit_password,
@@ -1314,6 +1592,16 @@ class VncDbClient(object):
 
         self._db_resync_done = gevent.event.Event()
 
+        # uuid -> (obj-type, id_perms.last_modified, imid, parent-imid)
+        # of objects as published to ifmap, saved along with ifmap
+        # metadata cache in the resync snapshot
+        self._ifmap_snapshot_file = api_svr_mgr._args.ifmap_resync_snapshot
+        self._ifmap_published = {}
+        self._ifmap_published_gen = 0
+        # objects of the snapshot a resync is done against
+        self._ifmap_resync_base = None
+        self._ifmap_snapshot_greenlet = None
+
         msg = "Connecting to ifmap on %s:%s as %s" \
               % (ifmap_srv_ip, ifmap_srv_port, uname)
         self.config_log(msg, level=SandeshLevel.SYS_NOTICE)
@@ -1324,8 +1612,11 @@ class VncDbClient(object):
         msg = "Connecting to cassandra on %s" % (cass_srv_list,)
         self.config_log(msg, level=SandeshLevel.SYS_NOTICE)
 
+        indexed_props = [tuple(type_prop.split(':', 1))
+                         for type_prop in api_svr_mgr._args.indexed_props]
         self._cassandra_db = VncServerCassandraClient(
-            self, cass_srv_list, reset_config, db_prefix, cassandra_credential)
+            self, cass_srv_list, reset_config, db_prefix, cassandra_credential,
+            api_svr_mgr._args.uuid_cache_size, indexed_props)
 
         msg = "Connecting to zookeeper on %s" % (zk_server_ip)
         self.config_log(msg, level=SandeshLevel.SYS_NOTICE)
@@ -1368,7 +1659,21 @@ class VncDbClient(object):
         # Read contents from cassandra and publish to ifmap
         mapclient = self._ifmap_db._mapclient
         start_time = datetime.datetime.utcnow()
-        self._cassandra_db.walk(self._dbe_resync)
+        snapshot = self._ifmap_snapshot_load()
+        self._ifmap_published = {}
+        self._ifmap_published_gen += 1
+        if snapshot:
+            # resync against what ifmap server already has, only
+            # objects changed since get republished
+            self._ifmap_db._id_to_metas = snapshot['id_to_metas']
+            self._ifmap_resync_base = snapshot['objects']
+        self._cassandra_db.walk(self._dbe_resync, 'resync')
+        if snapshot:
+            self._ifmap_resync_deleted()
+            self._ifmap_resync_base = None
+        if self._ifmap_snapshot_file and not self._ifmap_snapshot_greenlet:
+            self._ifmap_snapshot_greenlet = gevent.spawn(
+                self._ifmap_snapshot_task)
         self._ifmap_db._publish_to_ifmap_enqueue('publish_discovery', 1)
         self.config_log("Cassandra DB walk completed.",
             level=SandeshLevel.SYS_INFO)
@@ -1384,16 +1689,137 @@ class VncDbClient(object):
         self._db_resync_done.wait()
     # end wait_for_resync_done
 
+    def ifmap_published(self, obj_type, obj_uuid, obj_dict, imid,
+                        parent_imid=None):
+        if not self._ifmap_snapshot_file:
+            return
+        old_info = self._ifmap_published.get(obj_uuid)
+        if parent_imid is None and old_info:
+            parent_imid = old_info[3]
+        last_modified = (obj_dict.get('id_perms') or {}).get('last_modified')
+        self._ifmap_published[obj_uuid] = (obj_type.replace('-', '_'),
+                                           last_modified, imid, parent_imid)
+        self._ifmap_published_gen += 1
+    # end ifmap_published
+
+    def ifmap_unpublished(self, obj_uuid):
+        if self._ifmap_published.pop(obj_uuid, None):
+            self._ifmap_published_gen += 1
+    # end ifmap_unpublished
+
+    def _ifmap_snapshot_load(self):
+        if not self._ifmap_snapshot_file:
+            return None
+        try:
+            with open(self._ifmap_snapshot_file, 'rb') as f:
+                snapshot = cPickle.load(f)
+        except IOError:
+            return None
+        except Exception as e:
+            self.config_log('Ignoring ifmap resync snapshot %s: %s'
+                            %(self._ifmap_snapshot_file, str(e)),
+                            level=SandeshLevel.SYS_ERR)
+            return None
+
+        if snapshot.get('version') != self._IFMAP_SNAPSHOT_VERSION:
+            return None
+        if not self._ifmap_db.has_published_graph():
+            # ifmap server restarted, it has to get everything
+            self.config_log('Ignoring ifmap resync snapshot, '
+                            'ifmap server has no config',
+                            level=SandeshLevel.SYS_NOTICE)
+            return None
+        return snapshot
+    # end _ifmap_snapshot_load
+
+    def _ifmap_snapshot_save(self):
+        snapshot = {'version': self._IFMAP_SNAPSHOT_VERSION,
+                    'objects': self._ifmap_published,
+                    'id_to_metas': self._ifmap_db._id_to_metas}
+        tmp_file = '%s.tmp' %(self._ifmap_snapshot_file)
+        with open(tmp_file, 'wb') as f:
+            cPickle.dump(snapshot, f, cPickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_file, self._ifmap_snapshot_file)
+    # end _ifmap_snapshot_save
+
+    def _ifmap_snapshot_task(self):
+        # save only when all that is cached has been sent to ifmap
+        # server, an object whose last_modified got saved ahead of its
+        # metadata would be skipped by the next resync
+        saved_gen = None
+        while True:
+            gevent.sleep(self._api_svr_mgr._args.ifmap_snapshot_interval)
+            if (saved_gen == self._ifmap_published_gen or
+                self._ifmap_resync_base is not None or
+                not self._ifmap_db.is_idle()):
+                continue
+            try:
+                gen = self._ifmap_published_gen
+                self._ifmap_snapshot_save()
+                saved_gen = gen
+            except Exception as e:
+                self.config_log('Error saving ifmap resync snapshot: %s'
+                                %(str(e)), level=SandeshLevel.SYS_ERR)
+    # end _ifmap_snapshot_task
+
+    def _ifmap_resync_changed(self, obj_type, obj_uuids):
+        # uuids whose last_modified differs from the snapshot, rest are
+        # taken as published already
+        obj_rows = self._cassandra_db._obj_uuid_cf.multiget(obj_uuids,
+            columns=['prop:id_perms'])
+        changed_uuids = []
+        for obj_uuid in obj_uuids:
+            base_info = self._ifmap_resync_base.get(obj_uuid)
+            try:
+                id_perms = json.loads(obj_rows[obj_uuid]['prop:id_perms'])
+                last_modified = id_perms.get('last_modified')
+            except (KeyError, ValueError):
+                last_modified = None
+            if (base_info and last_modified and
+                base_info[1] == last_modified):
+                self._ifmap_published[obj_uuid] = base_info
+            else:
+                changed_uuids.append(obj_uuid)
+        return changed_uuids
+    # end _ifmap_resync_changed
+
+    def _ifmap_resync_deleted(self):
+        # objects of the snapshot gone from db since
+        num_deleted = 0
+        for obj_uuid, base_info in self._ifmap_resync_base.items():
+            if obj_uuid in self._ifmap_published:
+                continue
+            (obj_type, _, my_imid, parent_imid) = base_info
+            try:
+                method = getattr(self._ifmap_db,
+                                 "_ifmap_%s_delete" % (obj_type))
+                method({'uuid': obj_uuid, 'imid': my_imid,
+                        'parent_imid': parent_imid})
+                num_deleted += 1
+            except Exception as e:
+                self.config_object_error(
+                    obj_uuid, None, obj_type, 'dbe_resync:ifmap_delete',
+                    str(e))
+        num_unchanged = len([obj_uuid
+            for obj_uuid, obj_info in self._ifmap_published.items()
+            if obj_info is self._ifmap_resync_base.get(obj_uuid)])
+        self.config_log('Resync from snapshot: %s of %s objects unchanged, '
+                        '%s deleted' %(num_unchanged,
+                                       len(self._ifmap_resync_base),
+                                       num_deleted),
+                        level=SandeshLevel.SYS_NOTICE)
+    # end _ifmap_resync_deleted
+
     def db_check(self):
         # Read contents from cassandra and report any read exceptions
-        check_results = self._cassandra_db.walk(self._dbe_check)
+        check_results = self._cassandra_db.walk(self._dbe_check, 'check')
 
         return check_results
     # end db_check
 
     def db_read(self):
         # Read contents from cassandra
-        read_results = self._cassandra_db.walk(self._dbe_read)
+        read_results = self._cassandra_db.walk(self._dbe_read, 'read')
         return read_results
     # end db_check
 
@@ -1474,6 +1900,10 @@ class VncDbClient(object):
     # end update_subnet_uuid
 
     def _dbe_resync(self, obj_type, obj_uuids):
+        if self._ifmap_resync_base is not None:
+            obj_uuids = self._ifmap_resync_changed(obj_type, obj_uuids)
+            if not obj_uuids:
+                return
         obj_class = utils.obj_type_to_vnc_class(obj_type, __name__)
         obj_fields = list(obj_class.prop_fields) + list(obj_class.ref_fields)
         (ok, obj_dicts) = self._cassandra_db.read(
@@ -1514,8 +1944,19 @@ class VncDbClient(object):
             try:
                 obj_ids = {'uuid': obj_uuid, 'imid': my_imid,
                            'parent_imid': parent_imid}
-                method = getattr(self._ifmap_db, "_ifmap_%s_create" % (obj_type))
-                (ok, result) = method(obj_ids, obj_dict)
+                if (self._ifmap_resync_base and
+                    obj_uuid in self._ifmap_resync_base and
+                    my_imid in self._ifmap_db._id_to_metas):
+                    # published before, drop what is no longer there
+                    method = getattr(self._ifmap_db,
+                                     "_ifmap_%s_update" % (obj_type))
+                    (ok, result) = method(my_imid, obj_dict)
+                else:
+                    method = getattr(self._ifmap_db,
+                                     "_ifmap_%s_create" % (obj_type))
+                    (ok, result) = method(obj_ids, obj_dict)
+                self.ifmap_published(obj_type, obj_uuid, obj_dict,
+                                     my_imid, parent_imid)
             except Exception as e:
                 self.config_object_error(
                     obj_uuid, None, obj_type, 'dbe_resync:ifmap_create', str(e))
@@ -1525,6 +1966,12 @@ class VncDbClient(object):
 
 
     def _dbe_check(self, obj_type, obj_uuids):
+        try:
+            self._cassandra_db.read(obj_type, obj_uuids)
+            return
+        except Exception:
+            # find the culprit one by one
+            pass
         for obj_uuid in obj_uuids:
             try:
                 (ok, obj_dict) = self._cassandra_db.read(obj_type, [obj_uuid])
@@ -1533,6 +1980,14 @@ class VncDbClient(object):
      # end _dbe_check
 
     def _dbe_read(self, obj_type, obj_uuids):
+        try:
+            (ok, obj_dicts) = self._cassandra_db.read(obj_type, obj_uuids)
+            for obj_dict in obj_dicts:
+                obj_dict['type'] = obj_type
+            return obj_dicts
+        except Exception:
+            # skip over the culprits one by one
+            pass
         results = []
         for obj_uuid in obj_uuids:
             try:
@@ -1735,10 +2190,15 @@ class VncDbClient(object):
         (ok, cassandra_result) = self._cassandra_db.list(
                  method_name, parent_uuids=parent_uuids,
                  back_ref_uuids=back_ref_uuids, obj_uuids=obj_uuids,
-                 count=count, filters=filters)
+                 count=count, filters=filters, paginate_start=paginate_start,
+                 paginate_count=paginate_count)
         return (ok, cassandra_result)
     # end dbe_list
 
+    def list_page_marker(self, fq_name, obj_uuid):
+        return self._cassandra_db.list_page_marker(fq_name, obj_uuid)
+    # end list_page_marker
+
     @dbe_trace('delete')
     def dbe_delete(self, obj_type, obj_ids, obj_dict):
         method_name = obj_type.replace('-', '_')
@@ -1755,6 +2215,26 @@ class VncDbClient(object):
         return ok, cassandra_result
     # end dbe_delete
 
+    def dbe_bulk_begin(self):
+        # db writes and notifications of this greenlet are held back
+        # till dbe_bulk_send()
+        self._cassandra_db.bulk_begin()
+        self._msgbus.bulk_begin()
+    # end dbe_bulk_begin
+
+    def dbe_bulk_send(self):
+        # notify only after the rows are written so that subscribers
+        # reading them back find them
+        self._cassandra_db.bulk_send()
+        self._msgbus.bulk_send()
+    # end dbe_bulk_send
+
+    def dbe_bulk_end(self):
+        # drops writes and notifications not sent yet
+        self._cassandra_db.bulk_end()
+        self._msgbus.bulk_end()
+    # end dbe_bulk_end
+
     def dbe_release(self, obj_type, obj_fq_name):
         self._zk_db.delete_fq_name_to_uuid_mapping(obj_type, obj_fq_name)
     # end dbe_release
@@ -1807,6 +2287,14 @@ class VncDbClient(object):
         return self._zk_db.subnet_free_req(subnet, addr)
     # end subnet_free_req
 
+    def subnet_alloc_batch_req(self, subnet, count, value=None):
+        return self._zk_db.subnet_alloc_batch_req(subnet, count, value)
+    # end subnet_alloc_batch_req
+
+    def subnet_free_batch_req(self, subnet, addrs):
+        return self._zk_db.subnet_free_batch_req(subnet, addrs)
+    # end subnet_free_batch_req
+
     def subnet_create_allocator(self, subnet, subnet_alloc_list,
                                 addr_from_start, should_persist,
                                 start_subnet, size):
@@ -32,6 +32,23 @@ class QuotaHelper(object):
             quota_limit = cls.default_quota['defaults']
         return quota_limit
 
+    @classmethod
+    def has_quota_limit(cls, db_conn, obj_type, fq_name):
+        # whether creates of the resource in the project of fq_name are
+        # limited, they are taken as limited if the project is not found
+        quota_type = obj_type.replace('-', '_')
+        if quota_type == 'defaults' or not hasattr(QuotaType(), quota_type):
+            return False
+        try:
+            proj_uuid = db_conn.fq_name_to_uuid('project', fq_name[0:2])
+        except cfgm_common.exceptions.NoIdError:
+            return True
+
+        (ok, proj_dict) = cls.get_project_dict_for_quota(proj_uuid, db_conn)
+        if not ok:
+            return True
+        return cls.get_quota_limit(proj_dict, obj_type) >= 0
+
     @classmethod
     def check_quota_limit(cls, proj_dict, obj_type, quota_count):
         quota_limit = cls.get_quota_limit(proj_dict, obj_type)
@@ -72,12 +89,12 @@ class QuotaHelper(object):
                 return (False, (500, 'Internal error : Failed to read current '
                                 'resource count'))
         else:
-            (ok, res_list) = db_conn.dbe_list(obj_type, 
-                                              back_ref_uuids=[proj_uuid])
+            (ok, quota_count) = db_conn.dbe_list(obj_type,
+                                                 back_ref_uuids=[proj_uuid],
+                                                 count=True)
             if not ok:
                 return (False, (500, 'Internal error : Failed to read %s '
                                 'resource list' % obj_type))
-            quota_count = len(res_list)
 
         if quota_count >= quota_limit:
             msg = ('quota limit (%d) exceeded for resource %s'
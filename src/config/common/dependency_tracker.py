@@ -8,22 +8,57 @@ for physical router configuration manager
 """
 
 
+# reaction map -> (obj_type, from_type) -> ref types to walk
+_walk_maps = {}
+
+
+def _get_walk_map(reaction_map):
+    # Refs to types not in the reaction map never lead to a resource,
+    # leave them out of the walk. Computed once per reaction map.
+    cached = _walk_maps.get(id(reaction_map))
+    if cached is not None and cached[0] is reaction_map:
+        return cached[1]
+
+    walk_map = {}
+    for obj_type, reactions in reaction_map.items():
+        for from_type, ref_types in reactions.items():
+            walk_map[(obj_type, from_type)] = [
+                ref_type for ref_type in ref_types
+                if ref_type in reaction_map]
+    # keep reaction_map referenced so its id is not reused
+    _walk_maps[id(reaction_map)] = (reaction_map, walk_map)
+    return walk_map
+# end _get_walk_map
+
+
 class DependencyTracker(object):
 
     def __init__(self, object_class_map, reaction_map):
         self._reaction_map = reaction_map
+        self._walk_map = _get_walk_map(reaction_map)
         self._object_class_map = object_class_map
         self.resources = {}
+        # obj_type -> set of uuids in self.resources
+        self._visited = {}
+        self._visited_resources = self.resources
     # end __init__
 
     def _add_resource(self, obj_type, obj_uuid):
-        if obj_type in self.resources:
-            if obj_uuid in self.resources[obj_type]:
-                # already visited
-                return False
-            self.resources[obj_type].append(obj_uuid)
-        else:
+        if self._visited_resources is not self.resources:
+            # resources replaced by caller, visit again from there
+            self._visited = dict((res_type, set(uuids))
+                for res_type, uuids in self.resources.items())
+            self._visited_resources = self.resources
+        visited = self._visited.get(obj_type)
+        if visited is None:
+            self._visited[obj_type] = set([obj_uuid])
             self.resources[obj_type] = [obj_uuid]
+            return True
+        if obj_uuid in visited:
+            # already visited
+            return False
+        visited.add(obj_uuid)
+        self.resources[obj_type].append(obj_uuid)
         return True
     # end _add_resource
 
@@ -33,7 +68,11 @@ class DependencyTracker(object):
         if not self._add_resource(obj_type, obj.uuid):
             return
 
-        for ref_type in self._reaction_map[obj_type][from_type]:
+        ref_types = self._walk_map.get((obj_type, from_type))
+        if ref_types is None:
+            # not in the reaction map, raises KeyError as before
+            ref_types = self._reaction_map[obj_type][from_type]
+        for ref_type in ref_types:
             ref = getattr(obj, ref_type, None)
             if ref is None:
                 refs = getattr(obj, ref_type+'s', [])
@@ -44,7 +83,7 @@ class DependencyTracker(object):
             for ref in refs:
                 ref_obj = ref_class.get(ref)
                 if ref_obj is None:
-                    return
+                    continue
                 self.evaluate(ref_type, ref_obj, obj_type)
     # end evaluate
 # end DependencyTracker
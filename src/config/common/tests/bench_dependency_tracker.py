@@ -0,0 +1,144 @@
+#
+# Copyright (c) 2015 Juniper Networks, Inc. All rights reserved.
+#
+
+"""
+Microbenchmark of notification handling in config daemons. Replays a
+storm of interface update notifications against a synthetic graph the
+way svc-monitor does: look up the class in the object type map, then
+evaluate a DependencyTracker before and after the update.
+
+    python bench_dependency_tracker.py [--objects 20000] [--notifications 50000]
+"""
+import argparse
+import random
+import sys
+import time
+import uuid
+
+from cfgm_common.vnc_db import DBBase
+from cfgm_common.dependency_tracker import DependencyTracker
+
+
+class DBBaseBench(DBBase):
+    obj_type = __name__
+    __slots__ = ()
+
+
+class VirtualNetworkBench(DBBaseBench):
+    _dict = {}
+    obj_type = 'virtual_network'
+
+    def __init__(self, uuid, obj_dict):
+        self.uuid = uuid
+        self.virtual_machine_interfaces = set()
+        self.update_multiple_refs('virtual_machine_interface', obj_dict)
+
+
+class VirtualMachineBench(DBBaseBench):
+    _dict = {}
+    obj_type = 'virtual_machine'
+
+    def __init__(self, uuid, obj_dict):
+        self.uuid = uuid
+        self.virtual_machine_interfaces = set()
+        self.update_multiple_refs('virtual_machine_interface', obj_dict)
+
+
+class InstanceIpBench(DBBaseBench):
+    _dict = {}
+    obj_type = 'instance_ip'
+
+    def __init__(self, uuid, obj_dict):
+        self.uuid = uuid
+        self.virtual_machine_interfaces = set()
+        self.update_multiple_refs('virtual_machine_interface', obj_dict)
+
+
+class VirtualMachineInterfaceBench(DBBaseBench):
+    _dict = {}
+    obj_type = 'virtual_machine_interface'
+
+    def __init__(self, uuid, obj_dict):
+        self.uuid = uuid
+        self.virtual_network = None
+        self.virtual_machine = None
+        self.instance_ips = set()
+        self.update(obj_dict)
+
+    def update(self, obj_dict=None):
+        self.update_single_ref('virtual_network', obj_dict)
+        self.update_single_ref('virtual_machine', obj_dict)
+
+
+_REACTION_MAP = {
+    'virtual_machine_interface': {
+        'self': ['virtual_machine', 'virtual_network', 'instance_ip'],
+        'virtual_machine': [],
+        'virtual_network': [],
+    },
+    'virtual_machine': {
+        'self': ['virtual_machine_interface'],
+        'virtual_machine_interface': [],
+    },
+    'virtual_network': {
+        'self': [],
+        'virtual_machine_interface': [],
+    },
+}
+
+
+def load_graph(num_objects, vmis_per_vn=50):
+    vns = [str(uuid.uuid4()) for _ in range(max(1, num_objects / vmis_per_vn))]
+    vmis = [str(uuid.uuid4()) for _ in range(num_objects)]
+    for i, vmi in enumerate(vmis):
+        vm = str(uuid.uuid4())
+        iip = str(uuid.uuid4())
+        VirtualMachineInterfaceBench.locate(vmi, {
+            'virtual_network_refs': [{'uuid': vns[i % len(vns)]}],
+            'virtual_machine_back_refs': [{'uuid': vm}]})
+        VirtualMachineBench.locate(vm, {
+            'virtual_machine_interface_refs': [{'uuid': vmi}]})
+        InstanceIpBench.locate(iip, {
+            'virtual_machine_interface_refs': [{'uuid': vmi}]})
+    for i, vn in enumerate(vns):
+        VirtualNetworkBench.locate(vn, {
+            'virtual_machine_interface_back_refs': [
+                {'uuid': vmi} for vmi in vmis[i::len(vns)]]})
+    return vmis
+# end load_graph
+
+
+def notify(obj_type, obj_uuid):
+    obj_class = DBBaseBench.get_obj_type_map().get(obj_type)
+    obj = obj_class.get(obj_uuid)
+    dependency_tracker = DependencyTracker(
+        DBBaseBench.get_obj_type_map(), _REACTION_MAP)
+    dependency_tracker.evaluate(obj_type, obj)
+    dependency_tracker.evaluate(obj_type, obj)
+    return dependency_tracker.resources
+# end notify
+
+
+def main(args_str=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--objects', type=int, default=20000,
+                        help='Number of interfaces in the graph')
+    parser.add_argument('--notifications', type=int, default=50000,
+                        help='Number of notifications to replay')
+    args = parser.parse_args(args_str)
+
+    DBBase.init(None, None, None)
+    vmis = load_graph(args.objects)
+    storm = [random.choice(vmis) for _ in range(args.notifications)]
+
+    start = time.time()
+    for vmi in storm:
+        notify('virtual_machine_interface', vmi)
+    elapsed = time.time() - start
+    print 'notifications: %d in %.2fs (%.1f us/notification)' % (
+        len(storm), elapsed, elapsed * 1e6 / max(1, len(storm)))
+# end main
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
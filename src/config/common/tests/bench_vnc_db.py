@@ -0,0 +1,141 @@
+#
+# Copyright (c) 2015 Juniper Networks, Inc. All rights reserved.
+#
+
+"""
+Memory benchmark of the DBBase object store. Loads a synthetic graph of
+virtual networks, virtual machines and interfaces and reports the
+resident set size it takes.
+
+    python bench_vnc_db.py [--objects 100000] [--plain-sets]
+
+--plain-sets keeps refs in python sets of uuid strings copied from each
+object dict, as DBBase did before RefSet, for comparison.
+"""
+import argparse
+import gc
+import resource
+import sys
+import time
+import uuid
+
+from cfgm_common import vnc_db
+from cfgm_common.vnc_db import DBBase
+
+
+class DBBaseBench(DBBase):
+    obj_type = __name__
+    __slots__ = ()
+
+
+class VirtualNetworkBench(DBBaseBench):
+    _dict = {}
+    obj_type = 'virtual_network'
+    __slots__ = ('uuid', 'name', 'virtual_machine_interfaces')
+
+    def __init__(self, uuid, obj_dict):
+        self.uuid = uuid
+        self.virtual_machine_interfaces = set()
+        self.name = obj_dict['fq_name'][-1]
+        self.update_multiple_refs('virtual_machine_interface', obj_dict)
+
+
+class VirtualMachineBench(DBBaseBench):
+    _dict = {}
+    obj_type = 'virtual_machine'
+    __slots__ = ('uuid', 'name', 'virtual_machine_interfaces')
+
+    def __init__(self, uuid, obj_dict):
+        self.uuid = uuid
+        self.virtual_machine_interfaces = set()
+        self.name = obj_dict['fq_name'][-1]
+        self.update_multiple_refs('virtual_machine_interface', obj_dict)
+
+
+class VirtualMachineInterfaceBench(DBBaseBench):
+    _dict = {}
+    obj_type = 'virtual_machine_interface'
+    __slots__ = ('uuid', 'name', 'virtual_network', 'virtual_machine')
+
+    def __init__(self, uuid, obj_dict):
+        self.uuid = uuid
+        self.virtual_network = None
+        self.virtual_machine = None
+        self.name = obj_dict['fq_name'][-1]
+        self.update_single_ref('virtual_network', obj_dict)
+        self.update_single_ref('virtual_machine', obj_dict)
+
+
+def _copy(uuid):
+    # uuids parsed from separate json documents are separate strings
+    return ''.join(uuid)
+
+
+def _rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def make_graph(num_objects, vmis_per_vn=50):
+    vns = [str(uuid.uuid4()) for _ in range(max(1, num_objects / vmis_per_vn))]
+    vmis = [str(uuid.uuid4()) for _ in range(num_objects)]
+    vms = [str(uuid.uuid4()) for _ in range(num_objects)]
+    return vns, vmis, vms
+# end make_graph
+
+
+def load_graph(vns, vmis, vms):
+    for i, vmi in enumerate(vmis):
+        obj_dict = {
+            'fq_name': ['default-domain', 'default-project', 'vmi-%d' % i],
+            'virtual_network_refs': [{'uuid': _copy(vns[i % len(vns)])}],
+            'virtual_machine_back_refs': [{'uuid': _copy(vms[i])}],
+        }
+        VirtualMachineInterfaceBench.locate(_copy(vmi), obj_dict)
+    for i, vm in enumerate(vms):
+        obj_dict = {
+            'fq_name': ['vm-%d' % i],
+            'virtual_machine_interface_refs': [{'uuid': _copy(vmis[i])}],
+        }
+        VirtualMachineBench.locate(_copy(vm), obj_dict)
+    for i, vn in enumerate(vns):
+        obj_dict = {
+            'fq_name': ['default-domain', 'default-project', 'vn-%d' % i],
+            'virtual_machine_interface_back_refs': [
+                {'uuid': _copy(vmi)} for vmi in vmis[i::len(vns)]],
+        }
+        VirtualNetworkBench.locate(_copy(vn), obj_dict)
+# end load_graph
+
+
+def main(args_str=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--objects', type=int, default=100000,
+                        help='Number of interfaces (and machines) to load')
+    parser.add_argument('--plain-sets', action='store_true',
+                        help='Keep refs in sets of uuid copies')
+    args = parser.parse_args(args_str)
+
+    if args.plain_sets:
+        vnc_db.RefSet = set
+        vnc_db._intern_uuid = lambda uuid: uuid
+
+    # nothing reads from cassandra, refs carry uuids
+    DBBase.init(None, None, None)
+    graph = make_graph(args.objects)
+    gc.collect()
+    rss_before = _rss_kb()
+    start = time.time()
+    load_graph(*graph)
+    elapsed = time.time() - start
+    gc.collect()
+    rss_after = _rss_kb()
+
+    num_loaded = sum(len(cls._dict) for cls in DBBaseBench.__subclasses__())
+    print 'objects loaded: %d in %.2fs' % (num_loaded, elapsed)
+    print 'rss increase: %d KB (%.1f bytes/object)' % (
+        rss_after - rss_before,
+        (rss_after - rss_before) * 1024.0 / max(1, num_loaded))
+# end main
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
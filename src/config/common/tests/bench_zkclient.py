@@ -0,0 +1,84 @@
+#
+# Copyright (c) 2015 Juniper Networks, Inc. All rights reserved.
+#
+
+"""
+Microbenchmark of IndexAllocator. Fills an index space the size of the
+VN id / route target space to the given level, then frees and allocates
+random indexes, the way a busy, nearly full IPAM subnet or id space is
+used. Zookeeper is replaced by an in-memory dict.
+
+    python bench_zkclient.py [--size 16777216] [--fill 2000000]
+                             [--churn 1000000] [--ranges 1]
+"""
+import argparse
+import random
+import sys
+import time
+
+from cfgm_common.exceptions import ResourceExistsError
+from cfgm_common.zkclient import IndexAllocator
+
+
+class ZookeeperClientBench(object):
+    def __init__(self):
+        self.nodes = {}
+
+    def get_children(self, path):
+        return []
+
+    def create_node(self, path, value=None):
+        if path in self.nodes:
+            raise ResourceExistsError(path, value)
+        self.nodes[path] = value
+
+    def delete_node(self, path, recursive=False):
+        self.nodes.pop(path, None)
+# end ZookeeperClientBench
+
+
+def make_allocator(size, ranges):
+    if ranges <= 1:
+        return IndexAllocator(ZookeeperClientBench(), '/id/', size=size)
+    # split the space in ranges with a gap between each of them
+    rsize = size / ranges
+    alloc_list = [{'start': idx * (rsize + 16),
+                   'end': idx * (rsize + 16) + rsize - 1}
+                  for idx in range(ranges)]
+    return IndexAllocator(ZookeeperClientBench(), '/id/',
+                          alloc_list=alloc_list)
+# end make_allocator
+
+
+def main(args_str=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=1 << 24,
+                        help='Number of indexes of the allocator')
+    parser.add_argument('--fill', type=int, default=2000000,
+                        help='Number of indexes allocated before churn')
+    parser.add_argument('--churn', type=int, default=1000000,
+                        help='Number of free + alloc pairs')
+    parser.add_argument('--ranges', type=int, default=1,
+                        help='Number of ranges of the allocation list')
+    args = parser.parse_args(args_str)
+
+    allocator = make_allocator(args.size, args.ranges)
+    start = time.time()
+    live = [allocator.alloc() for _ in xrange(args.fill)]
+    elapsed = time.time() - start
+    print 'fill: %d allocs in %.2fs (%.1f us/alloc)' % (
+        args.fill, elapsed, elapsed * 1e6 / max(1, args.fill))
+
+    rnd = random.Random(0)
+    start = time.time()
+    for _ in xrange(args.churn):
+        pos = rnd.randrange(len(live))
+        allocator.delete(live[pos])
+        live[pos] = allocator.alloc()
+    elapsed = time.time() - start
+    print 'churn: %d free + alloc in %.2fs (%.1f us/pair)' % (
+        args.churn, elapsed, elapsed * 1e6 / max(1, args.churn))
+# end main
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -36,3 +36,21 @@ class TestCachContainer(unittest.TestCase):
         c['g'] = 7
         self.assertEqual(set(['e', 'f', 'a', 'c', 'g']),
                          set(c.dictionary.keys()))
+
+    def test_cache_container_stats(self):
+        c = CacheContainer(2)
+        c['a'] = 1
+        c['b'] = 2
+        self.assertEqual(c['a'], 1)
+        self.assertRaises(KeyError, c.__getitem__, 'x')
+        c['c'] = 3
+        self.assertEqual(set(['a', 'c']), set(c.dictionary.keys()))
+        self.assertEqual((c.hits, c.misses, c.evictions), (1, 1, 1))
+        self.assertEqual(len(c), 2)
+
+    def test_cache_container_delete(self):
+        c = CacheContainer(2)
+        c['a'] = 1
+        del c['a']
+        self.assertFalse('a' in c)
+        self.assertRaises(KeyError, c.__delitem__, 'a')
@@ -210,7 +210,7 @@ class FakeCF(object):
 
     # end xget
 
-    def batch(self):
+    def batch(self, *args, **kwargs):
         return self
     # end batch
 
@@ -942,6 +942,61 @@ class FakeKazooClient(object):
                     del self._values[path_key]
     # end delete
 
+    def exists(self, path):
+        return path in self._values
+    # end exists
+
+    def ensure_path(self, path):
+        pass
+    # end ensure_path
+
+    def transaction(self):
+        return FakeKazooTransaction(self)
+    # end transaction
+
+class FakeKazooTransaction(object):
+    # All or nothing, like a zookeeper multi
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+    # end __init__
+
+    def create(self, path, value='', *args, **kwargs):
+        self._ops.append(('create', path, value))
+    # end create
+
+    def delete(self, path, *args, **kwargs):
+        self._ops.append(('delete', path, None))
+    # end delete
+
+    def commit(self):
+        # The failing op returns its error, the ops before it are rolled
+        # back and the ones after it are not run
+        values = dict(self._client._values)
+        results = []
+        error = None
+        for op, path, value in self._ops:
+            if error is not None:
+                results.append(kazoo.exceptions.RuntimeInconsistency())
+            elif op == 'create' and path in values:
+                error = kazoo.exceptions.NodeExistsError()
+                results = [kazoo.exceptions.RolledBackError()
+                           for _ in results] + [error]
+            elif op == 'delete' and path not in values:
+                error = kazoo.exceptions.NoNodeError()
+                results = [kazoo.exceptions.RolledBackError()
+                           for _ in results] + [error]
+            elif op == 'create':
+                values[path] = value
+                results.append(path)
+            else:
+                del values[path]
+                results.append(True)
+        if error is None:
+            self._client._values = values
+        return results
+    # end commit
+
 class ZookeeperClientMock(object):
 
     def __init__(self, *args, **kwargs):
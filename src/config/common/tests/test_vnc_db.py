@@ -0,0 +1,45 @@
+import unittest
+from cfgm_common.vnc_db import RefSet, _intern_uuid
+
+class TestInternUuid(unittest.TestCase):
+    def test_intern_uuid(self):
+        uuid = _intern_uuid(''.join(['fake', '-uuid']))
+        self.assertIs(_intern_uuid('fake-uuid'), uuid)
+        self.assertIs(_intern_uuid(u'fake-uuid'), uuid)
+        self.assertIs(RefSet([''.join(['fake', '-uuid'])]).pop(), uuid)
+        self.assertIsNone(_intern_uuid(None))
+
+class TestRefSet(unittest.TestCase):
+    def test_ref_set_add_discard(self):
+        refs = RefSet(['uuid-b', 'uuid-a', 'uuid-b'])
+        self.assertEqual(len(refs), 2)
+        refs.add('uuid-c')
+        refs.add('uuid-a')
+        refs.discard('uuid-b')
+        refs.discard('uuid-unknown')
+        self.assertEqual(set(refs), set(['uuid-a', 'uuid-c']))
+        self.assertIn('uuid-a', refs)
+        self.assertNotIn('uuid-b', refs)
+        self.assertRaises(KeyError, refs.remove, 'uuid-b')
+
+        self.assertEqual(list(refs), ['uuid-a', 'uuid-c'])
+        # discard while iterating
+        for uuid in refs:
+            refs.discard(uuid)
+        self.assertFalse(refs)
+
+    def test_ref_set_operators(self):
+        refs = RefSet(['uuid-a', 'uuid-b'])
+        self.assertEqual(refs, set(['uuid-a', 'uuid-b']))
+        self.assertEqual(set(['uuid-a', 'uuid-b']), refs)
+        self.assertEqual(refs, RefSet(['uuid-b', 'uuid-a']))
+        self.assertEqual(refs - set(['uuid-a']), set(['uuid-b']))
+        self.assertEqual(set(['uuid-a', 'uuid-c']) - refs, set(['uuid-c']))
+        self.assertEqual(refs | set(['uuid-c']),
+                         set(['uuid-a', 'uuid-b', 'uuid-c']))
+        self.assertEqual(refs & set(['uuid-b', 'uuid-c']), set(['uuid-b']))
+
+        copy = refs.copy()
+        copy.add('uuid-c')
+        self.assertNotEqual(refs, copy)
+        self.assertTrue(refs <= copy)
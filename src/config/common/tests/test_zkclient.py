@@ -0,0 +1,235 @@
+import unittest
+from collections import namedtuple
+import kazoo.exceptions
+from cfgm_common.exceptions import ResourceExistsError
+from cfgm_common.zkclient import IndexAllocator, ZookeeperClient
+
+ZnodeStat = namedtuple('ZnodeStat', ['cversion'])
+
+class FakeRetry(object):
+    def copy(self):
+        return lambda func, *args, **kwargs: func(*args, **kwargs)
+
+class FakeTransaction(object):
+    # Results of a zookeeper multi: the failing op returns its error, the
+    # ops before it are rolled back and the ones after it are not run
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+
+    def create(self, path, value=''):
+        self._ops.append(('create', path, value))
+
+    def delete(self, path):
+        self._ops.append(('delete', path, None))
+
+    def commit(self):
+        self._client.transactions += 1
+        nodes = dict(self._client.nodes)
+        results = []
+        error = None
+        for op, path, value in self._ops:
+            if error is not None:
+                results.append(kazoo.exceptions.RuntimeInconsistency())
+                continue
+            if op == 'create' and path in nodes:
+                error = kazoo.exceptions.NodeExistsError()
+            elif op == 'delete' and path not in nodes:
+                error = kazoo.exceptions.NoNodeError()
+            elif op == 'create':
+                nodes[path] = value
+                results.append(path)
+            else:
+                del nodes[path]
+                results.append(True)
+            if error is not None:
+                results = [kazoo.exceptions.RolledBackError()
+                           for _ in results] + [error]
+        if error is None:
+            self._client.cversion += len(self._ops)
+            self._client.nodes = nodes
+        return results
+
+class FakeZookeeperClient(ZookeeperClient):
+    # create_nodes and delete_nodes are the ones of ZookeeperClient, run
+    # on a fake kazoo client
+    def __init__(self, nodes=None):
+        self.nodes = dict(nodes or {})
+        self.cversion = 0
+        self.children_reads = 0
+        self.transactions = 0
+        self._zk_client = self
+        self._retry = FakeRetry()
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+    def exists(self, path):
+        return path in self.nodes
+
+    def ensure_path(self, path):
+        pass
+
+    def get_children(self, path):
+        self.children_reads += 1
+        return [node[len(path):] for node in self.nodes
+                if node.startswith(path)]
+
+    def get_children_stat(self, path):
+        return self.get_children(path), ZnodeStat(self.cversion)
+
+    def create_node(self, path, value=None):
+        if path in self.nodes:
+            raise ResourceExistsError(path, value)
+        self.nodes[path] = value
+        self.cversion += 1
+
+    def delete_node(self, path, recursive=False):
+        if path in self.nodes:
+            del self.nodes[path]
+            self.cversion += 1
+
+    def read_node(self, path):
+        return self.nodes.get(path)
+
+    def read_node_stat(self, path):
+        if path not in self.nodes:
+            return None, None
+        return self.nodes[path], ZnodeStat(self.cversion)
+
+    def update_node(self, path, value):
+        self.nodes[path] = value
+
+class TestIndexAllocator(unittest.TestCase):
+    def test_alloc_lowest_free(self):
+        zk = FakeZookeeperClient()
+        allocator = IndexAllocator(zk, '/id/', size=999, start_idx=1000)
+        for idx in range(1000, 1500):
+            self.assertEqual(allocator.alloc(), idx)
+        for idx in (1400, 1010, 1200):
+            allocator.delete(idx)
+        self.assertEqual([allocator.alloc() for _ in range(4)],
+                         [1010, 1200, 1400, 1500])
+        self.assertEqual(allocator.get_alloc_count(), 501)
+
+    def test_alloc_existing_nodes(self):
+        # indexes already in zookeeper are skipped, whether known at
+        # start or created by another allocator afterwards
+        zk = FakeZookeeperClient({'/id/%(#)010d' % {'#': idx}: None
+                                  for idx in range(0, 100, 2)})
+        allocator = IndexAllocator(zk, '/id/', size=200)
+        zk.nodes['/id/%(#)010d' % {'#': 1}] = None
+        self.assertEqual([allocator.alloc() for _ in range(3)],
+                         [3, 5, 7])
+
+    def test_alloc_list(self):
+        alloc_list = [{'start': 500, 'end': 501},
+                      {'start': 100, 'end': 102}]
+        allocator = IndexAllocator(FakeZookeeperClient(), '/id/',
+                                   alloc_list=alloc_list)
+        self.assertEqual([allocator.alloc() for _ in range(5)],
+                         [100, 101, 102, 500, 501])
+
+        allocator = IndexAllocator(FakeZookeeperClient(), '/id/',
+                                   alloc_list=alloc_list, reverse=True)
+        self.assertEqual([allocator.alloc() for _ in range(5)],
+                         [501, 500, 102, 101, 100])
+        self.assertEqual(allocator._get_bit_from_zk_index(101), 3)
+        self.assertEqual(allocator._get_bit_from_zk_index(300), -1)
+
+    def test_alloc_batch(self):
+        zk = FakeZookeeperClient({'/id/%(#)010d' % {'#': idx}: None
+                                  for idx in (2, 3)})
+        allocator = IndexAllocator(zk, '/id/', size=1000)
+        allocator._BATCH_SIZE = 4
+        self.assertEqual(allocator.get_alloc_count(), 2)
+        # 7 is allocated by someone else, the batch is tried again
+        zk.nodes['/id/%(#)010d' % {'#': 7}] = None
+        self.assertEqual(allocator.alloc_batch(10, 'batch'),
+                         [0, 1, 4, 5, 6, 8, 9, 10, 11, 12])
+        self.assertEqual(zk.transactions, 4)
+        self.assertEqual(zk.nodes['/id/%(#)010d' % {'#': 12}], 'batch')
+
+        allocator.delete_batch([1, 4, 5, 6, 13])
+        self.assertEqual(zk.transactions, 6)
+        self.assertEqual(allocator.alloc_batch(2), [1, 4])
+        self.assertEqual(allocator.get_alloc_count(), 11)
+
+    def test_alloc_batch_conflict(self):
+        zk = FakeZookeeperClient()
+        allocator = IndexAllocator(zk, '/id/', size=100)
+        allocator._BATCH_SIZE = 8
+        self.assertEqual(allocator.get_alloc_count(), 0)
+        # created by someone else in the middle of the batch, all the
+        # existing nodes are reported and none of the batch is created
+        paths = ['/id/%(#)010d' % {'#': idx} for idx in range(8)]
+        zk.nodes[paths[3]] = zk.nodes[paths[5]] = 'other'
+        self.assertEqual(zk.create_nodes([(path, 'batch')
+                                          for path in paths]),
+                         [paths[3], paths[5]])
+        self.assertEqual(len(zk.nodes), 2)
+
+        self.assertEqual(allocator.alloc_batch(8, 'batch'),
+                         [0, 1, 2, 4, 6, 7, 8, 9])
+        self.assertEqual(zk.transactions, 3)
+        self.assertEqual(zk.nodes[paths[3]], 'other')
+
+        # deleted by someone else in the middle of the batch
+        del zk.nodes[paths[2]]
+        del zk.nodes[paths[4]]
+        allocator.delete_batch([0, 1, 2, 4, 6])
+        self.assertEqual(zk.transactions, 5)
+        self.assertEqual(sorted(zk.nodes),
+                         [paths[3], paths[5], paths[7],
+                          '/id/%(#)010d' % {'#': 8},
+                          '/id/%(#)010d' % {'#': 9}])
+
+    def test_alloc_batch_exhausted(self):
+        allocator = IndexAllocator(FakeZookeeperClient(), '/id/',
+                                   alloc_list=[{'start': 10, 'end': 12},
+                                               {'start': 20, 'end': 21}])
+        self.assertEqual(allocator.alloc_batch(4), [10, 11, 12, 20])
+        self.assertEqual(allocator.alloc_batch(4), [21])
+        self.assertEqual(allocator.alloc_batch(4), [])
+
+class TestIndexAllocatorLoad(unittest.TestCase):
+    def setUp(self):
+        self.zk = FakeZookeeperClient({'/id/%(#)010d' % {'#': idx}: None
+                                       for idx in range(10)})
+        self.zk.nodes['/id'] = None
+
+    def test_lazy_load(self):
+        allocator = IndexAllocator(self.zk, '/id/', size=100)
+        self.assertEqual(self.zk.children_reads, 0)
+        self.assertEqual(allocator.reserve(50, 'reserved'), 50)
+        allocator.set_in_use(10)
+        allocator.delete(5)
+        self.assertEqual(self.zk.children_reads, 0)
+
+        self.assertEqual(allocator.alloc(), 5)
+        self.assertEqual(allocator.alloc(), 11)
+        self.assertEqual(self.zk.children_reads, 1)
+        self.assertEqual(allocator.get_alloc_count(), 13)
+
+    def test_checkpoint(self):
+        allocator = IndexAllocator(self.zk, '/id/', size=100,
+                                   checkpoint=True)
+        self.assertEqual(allocator.get_alloc_count(), 10)
+        self.assertEqual(self.zk.children_reads, 1)
+
+        # nothing changed since the checkpoint was written
+        allocator2 = IndexAllocator(self.zk, '/id/', size=100,
+                                    checkpoint=True)
+        self.assertEqual(allocator2.get_alloc_count(), 10)
+        self.assertEqual(self.zk.children_reads, 1)
+
+        # the checkpoint is for other ranges, or is stale
+        allocator2 = IndexAllocator(self.zk, '/id/', size=50,
+                                    checkpoint=True)
+        self.assertEqual(allocator2.get_alloc_count(), 10)
+        self.assertEqual(self.zk.children_reads, 2)
+        self.assertEqual(allocator.alloc(), 10)
+        allocator2 = IndexAllocator(self.zk, '/id/', size=100,
+                                    checkpoint=True)
+        self.assertEqual(allocator2.alloc(), 11)
+        self.assertEqual(self.zk.children_reads, 3)
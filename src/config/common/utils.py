@@ -22,6 +22,7 @@
 
 
 import urllib
+import bisect
 from collections import OrderedDict
 import sys
 import cgitb
@@ -80,27 +81,65 @@ class CacheContainer(object):
     def __init__(self, size):
         self.container_size = size
         self.dictionary = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
 
     def __getitem__(self, key, default=None):
-        value = self.dictionary[key]
+        try:
+            value = self.dictionary.pop(key)
+        except KeyError:
+            self.misses += 1
+            raise
         # item accessed - put it in the front
-        del self.dictionary[key]
         self.dictionary[key] = value
+        self.hits += 1
 
         return value
 
     def __setitem__(self, key, value):
+        self.dictionary.pop(key, None)
         self.dictionary[key] = value
-        if len(self.dictionary.keys()) > self.container_size:
+        if len(self.dictionary) > self.container_size:
             # container is full, loose the least used item
             self.dictionary.popitem(last=False)
+            self.evictions += 1
+
+    def __delitem__(self, key):
+        del self.dictionary[key]
 
     def __contains__(self, key):
         return key in self.dictionary
 
+    def __len__(self):
+        return len(self.dictionary)
+
     def __repr__(self):
         return str(self.dictionary)
 
+    def clear(self):
+        self.dictionary.clear()
+
+
+class Histogram(object):
+    """Counts of observed values per bucket. Bucket i counts values not
+    above bounds[i] (and above bounds[i-1]), the last one the rest."""
+    def __init__(self, bounds):
+        self.bounds = sorted(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def buckets(self):
+        # (upper bound as string, count) pairs, last bound is 'inf'
+        les = [str(bound) for bound in self.bounds] + ['inf']
+        return zip(les, self.counts)
+
 
 def CamelCase(input):
     words = input.replace('_', '-').split('-')
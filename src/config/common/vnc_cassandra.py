@@ -17,12 +17,17 @@ from pysandesh.gen_py.process_info.ttypes import ConnectionStatus, \
 from pysandesh.gen_py.sandesh.ttypes import SandeshLevel
 from sandesh_common.vns.constants import API_SERVER_KEYSPACE_NAME, \
     CASSANDRA_DEFAULT_GC_GRACE_SECONDS
+from cfgm_common.uve.config_db_cache.ttypes import ConfigDbCacheStats, \
+    ConfigDbCacheStatsReq, ConfigDbCacheStatsResp
 import time
 from cfgm_common import jsonutils as json
 import utils
 import functools
 import datetime
 import re
+import urllib
+import bisect
+import weakref
 from operator import itemgetter
 
 class VncCassandraClient(object):
@@ -35,17 +40,45 @@ class VncCassandraClient(object):
     # TODO describe layout
     _OBJ_FQ_NAME_CF_NAME = 'obj_fq_name_table'
 
+    # Secondary index on configured (type, property) pairs
+    # row key: '<obj-type>:<prop-name>'
+    # column: '<quoted json of prop value>:<obj-uuid>'
+    # row _PROP_INDEX_BUILT_ROW has a column per built '<obj-type>:<prop-name>'
+    _OBJ_PROP_INDEX_CF_NAME = 'obj_prop_index_table'
+    _PROP_INDEX_BUILT_ROW = '__built__'
+
     _MAX_COL = 10000000
 
+    # max entries in uuid -> (fq_name, type) cache, least recently used
+    # entries are evicted beyond this
+    _CACHE_UUID_TO_FQ_NAME_SIZE = 100000
+
+    # mutations queued in a bulk batch before it is sent on its own
+    _BULK_BATCH_QUEUE_SIZE = 5000
+
+    # rows read per multiget when filtering a list, other greenlets get
+    # to run between them
+    _LIST_FILTER_CHUNK_SIZE = 500
+
+    # rows read per multiget when building a property index
+    _PROP_INDEX_BUILD_CHUNK_SIZE = 1000
+
+    # live clients of the process, ConfigDbCacheStatsReq reports the caches
+    # of all of them
+    _clients = weakref.WeakSet()
+
     @classmethod
     def get_db_info(cls):
         db_info = [(cls._UUID_KEYSPACE_NAME, [cls._OBJ_UUID_CF_NAME,
-                                              cls._OBJ_FQ_NAME_CF_NAME])]
+                                              cls._OBJ_FQ_NAME_CF_NAME,
+                                              cls._OBJ_PROP_INDEX_CF_NAME])]
         return db_info
     # end get_db_info
 
     def __init__(self, server_list, db_prefix, keyspaces, logger,
-                 generate_url=None, reset_config=[], credential=None):
+                 generate_url=None, reset_config=[], credential=None,
+                 cache_uuid_to_fq_name_size=None, indexed_props=None,
+                 build_prop_index=False):
         self._re_match_parent = re.compile('parent:')
         self._re_match_prop = re.compile('prop:')
         self._re_match_ref = re.compile('ref:')
@@ -64,11 +97,18 @@ class VncCassandraClient(object):
                     bound_method)
 
         self._reset_config = reset_config
-        self._cache_uuid_to_fq_name = {}
+        self._cache_uuid_to_fq_name = utils.CacheContainer(
+            cache_uuid_to_fq_name_size or self._CACHE_UUID_TO_FQ_NAME_SIZE)
         if db_prefix:
             self._db_prefix = '%s_' %(db_prefix)
         else:
             self._db_prefix = ''
+        self._clients.add(self)
+        # obj-type -> set of prop names kept in the prop index
+        self._indexed_props = {}
+        for (obj_type, prop_name) in indexed_props or []:
+            obj_type = obj_type.replace('-', '_')
+            self._indexed_props.setdefault(obj_type, set()).add(prop_name)
         self._server_list = server_list
         self._num_dbnodes = len(self._server_list)
         self._conn_state = ConnectionStatus.INIT
@@ -81,14 +121,20 @@ class VncCassandraClient(object):
         self._cf_dict = {}
         self._keyspaces = {
             self._UUID_KEYSPACE_NAME: [(self._OBJ_UUID_CF_NAME, None),
-                                       (self._OBJ_FQ_NAME_CF_NAME, None)]}
+                                       (self._OBJ_FQ_NAME_CF_NAME, None),
+                                       (self._OBJ_PROP_INDEX_CF_NAME, None)]}
 
         if keyspaces:
             self._keyspaces.update(keyspaces)
         self._cassandra_init(server_list)
-        self._cache_uuid_to_fq_name = {}
         self._obj_uuid_cf = self._cf_dict[self._OBJ_UUID_CF_NAME]
         self._obj_fq_name_cf = self._cf_dict[self._OBJ_FQ_NAME_CF_NAME]
+        self._obj_prop_index_cf = self._cf_dict[self._OBJ_PROP_INDEX_CF_NAME]
+        # greenlet -> (obj_uuid batch, obj_fq_name batch, obj_prop_index
+        # batch) between bulk_begin() and bulk_end()
+        self._bulk_batches = {}
+        if build_prop_index:
+            self._prop_index_init()
     # end __init__
 
     def get_cf(self, func):
@@ -254,13 +300,48 @@ class VncCassandraClient(object):
         return getattr(vnc_api, cls_name)
     # end _get_resource_class
 
+    def bulk_begin(self):
+        # object writes of this greenlet go to shared batches till
+        # bulk_send(), obj_uuid rows are sent ahead of obj_fq_name and
+        # obj_prop_index rows so an object is never found by name or
+        # property before it can be read
+        self._bulk_batches[gevent.getcurrent()] = (
+            self._obj_uuid_cf.batch(queue_size=self._BULK_BATCH_QUEUE_SIZE),
+            self._obj_fq_name_cf.batch(queue_size=self._BULK_BATCH_QUEUE_SIZE),
+            self._obj_prop_index_cf.batch(
+                queue_size=self._BULK_BATCH_QUEUE_SIZE))
+    # end bulk_begin
+
+    def bulk_send(self):
+        bulk = self._bulk_batches.get(gevent.getcurrent())
+        if bulk is None:
+            return
+        for bch in bulk:
+            bch.send()
+    # end bulk_send
+
+    def bulk_end(self):
+        # drops writes not sent yet
+        self._bulk_batches.pop(gevent.getcurrent(), None)
+    # end bulk_end
+
+    def _obj_batch(self):
+        # returns (obj_uuid batch, obj_fq_name batch, obj_prop_index batch,
+        # send-when-done)
+        bulk = self._bulk_batches.get(gevent.getcurrent())
+        if bulk is not None:
+            return bulk + (False,)
+        return (self._obj_uuid_cf.batch(), self._obj_fq_name_cf.batch(),
+                self._obj_prop_index_cf.batch(), True)
+    # end _obj_batch
+
     def _object_create(self, res_type, obj_ids, obj_dict):
         obj_type = res_type.replace('-', '_')
         obj_class = self._get_resource_class(obj_type)
 
         # Gather column values for obj and updates to backrefs
         # in a batch and write it at the end
-        bch = self._obj_uuid_cf.batch()
+        (bch, fq_name_bch, index_bch, send) = self._obj_batch()
 
         obj_cols = {}
         obj_cols['fq_name'] = json.dumps(obj_dict['fq_name'])
@@ -301,12 +382,20 @@ class VncCassandraClient(object):
                     ref_type.replace('-', '_'), ref_uuid, ref_data)
 
         bch.insert(obj_ids['uuid'], obj_cols)
-        bch.send()
+        if send:
+            bch.send()
+
+        self._prop_index_update(index_bch, obj_type, obj_ids['uuid'], {},
+            self._prop_index_values(obj_type, obj_dict))
+        if send:
+            index_bch.send()
 
         # Update fqname table
         fq_name_str = ':'.join(obj_dict['fq_name'])
         fq_name_cols = {utils.encode_string(fq_name_str) + ':' + obj_ids['uuid']: json.dumps(None)}
-        self._obj_fq_name_cf.insert(obj_type, fq_name_cols)
+        fq_name_bch.insert(obj_type, fq_name_cols)
+        if send:
+            fq_name_bch.send()
 
         return (True, '')
     # end _object_create
@@ -336,6 +425,12 @@ class VncCassandraClient(object):
         if (len(obj_uuids) == 1) and not obj_rows:
             raise NoIdError(obj_uuids[0])
 
+        # first pass: gather every child/ref/backref uuid across all rows
+        # and resolve cache misses to fq_name in one round trip instead of
+        # one get() per column in _read_child/_read_ref/_read_back_ref
+        self.cache_uuid_to_fq_name_fill(
+            self._object_read_ref_uuids(obj_rows, field_names))
+
         results = []
         for row_key in obj_rows:
             obj_uuid = row_key
@@ -405,6 +500,27 @@ class VncCassandraClient(object):
         return (True, results)
     # end _object_read
 
+    def _object_read_ref_uuids(self, obj_rows, field_names=None):
+        # uuids of children, refs and backrefs that _object_read will
+        # resolve to fq_name for the given rows and field_names
+        ref_uuids = set()
+        for obj_cols in obj_rows.values():
+            for col_name in obj_cols:
+                col_type = col_name.split(':', 1)[0]
+                if col_type not in ('children', 'ref', 'backref'):
+                    continue
+                (_, ref_type, ref_uuid) = col_name.split(':')
+                if field_names:
+                    if (col_type == 'children' and
+                        '%ss' %(ref_type) not in field_names):
+                        continue
+                    if (col_type == 'backref' and
+                        '%s_back_refs' %(ref_type) not in field_names):
+                        continue
+                ref_uuids.add(ref_uuid)
+        return ref_uuids
+    # end _object_read_ref_uuids
+
     def _object_count_children(self, res_type, obj_uuid, child_type):
         if child_type is None:
             return (False, '')
@@ -465,7 +581,13 @@ class VncCassandraClient(object):
         for col_info in obj_cols_iter:
             obj_cols[col_info[0]] = col_info[1]
 
-        bch = obj_uuid_cf.batch()
+        old_index_vals = self._prop_index_values(obj_type, obj_cols,
+                                                 from_cols=True)
+        new_index_vals = dict(old_index_vals)
+        new_index_vals.update(self._prop_index_values(
+            obj_type, new_obj_dict, include_none=True))
+
+        (bch, _, index_bch, send) = self._obj_batch()
         for col_name in obj_cols.keys():
             if re.match('prop:', col_name):
                 (_, prop_name) = col_name.split(':')
@@ -492,13 +614,27 @@ class VncCassandraClient(object):
         for prop_name in new_props.keys():
             self._create_prop(bch, obj_uuid, prop_name, new_props[prop_name])
 
-        bch.send()
+        if send:
+            bch.send()
+
+        self._prop_index_update(index_bch, obj_type, obj_uuid,
+                                old_index_vals, new_index_vals)
+        if send:
+            index_bch.send()
 
         return (True, '')
     # end _object_update
 
     def _object_list(self, res_type, parent_uuids=None, back_ref_uuids=None,
-                     obj_uuids=None, count=False, filters=None):
+                     obj_uuids=None, count=False, filters=None,
+                     paginate_start=None, paginate_count=None):
+        # With paginate_count, at most paginate_count entries following the
+        # paginate_start marker are returned. Pages are in column order:
+        # fq_name table order for unanchored lists, uuid order for anchored
+        # ones. The marker for the next page is
+        # '<encoded fq_name str>:<uuid>' of the last entry returned (see
+        # list_page_marker), fewer than paginate_count entries means no
+        # more pages.
         obj_type = res_type.replace('-', '_')
         obj_class = self._get_resource_class(obj_type)
 
@@ -511,24 +647,41 @@ class VncCassandraClient(object):
             filter_fields = []
 
         def filter_rows(coll_infos, filter_cols, filter_params):
+            # indexed filter fields are answered by range scans on the prop
+            # index, only the rest need a multiget of candidate rows
+            (index_uuids, filter_params) = self._prop_index_lookup(
+                obj_type, filter_params)
+            if index_uuids is not None:
+                coll_infos = dict((k, v) for k, v in coll_infos.items()
+                                  if k in index_uuids)
+                if not filter_params:
+                    return coll_infos
+                filter_cols = ['prop:%s' %(fname)
+                               for fname, _ in filter_params]
+
             filt_infos = {}
-            coll_rows = obj_uuid_cf.multiget(coll_infos.keys(),
-                                   columns=filter_cols,
-                                   column_count=self._MAX_COL)
-            for row in coll_rows:
+            coll_uuids = coll_infos.keys()
+            chunk_size = self._LIST_FILTER_CHUNK_SIZE
+            for i in range(0, len(coll_uuids), chunk_size):
                 # give chance for zk heartbeat/ping
                 gevent.sleep(0)
-                full_match = True
-                for fname, fval in filter_params:
-                    if coll_rows[row]['prop:%s' %(fname)] != fval:
-                        full_match = False
-                        break
-                if full_match:
-                    filt_infos[row] = coll_infos[row]
+                coll_rows = obj_uuid_cf.multiget(coll_uuids[i:i + chunk_size],
+                                       columns=filter_cols,
+                                       column_count=self._MAX_COL)
+                for row in coll_rows:
+                    full_match = True
+                    for fname, fval in filter_params:
+                        if coll_rows[row]['prop:%s' %(fname)] != fval:
+                            full_match = False
+                            break
+                    if full_match:
+                        filt_infos[row] = coll_infos[row]
             return filt_infos
         # end filter_rows
 
         def get_fq_name_uuid_list(obj_uuids):
+            obj_uuids = list(obj_uuids)
+            self.cache_uuid_to_fq_name_fill(obj_uuids)
             ret_list = []
             for obj_uuid in obj_uuids:
                 try:
@@ -539,6 +692,97 @@ class VncCassandraClient(object):
             return ret_list
         # end get_fq_name_uuid_list
 
+        def list_page():
+            # read anchors/fq_name table in column ranges of the size still
+            # needed, repeat only if filters or stale entries dropped some
+            page_fq_names_uuids = []
+            page_start = paginate_start or ''
+            if parent_uuids or back_ref_uuids:
+                page_start = page_start.split(':')[-1]
+            filter_cols = ['prop:%s' %(fname) for fname, _ in filter_fields]
+            while len(page_fq_names_uuids) < paginate_count:
+                num_needed = paginate_count - len(page_fq_names_uuids)
+                (batch, page_start, exhausted) = read_page_batch(
+                    page_start, num_needed)
+                if filter_cols and batch:
+                    batch_infos = filter_rows(dict(batch), filter_cols,
+                                              filter_fields)
+                    batch = [(k, v) for k, v in batch if k in batch_infos]
+                if parent_uuids or back_ref_uuids or obj_uuids:
+                    page_fq_names_uuids.extend(
+                        get_fq_name_uuid_list(k for k, _ in batch))
+                else:
+                    page_fq_names_uuids.extend(v for _, v in batch)
+                if exhausted:
+                    break
+            return page_fq_names_uuids
+        # end list_page
+
+        def read_page_batch(start, num):
+            # returns ([(uuid, info)] of up to num entries after start,
+            #          start for next batch, True if nothing follows)
+            if back_ref_uuids or parent_uuids:
+                if back_ref_uuids:
+                    anchor_uuids = back_ref_uuids
+                    col_prefix = 'backref:%s:' %(obj_type)
+                else:
+                    anchor_uuids = parent_uuids
+                    col_prefix = 'children:%s:' %(obj_type)
+                try:
+                    obj_rows = obj_uuid_cf.multiget(anchor_uuids,
+                        column_start=col_prefix + start,
+                        column_finish=col_prefix[:-1] + ';',
+                        column_count=num + 1)
+                except pycassa.NotFoundException:
+                    obj_rows = {}
+                exhausted = True
+                batch_uuids = set()
+                for cols in obj_rows.values():
+                    if len(cols) > num:
+                        exhausted = False
+                    batch_uuids.update(col_name.split(':')[2]
+                                       for col_name in cols)
+                batch_uuids.discard(start)
+                batch_uuids = sorted(batch_uuids)[:num]
+                if not batch_uuids:
+                    return ([], start, True)
+                next_start = batch_uuids[-1]
+                if obj_uuids:
+                    batch_uuids = [u for u in batch_uuids if u in obj_uuids]
+                return ([(u, None) for u in batch_uuids], next_start,
+                        exhausted)
+
+            if obj_uuids:
+                sorted_uuids = sorted(set(obj_uuids))
+                start_idx = bisect.bisect_right(sorted_uuids, start)
+                batch_uuids = sorted_uuids[start_idx:start_idx + num]
+                if not batch_uuids:
+                    return ([], start, True)
+                return ([(u, None) for u in batch_uuids], batch_uuids[-1],
+                        start_idx + num >= len(sorted_uuids))
+
+            try:
+                cols = self._obj_fq_name_cf.get(obj_type,
+                                                column_start=start,
+                                                column_count=num + 1)
+            except pycassa.NotFoundException:
+                return ([], start, True)
+            col_names = sorted(col_name for col_name in cols
+                               if col_name != start)[:num]
+            if not col_names:
+                return ([], start, True)
+            batch = []
+            for col_name in col_names:
+                col_name_arr = utils.decode_string(col_name).split(':')
+                obj_uuid = col_name_arr[-1]
+                batch.append((obj_uuid, (col_name_arr[:-1], obj_uuid)))
+            return (batch, col_names[-1], len(cols) <= num)
+        # end read_page_batch
+
+        if paginate_count and not count:
+            obj_uuid_cf = self._obj_uuid_cf
+            return (True, list_page())
+
         if parent_uuids:
             # go from parent to child
             obj_uuid_cf = self._obj_uuid_cf
@@ -700,9 +944,11 @@ class VncCassandraClient(object):
         obj_type = res_type.replace('-', '_')
         obj_class = self._get_resource_class(obj_type)
         obj_uuid_cf = self._obj_uuid_cf
-        fq_name = json.loads(
-            obj_uuid_cf.get(obj_uuid, columns=['fq_name'])['fq_name'])
-        bch = obj_uuid_cf.batch()
+        index_cols = ['prop:%s' %(prop_name)
+                      for prop_name in self._indexed_props.get(obj_type, [])]
+        obj_cols = obj_uuid_cf.get(obj_uuid, columns=['fq_name'] + index_cols)
+        fq_name = json.loads(obj_cols['fq_name'])
+        (bch, fq_name_bch, index_bch, send) = self._obj_batch()
 
         # unlink from parent
         col_start = 'parent:'
@@ -724,16 +970,155 @@ class VncCassandraClient(object):
             self._delete_ref(bch, obj_type, obj_uuid, ref_type, ref_uuid)
 
         bch.remove(obj_uuid)
-        bch.send()
+        if send:
+            bch.send()
+
+        self._prop_index_update(index_bch, obj_type, obj_uuid,
+            self._prop_index_values(obj_type, obj_cols, from_cols=True), {})
+        if send:
+            index_bch.send()
 
         # Update fqname table
         fq_name_str = ':'.join(fq_name)
         fq_name_col = utils.encode_string(fq_name_str) + ':' + obj_uuid
-        self._obj_fq_name_cf.remove(obj_type, columns = [fq_name_col])
+        fq_name_bch.remove(obj_type, columns = [fq_name_col])
+        if send:
+            fq_name_bch.send()
+        self.cache_uuid_to_fq_name_del(obj_uuid)
 
         return (True, '')
     # end _object_delete
 
+    def _prop_index_init(self):
+        # (re)build index for configured (type, prop) pairs that were not
+        # built before. Pairs that are no longer configured are not kept
+        # up to date from now on, their built mark is dropped so that
+        # they get rebuilt if configured again. Their index rows are left
+        # alone.
+        try:
+            built = set(self._obj_prop_index_cf.get(
+                self._PROP_INDEX_BUILT_ROW, column_count=self._MAX_COL))
+        except pycassa.NotFoundException:
+            built = set()
+
+        configured = set('%s:%s' %(obj_type, prop_name)
+                         for obj_type, prop_names in self._indexed_props.items()
+                         for prop_name in prop_names)
+        for index_row in built - configured:
+            self._obj_prop_index_cf.remove(self._PROP_INDEX_BUILT_ROW,
+                                           columns=[index_row])
+
+        for index_row in configured - built:
+            (obj_type, prop_name) = index_row.split(':')
+            msg = 'Building property index for %s' %(index_row)
+            self._logger(msg, level=SandeshLevel.SYS_NOTICE)
+            self._prop_index_build(obj_type, prop_name)
+            self._obj_prop_index_cf.insert(self._PROP_INDEX_BUILT_ROW,
+                                           {index_row: json.dumps(None)})
+    # end _prop_index_init
+
+    def _prop_index_build(self, obj_type, prop_name):
+        index_row = '%s:%s' %(obj_type, prop_name)
+        self._obj_prop_index_cf.remove(index_row)
+        try:
+            cols = self._obj_fq_name_cf.get(obj_type,
+                                            column_count=self._MAX_COL)
+        except pycassa.NotFoundException:
+            return
+
+        obj_uuids = [col_name.split(':')[-1] for col_name in cols]
+        chunk_size = self._PROP_INDEX_BUILD_CHUNK_SIZE
+        bch = self._obj_prop_index_cf.batch()
+        for i in range(0, len(obj_uuids), chunk_size):
+            obj_rows = self._obj_uuid_cf.multiget(
+                obj_uuids[i:i + chunk_size], columns=['prop:%s' %(prop_name)])
+            for obj_uuid, obj_cols in obj_rows.items():
+                for prop_val in obj_cols.values():
+                    bch.insert(index_row,
+                        {self._prop_index_col(prop_val, obj_uuid):
+                         json.dumps(None)})
+        bch.send()
+    # end _prop_index_build
+
+    def _prop_index_col(self, prop_val_json, obj_uuid=''):
+        # quoting keeps ':' out of the value part of the column name
+        if isinstance(prop_val_json, unicode):
+            prop_val_json = prop_val_json.encode('utf-8')
+        return '%s:%s' %(urllib.quote(prop_val_json, safe=''), obj_uuid)
+    # end _prop_index_col
+
+    def _prop_index_values(self, obj_type, obj_dict, from_cols=False,
+                           include_none=False):
+        # json encoded values of indexed props from an obj_dict or from
+        # 'prop:<name>' db columns (already json encoded)
+        index_vals = {}
+        for prop_name in self._indexed_props.get(obj_type, []):
+            if from_cols:
+                prop_val = obj_dict.get('prop:%s' %(prop_name))
+            elif prop_name in obj_dict and obj_dict[prop_name] is not None:
+                prop_val = json.dumps(obj_dict[prop_name])
+            elif include_none and prop_name in obj_dict:
+                prop_val = None
+            else:
+                continue
+            if prop_val is not None or include_none:
+                index_vals[prop_name] = prop_val
+        return index_vals
+    # end _prop_index_values
+
+    def _prop_index_update(self, bch, obj_type, obj_uuid, old_vals, new_vals):
+        if obj_type not in self._indexed_props:
+            return
+
+        for prop_name in self._indexed_props[obj_type]:
+            old_val = old_vals.get(prop_name)
+            new_val = new_vals.get(prop_name)
+            if old_val == new_val:
+                continue
+            index_row = '%s:%s' %(obj_type, prop_name)
+            if old_val is not None:
+                bch.remove(index_row,
+                    columns=[self._prop_index_col(old_val, obj_uuid)])
+            if new_val is not None:
+                bch.insert(index_row,
+                    {self._prop_index_col(new_val, obj_uuid): json.dumps(None)})
+    # end _prop_index_update
+
+    def _prop_index_lookup(self, obj_type, filter_fields):
+        # returns (set of uuids matching all indexed filter fields or None
+        # if none of them are indexed, remaining non-indexed filter fields)
+        indexed_props = self._indexed_props.get(obj_type, set())
+        index_uuids = None
+        other_fields = []
+        for fname, fval in filter_fields:
+            if fname not in indexed_props:
+                other_fields.append((fname, fval))
+                continue
+
+            col_start = self._prop_index_col(fval)
+            try:
+                cols = self._obj_prop_index_cf.get(
+                    '%s:%s' %(obj_type, fname),
+                    column_start=col_start,
+                    column_finish='%s;' %(col_start[:-1]),
+                    column_count=self._MAX_COL)
+            except pycassa.NotFoundException:
+                cols = {}
+            match_uuids = set(col_name.split(':')[-1] for col_name in cols)
+            if index_uuids is None:
+                index_uuids = match_uuids
+            else:
+                index_uuids &= match_uuids
+
+        return (index_uuids, other_fields)
+    # end _prop_index_lookup
+
+    def list_page_marker(self, fq_name, obj_uuid):
+        # marker to pass as paginate_start to get the page following
+        # the (fq_name, obj_uuid) entry of a list
+        return '%s:%s' %(utils.encode_string(':'.join(fq_name)), obj_uuid)
+    # end list_page_marker
+
     def read(self, method_name, *args, **kwargs):
         method = getattr(self, '_cassandra_%s_read' % (method_name))
         return method(*args, **kwargs)
@@ -760,6 +1145,46 @@ class VncCassandraClient(object):
             pass
     # end cache_uuid_to_fq_name_del
 
+    def cache_uuid_to_fq_name_fill(self, ids):
+        # resolve all uncached ids with a single multiget, ids that are
+        # not found are left out and raise NoIdError on lookup as before
+        missing_ids = [id for id in set(ids)
+                       if id not in self._cache_uuid_to_fq_name]
+        if not missing_ids:
+            return
+
+        try:
+            obj_rows = self._obj_uuid_cf.multiget(missing_ids,
+                                                  columns=['fq_name', 'type'])
+        except pycassa.NotFoundException:
+            return
+
+        for id, obj_cols in obj_rows.items():
+            try:
+                fq_name = json.loads(obj_cols['fq_name'])
+                obj_type = json.loads(obj_cols['type'])
+            except KeyError:
+                continue
+            self.cache_uuid_to_fq_name_add(id, fq_name, obj_type)
+    # end cache_uuid_to_fq_name_fill
+
+    def cache_stats(self):
+        cache = self._cache_uuid_to_fq_name
+        return ConfigDbCacheStats(name='%suuid_to_fq_name' % self._db_prefix,
+                                  size=len(cache),
+                                  max_size=cache.container_size,
+                                  hits=cache.hits,
+                                  misses=cache.misses,
+                                  evictions=cache.evictions)
+    # end cache_stats
+
+    @classmethod
+    def sandesh_cache_stats_handle_request(cls, req):
+        caches = [client.cache_stats() for client in list(cls._clients)]
+        resp = ConfigDbCacheStatsResp(caches=caches)
+        resp.response(req.context())
+    # end sandesh_cache_stats_handle_request
+
     def uuid_to_fq_name(self, id):
         try:
             return self._cache_uuid_to_fq_name[id][0]
@@ -871,5 +1296,7 @@ class VncCassandraClient(object):
 
         result['%s_back_refs' % (back_ref_type)].append(back_ref_info)
     # end _read_back_ref
+# end class VncCassandraClient
 
-
+ConfigDbCacheStatsReq.handle_request = \
+    VncCassandraClient.sandesh_cache_stats_handle_request
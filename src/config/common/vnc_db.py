@@ -5,14 +5,170 @@
 """
 This file contains implementation of database model for contrail config daemons
 """
+import bisect
+from collections import MutableSet
 from vnc_api.common.exceptions import NoIdError
 from vnc_api.gen.resource_client import *
 from utils import obj_type_to_vnc_class
 
+
+def _intern_uuid(uuid):
+    # Returns one shared string for equal uuids. Interned strings are
+    # freed once nothing refers to them, so uuids of deleted objects are
+    # not kept around.
+    if not isinstance(uuid, basestring):
+        return uuid
+    try:
+        return intern(str(uuid))
+    except UnicodeEncodeError:
+        return uuid
+# end _intern_uuid
+
+
+class RefSet(object):
+    # Set of uuids stored as a sorted list of interned uuid strings.
+    # Behaves as a set of uuid strings, operators with other sets
+    # return a plain set. Iteration is in sorted order, unlike a set
+    # it does not depend on string hashing, so DependencyTracker visits
+    # refs in the same order in every run.
+    __slots__ = ('_uuids',)
+    __hash__ = None
+
+    def __init__(self, uuids=()):
+        self._uuids = sorted(set(_intern_uuid(uuid) for uuid in uuids))
+    # end __init__
+
+    def _index(self, uuid):
+        i = bisect.bisect_left(self._uuids, uuid)
+        if i < len(self._uuids) and self._uuids[i] == uuid:
+            return i
+        return -1
+    # end _index
+
+    def __len__(self):
+        return len(self._uuids)
+
+    def __nonzero__(self):
+        return len(self._uuids) > 0
+
+    def __contains__(self, uuid):
+        if not isinstance(uuid, basestring):
+            return False
+        return self._index(uuid) >= 0
+
+    def __iter__(self):
+        # iterate over a snapshot as callers discard while iterating
+        return iter(self._uuids[:])
+
+    def __repr__(self):
+        return 'RefSet(%r)' %(sorted(self))
+
+    def add(self, uuid):
+        i = bisect.bisect_left(self._uuids, uuid)
+        if i == len(self._uuids) or self._uuids[i] != uuid:
+            self._uuids.insert(i, _intern_uuid(uuid))
+    # end add
+
+    def discard(self, uuid):
+        i = self._index(uuid)
+        if i >= 0:
+            del self._uuids[i]
+    # end discard
+
+    def remove(self, uuid):
+        if uuid not in self:
+            raise KeyError(uuid)
+        self.discard(uuid)
+    # end remove
+
+    def pop(self):
+        if not self._uuids:
+            raise KeyError('pop from an empty set')
+        return self._uuids.pop()
+    # end pop
+
+    def clear(self):
+        self._uuids = []
+
+    def copy(self):
+        ref_set = RefSet()
+        ref_set._uuids = list(self._uuids)
+        return ref_set
+    # end copy
+
+    def update(self, *others):
+        for other in others:
+            for uuid in other:
+                self.add(uuid)
+    # end update
+
+    def difference_update(self, *others):
+        for other in others:
+            for uuid in other:
+                self.discard(uuid)
+    # end difference_update
+
+    def __eq__(self, other):
+        if isinstance(other, RefSet):
+            return self._uuids == other._uuids
+        if not isinstance(other, (set, frozenset, MutableSet)):
+            return NotImplemented
+        return set(self) == set(other)
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        if eq is NotImplemented:
+            return eq
+        return not eq
+
+    def union(self, *others):
+        return set(self).union(*others)
+
+    def intersection(self, *others):
+        return set(self).intersection(*others)
+
+    def difference(self, *others):
+        return set(self).difference(*others)
+
+    def symmetric_difference(self, other):
+        return set(self).symmetric_difference(other)
+
+    def issubset(self, other):
+        return set(self).issubset(other)
+
+    def issuperset(self, other):
+        return set(self).issuperset(other)
+
+    def isdisjoint(self, other):
+        return not any(uuid in self for uuid in other)
+
+    __or__ = __ror__ = union
+    __and__ = __rand__ = intersection
+    __sub__ = difference
+    __xor__ = __rxor__ = symmetric_difference
+    __le__ = issubset
+    __ge__ = issuperset
+
+    def __rsub__(self, other):
+        return set(other).difference(self)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __isub__(self, other):
+        self.difference_update(other)
+        return self
+# end class RefSet
+
+MutableSet.register(RefSet)
+
 class DBBase(object):
     # This is the base class for all DB objects. All derived objects must
     # have a class member called _dict of dictionary type.
     # The init method of this class must be callled before using any functions
+    # uuids are interned and multiple refs are kept in RefSet
+    __slots__ = ()
 
     _logger = None
     _cassandra = None
@@ -53,6 +209,7 @@ class DBBase(object):
     @classmethod
     def locate(cls, key, *args):
         if key not in cls._dict:
+            key = _intern_uuid(key)
             try:
                 cls._dict[key] = cls(key, *args)
             except NoIdError as e:
@@ -80,6 +237,10 @@ class DBBase(object):
             setattr(self, ref_type, ref)
         elif hasattr(self, ref_type+'s'):
             ref_set = getattr(self, ref_type+'s')
+            if isinstance(ref_set, set):
+                # keep children added by add_to_parent compact
+                ref_set = RefSet(ref_set)
+                setattr(self, ref_type+'s', ref_set)
             ref_set.add(ref)
     # end add_ref
 
@@ -93,7 +254,7 @@ class DBBase(object):
 
     def add_to_parent(self, obj_dict):
         self.parent_type = obj_dict.get('parent_type')
-        self.parent_id = obj_dict.get('parent_uuid')
+        self.parent_id = _intern_uuid(obj_dict.get('parent_uuid'))
         if not self.parent_type or not self.parent_id:
             return
         p_obj = self.get_obj_type_map()[self.parent_type].get(self.parent_id)
@@ -118,6 +279,7 @@ class DBBase(object):
                 new_id = self._cassandra.fq_name_to_uuid(ref_type, fq_name)
         else:
             new_id = None
+        new_id = _intern_uuid(new_id)
         old_id = getattr(self, ref_type, None)
         if old_id == new_id:
             return
@@ -132,27 +294,29 @@ class DBBase(object):
 
     def set_children(self, ref_type, obj):
         refs = obj.get(ref_type+'s')
-        new_refs = set()
+        new_ids = []
         for ref in refs or []:
             try:
                 new_id = ref['uuid']
             except KeyError:
                 fq_name = ref['to']
                 new_id = self._cassandra.fq_name_to_uuid(ref_type, fq_name)
-            new_refs.add(new_id)
+            new_ids.append(new_id)
+        new_refs = RefSet(new_ids)
         setattr(self, ref_type+'s', new_refs)
     # end
 
     def update_multiple_refs(self, ref_type, obj):
         refs = obj.get(ref_type+'_refs') or obj.get(ref_type+'_back_refs')
-        new_refs = set()
+        new_ids = []
         for ref in refs or []:
             try:
                 new_id = ref['uuid']
             except KeyError:
                 fq_name = ref['to']
                 new_id = self._cassandra.fq_name_to_uuid(ref_type, fq_name)
-            new_refs.add(new_id)
+            new_ids.append(new_id)
+        new_refs = RefSet(new_ids)
         old_refs = getattr(self, ref_type+'s')
         for ref_id in old_refs - new_refs:
             ref_obj = self.get_obj_type_map()[ref_type].get(ref_id)
@@ -213,11 +377,12 @@ class DBBase(object):
 
     def get_parent_uuid(self, obj):
         if 'parent_uuid' in obj:
-            return obj['parent_uuid']
+            return _intern_uuid(obj['parent_uuid'])
         else:
             parent_type = obj['parent_type'].replace('-', '_')
             parent_fq_name = obj['fq_name'][:-1]
-            return self._cassandra.fq_name_to_uuid(parent_type, parent_fq_name)
+            return _intern_uuid(
+                self._cassandra.fq_name_to_uuid(parent_type, parent_fq_name))
     # end get_parent_uuid
 
     @classmethod
@@ -236,11 +401,26 @@ class DBBase(object):
     def reset(cls):
         cls._dict = {}
 
+    # module name -> (module base class, number of its subclasses, map)
+    _obj_type_maps = {}
+
     @classmethod
     def get_obj_type_map(cls):
+        # computed once per module, again only if a class gets added to it
+        cached = DBBase._obj_type_maps.get(cls.__module__)
+        if cached is not None:
+            module_base, num_classes, obj_type_map = cached
+            if len(module_base.__subclasses__()) == num_classes:
+                return obj_type_map
+
         module_base = [x for x in DBBase.__subclasses__()
-                       if cls.__module__ == x.obj_type]
-        return dict((x.obj_type, x) for x in module_base[0].__subclasses__())
+                       if cls.__module__ == x.obj_type][0]
+        subclasses = module_base.__subclasses__()
+        obj_type_map = dict((x.obj_type, x) for x in subclasses)
+        DBBase._obj_type_maps[cls.__module__] = (
+            module_base, len(subclasses), obj_type_map)
+        return obj_type_map
+    # end get_obj_type_map
 
 # end class DBBase
 
@@ -154,7 +154,12 @@ class VncKombuClientBase(object):
 
     def _subscribe(self, body, message):
         try:
-            self._subscribe_cb(body)
+            # notifications of a bulk request come as one list message
+            if isinstance(body, list):
+                for oper_info in body:
+                    self._subscribe_cb(oper_info)
+            else:
+                self._subscribe_cb(body)
         finally:
             message.ack()
 
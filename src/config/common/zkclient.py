@@ -2,8 +2,11 @@
 # Copyright (c) 2013 Juniper Networks, Inc. All rights reserved.
 #
 import os
+import bisect
 import gevent
+import json
 import logging
+import zlib
 import kazoo.client
 import kazoo.exceptions
 import kazoo.handlers.gevent
@@ -21,8 +24,17 @@ LOG_DIR = '/var/log/contrail/'
 
 class IndexAllocator(object):
 
+    _BLOCK_SHIFT = 6
+    _BLOCK_BITS = 1 << _BLOCK_SHIFT
+
+    # Largest checkpoint, once compressed, that is written to zookeeper
+    _CHECKPOINT_MAX_SIZE = 512 * 1024
+    # Most indexes created or deleted in a single zookeeper transaction
+    _BATCH_SIZE = 256
+
     def __init__(self, zookeeper_client, path, size=0, start_idx=0, 
-                 reverse=False,alloc_list=None, max_alloc=0):
+                 reverse=False,alloc_list=None, max_alloc=0,
+                 checkpoint=False):
         self._size = size
         self._start_idx = start_idx
         if alloc_list is None:
@@ -52,47 +64,161 @@ class IndexAllocator(object):
 
         self._zookeeper_client = zookeeper_client
         self._path = path
-        self._in_use = bitarray('0')
+        # The allocated indexes are read from zookeeper on first use of
+        # the allocator, see _load_in_use
+        self._in_use = None
+        # set_in_use and reset_in_use calls made before the load
+        self._pending_in_use = []
+        # Summary of _in_use with a bit per block of _BLOCK_BITS bits, set
+        # when all bits of the block are in use. All the blocks before
+        # _free_hint are full.
+        self._full_blocks = None
+        self._free_hint = 0
         self._reverse = reverse
-        for idx in self._zookeeper_client.get_children(path):
-            idx_int = self._get_bit_from_zk_index(int(idx))
-            if idx_int >= 0:
-                self._set_in_use(idx_int)
-        # end for idx
+        # The checkpoint of the in-use bitmap is kept in the data of the
+        # node whose children are the allocated indexes
+        self._checkpoint = checkpoint and path.endswith('/')
+        self._init_ranges()
     # end __init__
 
-    def _get_zk_index_from_bit(self, idx):
-        size = idx
+    def _checkpoint_key(self):
+        return {'ranges': [[alloc['start'], alloc['end']]
+                           for alloc in self._alloc_list],
+                'reverse': bool(self._reverse),
+                'max_alloc': self._max_alloc}
+    # end _checkpoint_key
+
+    def _read_checkpoint(self):
+        # Returns the in-use bitmap stored in the checkpoint if it is still
+        # valid, that is if no index was allocated or freed since it was
+        # written, and it was written for the same allocation ranges
+        value, stat = self._zookeeper_client.read_node_stat(self._path[:-1])
+        if not value or stat is None:
+            return None
+        try:
+            header, data = value.split('\n', 1)
+            header = json.loads(header)
+            if (header['cversion'] != stat.cversion or
+                header['key'] != self._checkpoint_key()):
+                return None
+            in_use = bitarray()
+            in_use.frombytes(zlib.decompress(data))
+            return in_use[:header['length']]
+        except Exception:
+            return None
+    # end _read_checkpoint
+
+    def _write_checkpoint(self, in_use, cversion):
+        header = {'cversion': cversion, 'key': self._checkpoint_key(),
+                  'length': in_use.length()}
+        data = zlib.compress(in_use.tobytes())
+        if len(data) > self._CHECKPOINT_MAX_SIZE:
+            return
+        try:
+            self._zookeeper_client.update_node(self._path[:-1],
+                json.dumps(header) + '\n' + data)
+        except Exception as e:
+            self._zookeeper_client.syslog(
+                'Checkpoint of %s not written: %s' % (self._path, str(e)),
+                level='notice')
+    # end _write_checkpoint
+
+    def _load_in_use(self):
+        in_use = None
+        if self._checkpoint:
+            in_use = self._read_checkpoint()
+        if in_use is None:
+            if self._checkpoint:
+                children, stat = self._zookeeper_client.get_children_stat(
+                    self._path)
+            else:
+                children = self._zookeeper_client.get_children(self._path)
+            bits = []
+            for idx in children:
+                idx_int = self._get_bit_from_zk_index(int(idx))
+                if 0 <= idx_int <= self._max_alloc:
+                    bits.append(idx_int)
+            in_use = bitarray(max(bits) + 1 if bits else 1)
+            in_use.setall(0)
+            for idx_int in bits:
+                in_use[idx_int] = 1
+            if self._checkpoint and stat is not None:
+                self._write_checkpoint(in_use, stat.cversion)
+
+        # Another user of the allocator may have loaded it while this
+        # one was waiting on zookeeper
+        if self._in_use is not None:
+            return
+        self._in_use = in_use
+        self._full_blocks = bitarray()
+        self._free_hint = 0
+        for blk in xrange((in_use.length() >> self._BLOCK_SHIFT) + 1):
+            self._update_block(blk << self._BLOCK_SHIFT)
+        for bit_idx, used in self._pending_in_use:
+            if used:
+                self._set_in_use(bit_idx)
+            else:
+                self._reset_in_use(bit_idx)
+        self._pending_in_use = []
+    # end _load_in_use
+
+    def _init_ranges(self):
+        # Sorted starts of the allocation ranges, and for each range the
+        # bit of its first index, for bisect lookups between the two
+        self._range_starts = [alloc['start'] for alloc in self._alloc_list]
+        self._range_ends = [alloc['end'] for alloc in self._alloc_list]
+        sizes = [alloc['end'] - alloc['start'] + 1
+                 for alloc in self._alloc_list]
         if self._reverse:
-            for alloc in reversed(self._alloc_list):
-                size -= alloc['end'] - alloc['start'] + 1
-                if size < 0:
-                   return alloc['start']-size - 1
-        else:
-            for alloc in self._alloc_list:
-                size -= alloc['end'] - alloc['start'] + 1
-                if size < 0:
-                   return alloc['end']+size + 1
+            sizes.reverse()
+        self._range_bits = []
+        total = 0
+        for size in sizes:
+            self._range_bits.append(total)
+            total += size
+        if self._reverse:
+            self._range_bits.reverse()
+        self._total_bits = total
+        # bit numbers of the ranges in allocation order
+        self._bit_starts = sorted(self._range_bits)
+    # end _init_ranges
 
-        raise Exception()
+    def _get_zk_index_from_bit(self, idx):
+        if not 0 <= idx < self._total_bits:
+            raise Exception()
+        pos = bisect.bisect_right(self._bit_starts, idx) - 1
+        if self._reverse:
+            rng = len(self._range_starts) - 1 - pos
+            return self._range_ends[rng] - (idx - self._range_bits[rng])
+        return self._range_starts[pos] + (idx - self._range_bits[pos])
     # end _get_zk_index
 
     def _get_bit_from_zk_index(self, idx):
-        size = 0
+        rng = bisect.bisect_right(self._range_starts, idx) - 1
+        if rng < 0 or idx > self._range_ends[rng]:
+            return -1
         if self._reverse:
-            for alloc in reversed(self._alloc_list):
-                if alloc['start'] <= idx <= alloc['end']:
-                    return alloc['end'] - idx + size
-                size += alloc['end'] - alloc['start'] + 1
-            pass
-        else:
-            for alloc in self._alloc_list:
-                if alloc['start'] <= idx <= alloc['end']:
-                    return idx - alloc['start'] + size
-                size += alloc['end'] - alloc['start'] + 1
-        return -1
+            return self._range_ends[rng] - idx + self._range_bits[rng]
+        return idx - self._range_starts[rng] + self._range_bits[rng]
     # end _get_bit_from_zk_index
 
+    def _update_block(self, bitnum):
+        # Refresh the summary bit of the block holding bitnum
+        blk = bitnum >> self._BLOCK_SHIFT
+        if blk >= self._full_blocks.length():
+            temp = bitarray(blk + 1 - self._full_blocks.length())
+            temp.setall(0)
+            self._full_blocks.extend(temp)
+        start = blk << self._BLOCK_SHIFT
+        end = start + self._BLOCK_BITS
+        if end <= self._in_use.length() and self._in_use[start:end].all():
+            self._full_blocks[blk] = 1
+        else:
+            self._full_blocks[blk] = 0
+            if blk < self._free_hint:
+                self._free_hint = blk
+    # end _update_block
+
     def _set_in_use(self, bitnum):
         # if the index is higher than _max_alloc, do not use the bitarray, in
         # order to reduce the size of the bitarray. Otherwise, set the bit
@@ -106,6 +232,7 @@ class IndexAllocator(object):
             self._in_use.extend(temp)
         else:
             self._in_use[bitnum] = 1
+        self._update_block(bitnum)
     # end _set_in_use
 
     def _reset_in_use(self, bitnum):
@@ -118,12 +245,32 @@ class IndexAllocator(object):
             return
         else:
             self._in_use[bitnum] = 0
+        self._update_block(bitnum)
     # end _reset_in_use
 
+    def _find_free_bit(self):
+        # Returns the lowest bit not in use, which is the length of
+        # _in_use when all of its bits are in use
+        try:
+            blk = self._full_blocks.index(0, self._free_hint)
+        except ValueError:
+            blk = self._full_blocks.length()
+        self._free_hint = blk
+        start = blk << self._BLOCK_SHIFT
+        end = min(start + self._BLOCK_BITS, self._in_use.length())
+        try:
+            return self._in_use.index(0, start, end)
+        except ValueError:
+            return self._in_use.length()
+    # end _find_free_bit
+
     def set_in_use(self, idx):
         bit_idx = self._get_bit_from_zk_index(idx)
         if bit_idx < 0:
             return
+        if self._in_use is None:
+            self._pending_in_use.append((bit_idx, True))
+            return
         self._set_in_use(bit_idx)
     # end set_in_use
 
@@ -131,34 +278,91 @@ class IndexAllocator(object):
         bit_idx = self._get_bit_from_zk_index(idx)
         if bit_idx < 0:
             return
+        if self._in_use is None:
+            self._pending_in_use.append((bit_idx, False))
+            return
         self._reset_in_use(bit_idx)
     # end reset_in_use
 
     def get_alloc_count(self):
+        if self._in_use is None:
+            self._load_in_use()
         return self._in_use.count()
     # end get_alloc_count
 
     def alloc(self, value=None):
         # Allocates a index from the allocation list
-        if self._in_use.all():
-            idx = self._in_use.length()
-            if idx > self._max_alloc:
+        if self._in_use is None:
+            self._load_in_use()
+        while True:
+            bit_idx = self._find_free_bit()
+            if bit_idx > self._max_alloc:
                 raise ResourceExhaustionError()
-            self._in_use.append(1)
-        else:
-            idx = self._in_use.index(0)
-            self._in_use[idx] = 1
+            self._set_in_use(bit_idx)
 
-        idx = self._get_zk_index_from_bit(idx)
-        try:
-            # Create a node at path and return its integer value
-            id_str = "%(#)010d" % {'#': idx}
-            self._zookeeper_client.create_node(self._path + id_str, value)
-            return idx
-        except ResourceExistsError:
-            return self.alloc(value)
+            idx = self._get_zk_index_from_bit(bit_idx)
+            try:
+                # Create a node at path and return its integer value
+                id_str = "%(#)010d" % {'#': idx}
+                self._zookeeper_client.create_node(self._path + id_str, value)
+                return idx
+            except ResourceExistsError:
+                # Allocated by someone else, leave it in use and retry
+                continue
     # end alloc
 
+    def alloc_batch(self, count, value=None):
+        # Allocates count indexes, creating up to _BATCH_SIZE of them in
+        # each zookeeper transaction. Fewer indexes are returned when the
+        # allocation list is exhausted, none of them is left allocated
+        # when zookeeper fails.
+        if self._in_use is None:
+            self._load_in_use()
+        allocated = []
+        while len(allocated) < count:
+            bits = []
+            while len(bits) < min(count - len(allocated), self._BATCH_SIZE):
+                bit_idx = self._find_free_bit()
+                if bit_idx > self._max_alloc or bit_idx >= self._total_bits:
+                    break
+                self._set_in_use(bit_idx)
+                bits.append(bit_idx)
+            if not bits:
+                break
+
+            idxs = [self._get_zk_index_from_bit(bit) for bit in bits]
+            paths = [self._path + "%(#)010d" % {'#': idx} for idx in idxs]
+            try:
+                existing = self._zookeeper_client.create_nodes(
+                    [(path, value) for path in paths])
+            except Exception:
+                for bit_idx in bits:
+                    self._reset_in_use(bit_idx)
+                # do not leave the batch partly allocated
+                self.delete_batch(allocated)
+                raise
+            if not existing:
+                allocated.extend(idxs)
+                continue
+            # None of the batch was created. The existing indexes were
+            # allocated by someone else and stay in use, the others are
+            # tried again.
+            existing = set(existing)
+            for bit_idx, path in zip(bits, paths):
+                if path not in existing:
+                    self._reset_in_use(bit_idx)
+        return allocated
+    # end alloc_batch
+
+    def delete_batch(self, idxs):
+        for pos in range(0, len(idxs), self._BATCH_SIZE):
+            batch = idxs[pos:pos + self._BATCH_SIZE]
+            self._zookeeper_client.delete_nodes(
+                [self._path + "%(#)010d" % {'#': idx} for idx in batch])
+            for idx in batch:
+                self.reset_in_use(idx)
+    # end delete_batch
+
     def reserve(self, idx, value=None):
         # Reserves the requested index if available
         if not self._start_idx <= idx < self._start_idx + self._size:
@@ -187,14 +391,19 @@ class IndexAllocator(object):
         id_str = "%(#)010d" % {'#': idx}
         self._zookeeper_client.delete_node(self._path + id_str)
         bit_idx = self._get_bit_from_zk_index(idx)
+        if self._in_use is None:
+            if bit_idx >= 0:
+                self._pending_in_use.append((bit_idx, False))
+            return
         if 0 <= bit_idx < self._in_use.length():
             self._in_use[bit_idx] = 0
+            self._update_block(bit_idx)
     # end delete
 
     def read(self, idx):
         id_str = "%(#)010d" % {'#': idx}
         id_val = self._zookeeper_client.read_node(self._path+id_str)
-        if id_val is not None:
+        if id_val is not None and self._in_use is not None:
             bit_idx = self._get_bit_from_zk_index(idx)
             if bit_idx >= 0:
                 self._set_in_use(bit_idx)
@@ -202,6 +411,8 @@ class IndexAllocator(object):
     # end read
 
     def empty(self):
+        if self._in_use is None:
+            self._load_in_use()
         return not self._in_use.any()
     # end empty
 
@@ -345,6 +556,50 @@ class ZookeeperClient(object):
             raise ResourceExistsError(path, str(current_value))
     # end create_node
 
+    @staticmethod
+    def _transaction_error(results):
+        # A failed multi returns the error of the failing op, the ops
+        # before it are rolled back and the ones after it are not run
+        for res in results:
+            if (isinstance(res, Exception) and
+                not isinstance(res, (kazoo.exceptions.RolledBackError,
+                                     kazoo.exceptions.RuntimeInconsistency))):
+                return res
+        return None
+    # end _transaction_error
+
+    def create_nodes(self, path_values):
+        # Creates all the nodes in a single transaction. Returns the paths
+        # that already exist, in which case none of the nodes is created.
+        def _create():
+            txn = self._zk_client.transaction()
+            for path, value in path_values:
+                if value is None:
+                    value = uuid.uuid4()
+                txn.create(path, str(value))
+            return txn.commit()
+
+        retry = self._retry.copy()
+        error = self._transaction_error(retry(_create))
+        if isinstance(error, kazoo.exceptions.NoNodeError):
+            # Unlike create_node, a transaction does not create the parents
+            for parent in set(os.path.dirname(path)
+                              for path, _ in path_values):
+                retry(self._zk_client.ensure_path, parent)
+            error = self._transaction_error(retry(_create))
+        while error is not None:
+            if not isinstance(error, kazoo.exceptions.NodeExistsError):
+                raise error
+            # Only the first existing node is reported by the transaction
+            existing = [path for path, _ in path_values
+                        if retry(self._zk_client.exists, path)]
+            if existing:
+                return existing
+            # deleted in the meantime
+            error = self._transaction_error(retry(_create))
+        return []
+    # end create_nodes
+
     def delete_node(self, path, recursive=False):
         try:
             retry = self._retry.copy()
@@ -355,6 +610,28 @@ class ZookeeperClient(object):
             raise e
     # end delete_node
 
+    def delete_nodes(self, paths):
+        # Deletes the nodes in a single transaction, leaving out the ones
+        # that are already gone
+        paths = list(paths)
+        retry = self._retry.copy()
+        while paths:
+            def _delete():
+                txn = self._zk_client.transaction()
+                for path in paths:
+                    txn.delete(path)
+                return txn.commit()
+
+            error = self._transaction_error(retry(_delete))
+            if error is None:
+                break
+            if not isinstance(error, kazoo.exceptions.NoNodeError):
+                raise error
+            # Only the first missing node is reported by the transaction
+            paths = [path for path in paths
+                     if retry(self._zk_client.exists, path)]
+    # end delete_nodes
+
     def read_node(self, path):
         try:
             retry = self._retry.copy()
@@ -364,6 +641,24 @@ class ZookeeperClient(object):
             return None
     # end read_node
 
+    def read_node_stat(self, path):
+        # Returns the value of the node along with its ZnodeStat
+        try:
+            retry = self._retry.copy()
+            value, stat = retry(self._zk_client.get, path)
+            return value, stat
+        except Exception:
+            return None, None
+    # end read_node_stat
+
+    def update_node(self, path, value):
+        try:
+            retry = self._retry.copy()
+            retry(self._zk_client.set, path, str(value))
+        except kazoo.exceptions.NoNodeError:
+            self.create_node(path, value)
+    # end update_node
+
     def get_children(self, path):
         try:
             retry = self._retry.copy()
@@ -372,6 +667,18 @@ class ZookeeperClient(object):
             return []
     # end read_node
 
+    def get_children_stat(self, path):
+        # Returns the children of the node along with the ZnodeStat of
+        # the node, read at the same time
+        try:
+            retry = self._retry.copy()
+            children, stat = retry(self._zk_client.get_children, path,
+                                   include_data=True)
+            return children, stat
+        except Exception:
+            return [], None
+    # end get_children_stat
+
     def _sandesh_connection_info_update(self, status, message):
         from pysandesh.connection_info import ConnectionState
         from pysandesh.gen_py.process_info.ttypes import ConnectionStatus, \
@@ -282,6 +282,7 @@ class DeviceManager(object):
                                 set(ids))
             elif oper_info['oper'] == 'DELETE':
                 obj_id = oper_info['uuid']
+                self._cassandra.cache_uuid_to_fq_name_del(obj_id)
                 obj = obj_class.get(obj_id)
                 if obj is None:
                     return
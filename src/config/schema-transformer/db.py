@@ -83,10 +83,11 @@ class SchemaTransformerDB(VncCassandraClient):
             zkclient.delete_node(self._zk_path_pfx + "/id", True)
 
         self._vn_id_allocator = IndexAllocator(
-            zkclient, self._zk_path_pfx+self._VN_ID_ALLOC_PATH, self._VN_MAX_ID)
+            zkclient, self._zk_path_pfx+self._VN_ID_ALLOC_PATH, self._VN_MAX_ID,
+            checkpoint=True)
         self._sg_id_allocator = IndexAllocator(
             zkclient, self._zk_path_pfx+self._SECURITY_GROUP_ID_ALLOC_PATH,
-            self._SECURITY_GROUP_MAX_ID)
+            self._SECURITY_GROUP_MAX_ID, checkpoint=True)
 
         # 0 is not a valid sg id any more. So, if it was previously allocated,
         # delete it and reserve it
@@ -96,7 +97,7 @@ class SchemaTransformerDB(VncCassandraClient):
 
         self._rt_allocator = IndexAllocator(
             zkclient, self._zk_path_pfx+self._BGP_RTGT_ALLOC_PATH,
-            self._BGP_RTGT_MAX_ID, common.BGP_RTGT_MIN_ID)
+            self._BGP_RTGT_MAX_ID, common.BGP_RTGT_MIN_ID, checkpoint=True)
 
         self._sc_vlan_allocator_dict = {}
     # end __init__
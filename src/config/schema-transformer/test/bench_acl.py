@@ -0,0 +1,94 @@
+#
+# Copyright (c) 2015 Juniper Networks, Inc. All rights reserved.
+#
+
+"""
+Benchmark of the ACL generation of the schema transformer. Builds the
+static ACL entries of a network from a policy with many rules the way
+process_poll_result does: the ACL rules of each policy rule are merged in
+the entries, then a deny rule in each direction is added per entry. Each
+policy rule allows one port between the network and one of the networks
+it connects to.
+
+    python bench_acl.py [--rules 2000] [--networks 50] [--rounds 3]
+"""
+import argparse
+import sys
+import time
+
+from vnc_api.vnc_api import *
+from schema_transformer.to_bgp import AclRuleListST
+
+NETWORK = 'default-domain:bench:vn'
+
+
+def make_rules(args):
+    rules = []
+    for idx in range(args.rules):
+        remote = 'default-domain:bench:vn-%d' % (idx % args.networks)
+        protocol = ['6', '17'][idx % 2]
+        port = PortType(1000 + idx, 1000 + idx)
+        for src, dst in [(NETWORK, remote), (remote, NETWORK)]:
+            match = MatchConditionType(protocol,
+                                       AddressType(virtual_network=src),
+                                       PortType(-1, -1),
+                                       AddressType(virtual_network=dst),
+                                       port)
+            rules.append(AclRuleType(match, ActionListType('pass')))
+    return rules
+# end make_rules
+
+
+def build_acl(rules):
+    acl_entries = AclEntriesType(dynamic='false')
+    for idx in range(0, len(rules), 2):
+        acl_rule_list = AclRuleListST(rules[idx:idx + 2])
+        acl_rule_list.update_acl_entries(acl_entries)
+
+    acl_list = AclRuleListST()
+    match = MatchConditionType('any', AddressType(virtual_network=NETWORK),
+                               PortType(-1, -1),
+                               AddressType(virtual_network=NETWORK),
+                               PortType(-1, -1))
+    acl_list.append(AclRuleType(match, ActionListType('pass')))
+    for rule in acl_entries.get_acl_rule():
+        for src, dst in [(rule.match_condition.src_address,
+                          rule.match_condition.dst_address),
+                         (rule.match_condition.dst_address,
+                          rule.match_condition.src_address)]:
+            match = MatchConditionType('any', src, PortType(-1, -1),
+                                       dst, PortType(-1, -1))
+            acl_list.append(AclRuleType(match, ActionListType('deny')))
+    match = MatchConditionType('any', AddressType(virtual_network='any'),
+                               PortType(-1, -1),
+                               AddressType(virtual_network='any'),
+                               PortType(-1, -1))
+    acl_list.append(AclRuleType(match, ActionListType('pass')))
+    acl_list.update_acl_entries(acl_entries)
+    return acl_entries
+# end build_acl
+
+
+def main(args_str=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rules', type=int, default=2000,
+                        help='Number of rules of the policy')
+    parser.add_argument('--networks', type=int, default=50,
+                        help='Number of networks the policy connects to')
+    parser.add_argument('--rounds', type=int, default=3,
+                        help='Number of times the ACL is generated')
+    args = parser.parse_args(args_str)
+
+    elapsed = 0.0
+    for _ in range(args.rounds):
+        rules = make_rules(args)
+        start = time.time()
+        acl_entries = build_acl(rules)
+        elapsed += time.time() - start
+    print 'acl: %d rules from %d policy rules in %.2fs per round' % (
+        len(acl_entries.get_acl_rule()), args.rules,
+        elapsed / max(1, args.rounds))
+# end main
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,166 @@
+#
+# Copyright (c) 2015 Juniper Networks, Inc. All rights reserved.
+#
+
+"""
+Benchmark of the processing of config updates by the schema transformer.
+Builds the networks, policies and service interfaces of a large config in
+memory, then times process_poll_result for updates of the rules of one
+policy at a time. The api server and cassandra are replaced by mocks, the
+number of vrf assign tables recreated and of analyzer lookups per update
+are reported along with the time.
+
+    python bench_to_bgp.py [--vns 10000] [--policies 1000]
+                           [--service-vmis 1000] [--analyzers 10]
+                           [--updates 100]
+"""
+import argparse
+import logging
+import sys
+import time
+from cStringIO import StringIO
+
+import mock
+from lxml import etree
+
+from vnc_api.vnc_api import *
+from schema_transformer import to_bgp
+from schema_transformer.to_bgp import SchemaTransformer, DBBaseST, \
+    NetworkPolicyST, VirtualNetworkST, VirtualMachineInterfaceST
+
+PROJECT = ['default-domain', 'bench']
+
+
+def vn_name(idx):
+    return ':'.join(PROJECT + ['vn-%d' % idx])
+# end vn_name
+
+
+def make_entries(src_vn, dst_vn, analyzer=None, action='pass'):
+    action_list = ActionListType(simple_action=action)
+    if analyzer:
+        action_list.mirror_to = MirrorActionType(analyzer_name=analyzer)
+    prule = PolicyRuleType(direction='<>', protocol='any',
+                           src_addresses=[AddressType(virtual_network=src_vn)],
+                           dst_addresses=[AddressType(virtual_network=dst_vn)],
+                           src_ports=[PortType(-1, -1)],
+                           dst_ports=[PortType(-1, -1)],
+                           action_list=action_list)
+    return PolicyEntriesType([prule])
+# end make_entries
+
+
+def make_meta(entries):
+    buf = StringIO()
+    entries.export(buf, name_='network-policy-entries')
+    return etree.fromstring(buf.getvalue())
+# end make_meta
+
+
+def get_analyzer(args, idx):
+    if idx < args.analyzers:
+        return ':'.join(PROJECT + ['analyzer-%d' % idx])
+    return None
+# end get_analyzer
+
+
+def make_config(args):
+    project = Project(PROJECT[-1], Domain(PROJECT[0]))
+    for idx in range(args.vns):
+        obj = VirtualNetwork('vn-%d' % idx, project)
+        obj.set_virtual_network_network_id(idx + 1)
+        vn = VirtualNetworkST.locate(vn_name(idx), obj)
+        vn.rinst[vn._default_ri_name] = mock.MagicMock()
+
+    # policy n is attached to the networks n, n + policies, ... and
+    # connects each of them to the last one
+    for idx in range(args.policies):
+        policy_name = ':'.join(PROJECT + ['policy-%d' % idx])
+        policy = NetworkPolicyST.locate(policy_name)
+        members = range(idx, args.vns, args.policies)
+        policy.add_rules(make_entries('local', vn_name(members[-1]),
+                                      get_analyzer(args, idx)))
+        for member in members:
+            policy.networks_back_ref.add(vn_name(member))
+            VirtualNetworkST.get(vn_name(member)).add_policy(
+                policy_name, VirtualNetworkPolicyType(SequenceType(0, 0)))
+
+    for idx in range(args.service_vmis):
+        vmi = VirtualMachineInterfaceST.__new__(VirtualMachineInterfaceST)
+        vmi.name = ':'.join(PROJECT + ['vm-%d' % idx, 'vmi-%d' % idx])
+        vmi.service_interface_type = 'left' if idx % 2 == 0 else 'right'
+        vmi.interface_mirror = None
+        vmi.virtual_network = vn_name(idx * args.vns / args.service_vmis)
+        vmi.instance_ips = set()
+        vmi.floating_ips = set()
+        VirtualMachineInterfaceST._dict[vmi.name] = vmi
+        VirtualMachineInterfaceST._vn_dict.setdefault(
+            vmi.virtual_network, []).append(vmi)
+        VirtualMachineInterfaceST._service_vmi_list.append(vmi)
+# end make_config
+
+
+def main(args_str=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--vns', type=int, default=10000,
+                        help='Number of virtual networks')
+    parser.add_argument('--policies', type=int, default=1000,
+                        help='Number of network policies')
+    parser.add_argument('--service-vmis', type=int, default=1000,
+                        help='Number of service interfaces')
+    parser.add_argument('--analyzers', type=int, default=10,
+                        help='Number of policies that mirror to an analyzer')
+    parser.add_argument('--updates', type=int, default=100,
+                        help='Number of policy updates')
+    args = parser.parse_args(args_str)
+
+    logging.basicConfig(level=logging.WARNING)
+    to_bgp._vnc_lib = mock.MagicMock()
+    to_bgp._sandesh = mock.MagicMock()
+    cassandra = mock.MagicMock()
+    # objects that are not in memory are not found
+    cassandra.read.return_value = (False, 'not found')
+    DBBaseST.init(None, logging.getLogger('bench_to_bgp'), cassandra)
+
+    recreated = []
+    with mock.patch.object(VirtualNetworkST, 'uve_send'), \
+         mock.patch.object(VirtualNetworkST, 'locate_routing_instance'), \
+         mock.patch.object(VirtualMachineInterfaceST,
+                           'recreate_vrf_assign_table',
+                           lambda vmi: recreated.append(vmi.name)):
+        start = time.time()
+        make_config(args)
+        print 'config: %d vns, %d policies in %.2fs' % (
+            args.vns, args.policies, time.time() - start)
+
+        transformer = SchemaTransformer.__new__(SchemaTransformer)
+        transformer.ifmap_search_done = True
+        cassandra.read.reset_mock()
+        elapsed = 0.0
+        for update in range(args.updates):
+            idx = update % args.policies
+            policy_name = ':'.join(PROJECT + ['policy-%d' % idx])
+            members = range(idx, args.vns, args.policies)
+            # alternate between pass and deny for the rule of the policy
+            action = 'deny' if (update / args.policies) % 2 == 0 else 'pass'
+            meta = make_meta(make_entries('local', vn_name(members[-1]),
+                                          get_analyzer(args, idx), action))
+            result = [('updateResult', {'network-policy': policy_name},
+                       [meta])]
+            with mock.patch.object(to_bgp, 'parse_poll_result',
+                                   return_value=result):
+                start = time.time()
+                transformer.process_poll_result('')
+                elapsed += time.time() - start
+
+    updates = max(1, args.updates)
+    print 'updates: %d in %.2fs (%.2f ms/update)' % (
+        args.updates, elapsed, elapsed * 1e3 / updates)
+    print 'vrf assign tables recreated: %.1f/update' % (
+        len(recreated) / float(updates))
+    print 'analyzer lookups: %.1f/update' % (
+        cassandra.read.call_count / float(updates))
+# end main
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
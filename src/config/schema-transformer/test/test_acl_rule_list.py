@@ -0,0 +1,188 @@
+#
+# Copyright (c) 2015 Juniper Networks, Inc. All rights reserved.
+#
+
+"""
+Unit tests of the ACL rule lists of the schema transformer. The indexed
+subset check of AclRuleListST is compared with a scan of all the rules, the
+way the check was done before the rules were indexed.
+"""
+import random
+import unittest
+
+from vnc_api.vnc_api import *
+from schema_transformer.to_bgp import AclRuleListST
+
+
+class ScanAclRuleList(AclRuleListST):
+    # a rule is a subset of the list if it is a subset of one of its rules
+
+    def _rule_is_subset(self, rule):
+        lhs = rule.match_condition
+        for elem in self._list:
+            rhs = elem.match_condition
+            if (self._port_is_subset(lhs.src_port, rhs.src_port) and
+                    self._port_is_subset(lhs.dst_port, rhs.dst_port) and
+                    rhs.protocol in [lhs.protocol, 'any'] and
+                    self._address_is_subset(lhs.src_address,
+                                            rhs.src_address) and
+                    self._address_is_subset(lhs.dst_address,
+                                            rhs.dst_address)):
+                if not self.dynamic:
+                    return True
+                if (rule.action_list.mirror_to.analyzer_name ==
+                        elem.action_list.mirror_to.analyzer_name):
+                    return True
+        return False
+    # end _rule_is_subset
+
+    def update_acl_entries(self, acl_entries):
+        old_list = ScanAclRuleList(acl_entries.get_acl_rule(), self.dynamic)
+        self._list[:] = [rule for rule in self._list if old_list.append(rule)]
+        acl_entries.set_acl_rule(old_list.get_list())
+    # end update_acl_entries
+# end class ScanAclRuleList
+
+
+def make_rule(protocol='any', src=None, dst=None, src_ports=(-1, -1),
+              dst_ports=(-1, -1), analyzer=None):
+    match = MatchConditionType(protocol,
+                               src or AddressType(virtual_network='any'),
+                               PortType(*src_ports),
+                               dst or AddressType(virtual_network='any'),
+                               PortType(*dst_ports))
+    action_list = ActionListType(simple_action='pass')
+    if analyzer:
+        action_list.mirror_to = MirrorActionType(analyzer_name=analyzer)
+    return AclRuleType(match, action_list)
+# end make_rule
+
+
+def subnet(prefix, prefix_len):
+    return AddressType(subnet=SubnetType(prefix, prefix_len))
+# end subnet
+
+
+class TestAclRuleList(unittest.TestCase):
+
+    def assertSubset(self, rule_list, rule, expected=True):
+        for cls in [AclRuleListST, ScanAclRuleList]:
+            acl = cls(list(rule_list))
+            self.assertEqual(acl._rule_is_subset(rule), expected, cls.__name__)
+    # end assertSubset
+
+    def test_port_any(self):
+        # an end port of -1 is any port from the start port up
+        rules = [make_rule(dst_ports=(1000, -1))]
+        self.assertSubset(rules, make_rule(dst_ports=(2000, 3000)))
+        self.assertSubset(rules, make_rule(dst_ports=(1000, -1)))
+        self.assertSubset(rules, make_rule(dst_ports=(500, 600)), False)
+        self.assertSubset(rules, make_rule(dst_ports=(-1, -1)), False)
+        rules = [make_rule(src_ports=(0, 100))]
+        self.assertSubset(rules, make_rule(src_ports=(10, 20)))
+        self.assertSubset(rules, make_rule(src_ports=(10, 200)), False)
+        # ranges within a wider one do not hide it
+        rules = [make_rule(dst_ports=(80, 80)), make_rule(dst_ports=(0, -1)),
+                 make_rule(dst_ports=(443, 443))]
+        self.assertSubset(rules, make_rule(dst_ports=(8080, 8080)))
+    # end test_port_any
+
+    def test_subnet(self):
+        rules = [make_rule(src=subnet('10.1.0.0', 16))]
+        self.assertSubset(rules, make_rule(src=subnet('10.1.0.0', 24)))
+        self.assertSubset(rules, make_rule(src=subnet('10.1.0.0', 16)))
+        self.assertSubset(rules, make_rule(src=subnet('10.1.0.0', 8)), False)
+        self.assertSubset(rules, make_rule(src=subnet('10.2.0.0', 24)),
+                          False)
+        self.assertSubset(rules, make_rule(), False)
+    # end test_subnet
+
+    def test_any(self):
+        rules = [make_rule(protocol='any',
+                           dst=AddressType(virtual_network='any'))]
+        self.assertSubset(rules, make_rule(
+            protocol='6', dst=AddressType(virtual_network='vn')))
+        rules = [make_rule(protocol='6',
+                           dst=AddressType(virtual_network='vn'))]
+        self.assertSubset(rules, make_rule(
+            protocol='any', dst=AddressType(virtual_network='vn')), False)
+        self.assertSubset(rules, make_rule(
+            protocol='6', dst=AddressType(virtual_network='any')), False)
+        self.assertSubset(rules, make_rule(
+            protocol='6', dst=subnet('10.1.0.0', 24)), False)
+    # end test_any
+
+    def test_dynamic(self):
+        for cls in [AclRuleListST, ScanAclRuleList]:
+            acl = cls([make_rule(analyzer='analyzer-1')], dynamic=True)
+            self.assertTrue(acl._rule_is_subset(
+                make_rule(dst_ports=(80, 80), analyzer='analyzer-1')))
+            self.assertFalse(acl._rule_is_subset(
+                make_rule(dst_ports=(80, 80), analyzer='analyzer-2')))
+    # end test_dynamic
+
+    def random_rule(self, rnd, dynamic):
+        def ports():
+            start = rnd.choice([-1, 0, 22, 80, 100, 443, 1000, 8080])
+            end = rnd.choice([-1, start, start + 10, start + 1000, 80, 443,
+                              65535])
+            return (start, end)
+
+        def address():
+            if rnd.random() < 0.5:
+                return AddressType(virtual_network=rnd.choice(
+                    ['any', 'vn-1', 'vn-2', 'vn-3']))
+            return subnet(rnd.choice(['10.0.0.0', '10.1.0.0']),
+                          rnd.choice([8, 16, 24, 32]))
+
+        analyzer = None
+        if dynamic:
+            analyzer = rnd.choice(['analyzer-1', 'analyzer-2'])
+        return make_rule(protocol=rnd.choice(['any', '1', '6', '17']),
+                         src=address(), dst=address(), src_ports=ports(),
+                         dst_ports=ports(), analyzer=analyzer)
+    # end random_rule
+
+    def test_random_append(self):
+        rnd = random.Random(0)
+        for trial in range(200):
+            dynamic = trial % 3 == 0
+            rules = [self.random_rule(rnd, dynamic)
+                     for _ in range(rnd.randint(0, 20))]
+            acl = AclRuleListST(list(rules), dynamic)
+            scan = ScanAclRuleList(list(rules), dynamic)
+            for _ in range(rnd.randint(0, 200)):
+                rule = self.random_rule(rnd, dynamic)
+                self.assertEqual(acl.append(rule), scan.append(rule),
+                                 'trial %d' % trial)
+            self.assertEqual(acl.get_list(), scan.get_list())
+    # end test_random_append
+
+    def test_random_update_acl_entries(self):
+        rnd = random.Random(1)
+        for trial in range(200):
+            dynamic = trial % 3 == 0
+            rules = [self.random_rule(rnd, dynamic)
+                     for _ in range(rnd.randint(0, 50))]
+            entries = [self.random_rule(rnd, dynamic)
+                       for _ in range(rnd.randint(0, 30))]
+            acl = AclRuleListST(list(rules), dynamic)
+            scan = ScanAclRuleList(list(rules), dynamic)
+            acl_entries = AclEntriesType(acl_rule=list(entries))
+            scan_entries = AclEntriesType(acl_rule=list(entries))
+            acl.update_acl_entries(acl_entries)
+            scan.update_acl_entries(scan_entries)
+            self.assertEqual(acl_entries.get_acl_rule(),
+                             scan_entries.get_acl_rule(), 'trial %d' % trial)
+            self.assertEqual(acl.get_list(), scan.get_list())
+            # the list is indexed again after the update
+            for _ in range(20):
+                rule = self.random_rule(rnd, dynamic)
+                self.assertEqual(acl.append(rule), scan.append(rule),
+                                 'trial %d' % trial)
+    # end test_random_update_acl_entries
+# end class TestAclRuleList
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,492 @@
+#
+# Copyright (c) 2015 Juniper Networks, Inc. All rights reserved.
+#
+
+"""
+Unit tests of the indexes the schema transformer keeps of what networks and
+service interfaces depend on, and of the vrf assign tables process_poll_result
+recreates from them. The objects are built in memory, the api server and
+cassandra are mocked.
+"""
+import logging
+import random
+import unittest
+import uuid
+from cStringIO import StringIO
+
+import mock
+from lxml import etree
+
+from vnc_api.vnc_api import *
+from cfgm_common.exceptions import NoIdError
+from schema_transformer import to_bgp
+from schema_transformer.to_bgp import SchemaTransformer, DBBaseST, \
+    NetworkPolicyST, VirtualNetworkST, VirtualMachineInterfaceST, \
+    VirtualMachineST
+
+PROJECT = ['default-domain', 'test']
+
+
+def fq_name(name):
+    return ':'.join(PROJECT + [name])
+# end fq_name
+
+
+def make_rule(src_vn, dst_vn, analyzer=None, services=None, policy=None):
+    action_list = ActionListType(simple_action='pass')
+    if analyzer:
+        action_list.mirror_to = MirrorActionType(analyzer_name=analyzer)
+    if services:
+        action_list.apply_service = services
+    dst_address = AddressType(virtual_network=dst_vn)
+    if policy:
+        dst_address = AddressType(network_policy=policy)
+    return PolicyRuleType(direction='<>', protocol='any',
+                          src_addresses=[AddressType(virtual_network=src_vn)],
+                          dst_addresses=[dst_address],
+                          src_ports=[PortType(-1, -1)],
+                          dst_ports=[PortType(-1, -1)],
+                          action_list=action_list)
+# end make_rule
+
+
+def make_meta(tag, entries=None, text=None):
+    if entries is None:
+        meta = etree.Element(tag)
+        meta.text = text
+        return meta
+    buf = StringIO()
+    entries.export(buf, name_=tag)
+    return etree.fromstring(buf.getvalue())
+# end make_meta
+
+
+class STIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        super(STIndexTestCase, self).setUp()
+        self._vnc_lib = mock.MagicMock()
+        cassandra = mock.MagicMock()
+        # objects that are not in memory are not found
+        cassandra.read.return_value = (False, 'not found')
+        DBBaseST.init(None, logging.getLogger('test_dependency_index'),
+                      cassandra)
+        # networks of the analyzers, by analyzer name
+        self._analyzer_vns = {}
+        for patch in [
+                mock.patch.object(to_bgp, '_vnc_lib', self._vnc_lib),
+                mock.patch.object(to_bgp, '_sandesh', mock.MagicMock()),
+                mock.patch.object(VirtualNetworkST, 'uve_send'),
+                mock.patch.object(VirtualNetworkST, 'locate_routing_instance'),
+                mock.patch.object(
+                    VirtualNetworkST, 'get_analyzer_vn_and_ip',
+                    side_effect=lambda name: (self._analyzer_vns.get(name),
+                                              None)),
+                mock.patch.object(VirtualMachineST, 'read_vnc_obj'),
+                mock.patch.object(VirtualMachineST, 'get_service_mode',
+                                  return_value='in-network')]:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.reset()
+        self.addCleanup(self.reset)
+
+        self._transformer = SchemaTransformer.__new__(SchemaTransformer)
+        self._transformer.ifmap_search_done = True
+        self._transformer.current_network_set = set()
+        self._transformer.current_vmi_set = set()
+    # end setUp
+
+    @staticmethod
+    def reset():
+        SchemaTransformer.reset()
+        VirtualMachineInterfaceST._vn_dict = {}
+        VirtualMachineInterfaceST._service_vmi_list = []
+    # end reset
+
+    def create_network(self, name):
+        obj = VirtualNetwork(name, Project(PROJECT[-1], Domain(PROJECT[0])))
+        obj.set_virtual_network_network_id(len(VirtualNetworkST._dict) + 1)
+        vn = VirtualNetworkST.locate(fq_name(name), obj)
+        ri = mock.MagicMock()
+        ri.name = vn._default_ri_name
+        vn.rinst[ri.name] = ri
+        return vn
+    # end create_network
+
+    def create_policy(self, name, networks, rules):
+        policy = NetworkPolicyST.locate(fq_name(name))
+        policy.add_rules(PolicyEntriesType(rules))
+        for network in networks:
+            policy.networks_back_ref.add(network)
+            VirtualNetworkST.get(network).add_policy(
+                policy.name, VirtualNetworkPolicyType(SequenceType(0, 0)))
+        return policy
+    # end create_policy
+
+    def create_interface(self, name, network, interface_type=None, vm=None):
+        name = fq_name(name)
+        obj = mock.MagicMock()
+        obj.uuid = str(uuid.uuid4())
+        obj.parent_type = 'project'
+        obj.get_vrf_assign_table.return_value = None
+        obj.get_virtual_network_refs.return_value = [
+            {'to': network.split(':')}]
+        obj.get_floating_ip_back_refs.return_value = None
+        obj.get_routing_instance_refs.return_value = None
+        obj.get_virtual_machine_refs.return_value = None
+        obj.get_virtual_machine_interface_properties.return_value = \
+            VirtualMachineInterfacePropertiesType(
+                service_interface_type=interface_type)
+        vmi = VirtualMachineInterfaceST.locate(name, obj)
+        if vm is not None:
+            self._transformer.add_virtual_machine_interface_virtual_machine(
+                {'virtual-machine-interface': name,
+                 'virtual-machine': fq_name(vm)}, None)
+        return vmi
+    # end create_interface
+
+    def process(self, result_list):
+        with mock.patch.object(to_bgp, 'parse_poll_result',
+                               return_value=result_list):
+            self._transformer.process_poll_result('')
+    # end process
+# end class STIndexTestCase
+
+
+class TestNetworkPolicyIndex(STIndexTestCase):
+
+    def assertIndexesConsistent(self):
+        # the indexes are what add_rules would make of the current rules
+        expected = {'analyzer_vn_set': {}, 'analyzers': {}, 'services': {},
+                    'policies': {}}
+        for policy in NetworkPolicyST.values():
+            analyzers = set()
+            services = set()
+            policies = set()
+            for prule in policy.rules:
+                if prule.action_list.mirror_to:
+                    analyzers.add(prule.action_list.mirror_to.analyzer_name)
+                services |= set(prule.action_list.apply_service or [])
+                for addr in prule.src_addresses + prule.dst_addresses:
+                    if addr.network_policy:
+                        policies.add(addr.network_policy)
+            self.assertEqual(policy.analyzers, analyzers)
+            self.assertEqual(policy.services, services)
+            self.assertEqual(policy.policies, policies)
+            for attr in expected:
+                for ref in getattr(policy, attr):
+                    expected[attr].setdefault(ref, set()).add(policy.name)
+        self.assertEqual(NetworkPolicyST._analyzer_vn_dict,
+                         expected['analyzer_vn_set'])
+        self.assertEqual(NetworkPolicyST._analyzer_dict,
+                         expected['analyzers'])
+        self.assertEqual(NetworkPolicyST._service_dict, expected['services'])
+        self.assertEqual(NetworkPolicyST._policy_dict, expected['policies'])
+    # end assertIndexesConsistent
+
+    def test_add_rules(self):
+        self._analyzer_vns['analyzer'] = fq_name('vn-analyzer')
+        policy = self.create_policy('policy', [], [
+            make_rule('local', 'any', analyzer='analyzer'),
+            make_rule('local', 'any', services=['si-1', 'si-2']),
+            make_rule('local', 'any', policy='other-policy')])
+        self.assertEqual(NetworkPolicyST.get_by_analyzer('analyzer'),
+                         set([policy.name]))
+        self.assertEqual(
+            NetworkPolicyST.get_by_analyzer_vn(fq_name('vn-analyzer')),
+            set([policy.name]))
+        self.assertEqual(NetworkPolicyST.get_by_service('si-2'),
+                         set([policy.name]))
+        self.assertEqual(NetworkPolicyST.get_by_policy('other-policy'),
+                         set([policy.name]))
+        self.assertIndexesConsistent()
+
+        # the refs of the old rules are dropped, not left as empty sets
+        policy.add_rules(PolicyEntriesType(
+            [make_rule('local', 'any', services=['si-2'])]))
+        self.assertEqual(NetworkPolicyST._analyzer_dict, {})
+        self.assertEqual(NetworkPolicyST._analyzer_vn_dict, {})
+        self.assertEqual(NetworkPolicyST._service_dict,
+                         {'si-2': set([policy.name])})
+        self.assertEqual(NetworkPolicyST._policy_dict, {})
+        self.assertIndexesConsistent()
+
+        policy.add_rules(None)
+        self.assertIndexesConsistent()
+        self.assertEqual(NetworkPolicyST._service_dict, {})
+    # end test_add_rules
+
+    def test_analyzer_vn(self):
+        policy = self.create_policy('policy', [], [
+            make_rule('local', 'any', analyzer='analyzer')])
+        # the analyzer has no network yet
+        self.assertEqual(NetworkPolicyST._analyzer_vn_dict, {})
+        policy.add_analyzer_vn(fq_name('vn-analyzer'))
+        self.assertEqual(
+            NetworkPolicyST.get_by_analyzer_vn(fq_name('vn-analyzer')),
+            set([policy.name]))
+        self.assertIndexesConsistent()
+        policy.delete_analyzer_vn(fq_name('vn-analyzer'))
+        self.assertEqual(NetworkPolicyST._analyzer_vn_dict, {})
+        self.assertIndexesConsistent()
+    # end test_analyzer_vn
+
+    def test_network_delete(self):
+        vn = self.create_network('vn-analyzer')
+        self.create_network('vn')
+        self._analyzer_vns['analyzer'] = vn.name
+        policy = self.create_policy('policy', [fq_name('vn')], [
+            make_rule('local', 'any', analyzer='analyzer')])
+        self.assertEqual(VirtualNetworkST.delete(vn.name),
+                         set([fq_name('vn')]))
+        self.assertEqual(policy.analyzer_vn_set, set())
+        self.assertIndexesConsistent()
+    # end test_network_delete
+
+    def test_delete_and_reset(self):
+        self._analyzer_vns['analyzer'] = fq_name('vn-analyzer')
+        rules = [make_rule('local', 'any', analyzer='analyzer',
+                           services=['si'], policy='other-policy')]
+        policy1 = self.create_policy('policy-1', [], rules)
+        policy2 = self.create_policy('policy-2', [], rules)
+        self.assertEqual(NetworkPolicyST.get_by_service('si'),
+                         set([policy1.name, policy2.name]))
+        NetworkPolicyST.delete(policy1.name)
+        self.assertEqual(NetworkPolicyST.get_by_service('si'),
+                         set([policy2.name]))
+        self.assertIndexesConsistent()
+        # deleting a policy that is gone already is a no-op
+        NetworkPolicyST.delete(policy1.name)
+        self.assertIndexesConsistent()
+
+        NetworkPolicyST.reset()
+        for ref_dict in [NetworkPolicyST._analyzer_dict,
+                         NetworkPolicyST._analyzer_vn_dict,
+                         NetworkPolicyST._service_dict,
+                         NetworkPolicyST._policy_dict]:
+            self.assertEqual(ref_dict, {})
+        # a policy created again after the reset is indexed from scratch
+        policy1 = self.create_policy('policy-1', [], rules)
+        self.assertEqual(NetworkPolicyST.get_by_service('si'),
+                         set([policy1.name]))
+        self.assertIndexesConsistent()
+    # end test_delete_and_reset
+
+    def test_random_updates(self):
+        rnd = random.Random(0)
+        names = ['policy-%d' % idx for idx in range(5)]
+        analyzers = ['analyzer-%d' % idx for idx in range(3)]
+        self._analyzer_vns = dict((analyzer, fq_name('vn-%s' % analyzer))
+                                  for analyzer in analyzers[:2])
+
+        def random_rule():
+            return make_rule(
+                'local', 'any',
+                analyzer=rnd.choice(analyzers + [None]),
+                services=rnd.sample(['si-0', 'si-1', 'si-2'],
+                                    rnd.randint(0, 2)),
+                policy=rnd.choice(names + [None]))
+
+        for _ in range(500):
+            name = fq_name(rnd.choice(names))
+            action = rnd.random()
+            if action < 0.6:
+                rules = [random_rule() for _ in range(rnd.randint(0, 3))]
+                NetworkPolicyST.locate(name).add_rules(
+                    PolicyEntriesType(rules))
+            elif action < 0.75:
+                policy = NetworkPolicyST.get(name)
+                if policy is not None:
+                    policy.add_analyzer_vn(fq_name('vn-extra'))
+            elif action < 0.9:
+                policy = NetworkPolicyST.get(name)
+                if policy is not None:
+                    policy.delete_analyzer_vn(
+                        rnd.choice(self._analyzer_vns.values() +
+                                   [fq_name('vn-extra')]))
+            elif action < 0.98:
+                NetworkPolicyST.delete(name)
+            else:
+                NetworkPolicyST.reset()
+            self.assertIndexesConsistent()
+    # end test_random_updates
+# end class TestNetworkPolicyIndex
+
+
+class TestVirtualMachineInterfaceIndex(STIndexTestCase):
+
+    def setUp(self):
+        super(TestVirtualMachineInterfaceIndex, self).setUp()
+        self.create_network('vn')
+        VirtualMachineST.locate(fq_name('vm'), 'si')
+        self._vmi = self.create_interface('vmi', fq_name('vn'), 'left', 'vm')
+        self._transformer.current_vmi_set = set()
+    # end setUp
+
+    def test_ip_dict(self):
+        vmi = self._vmi
+        vmi.add_instance_ip('ip-1')
+        vmi.add_floating_ip('fip-1')
+        self.assertEqual(VirtualMachineInterfaceST.get_by_ip('ip-1'),
+                         set([vmi.name]))
+        self.assertEqual(VirtualMachineInterfaceST.get_by_ip('fip-1'),
+                         set([vmi.name]))
+
+        # an address that is both an instance and a floating ip of the
+        # interface stays indexed until both are gone
+        vmi.add_floating_ip('ip-1')
+        vmi.delete_instance_ip('ip-1')
+        self.assertEqual(VirtualMachineInterfaceST.get_by_ip('ip-1'),
+                         set([vmi.name]))
+        vmi.delete_floating_ip('ip-1')
+        self.assertEqual(VirtualMachineInterfaceST.get_by_ip('ip-1'), set())
+        self.assertNotIn('ip-1', VirtualMachineInterfaceST._ip_dict)
+
+        other = self.create_interface('vmi-other', fq_name('vn'))
+        other.add_floating_ip('fip-1')
+        self.assertEqual(VirtualMachineInterfaceST.get_by_ip('fip-1'),
+                         set([vmi.name, other.name]))
+        VirtualMachineInterfaceST.delete(vmi.name)
+        self.assertEqual(VirtualMachineInterfaceST._ip_dict,
+                         {'fip-1': set([other.name])})
+
+        VirtualMachineInterfaceST.reset()
+        self.assertEqual(VirtualMachineInterfaceST._ip_dict, {})
+    # end test_ip_dict
+
+    def test_current_vmi_set(self):
+        transformer = self._transformer
+        vmi_name = self._vmi.name
+        ip_idents = {'virtual-machine-interface': vmi_name,
+                     'instance-ip': 'ip-1'}
+        fip_idents = {'virtual-machine-interface': vmi_name,
+                      'floating-ip': 'fip-1'}
+        transformer.add_instance_ip_virtual_machine_interface(ip_idents, None)
+        transformer.add_floating_ip_virtual_machine_interface(fip_idents,
+                                                              None)
+
+        for (func, idents, meta) in [
+                (transformer.add_instance_ip_address, ip_idents,
+                 make_meta('instance-ip-address', text='10.0.0.1')),
+                (transformer.delete_instance_ip_address, ip_idents, None),
+                (transformer.add_floating_ip_address, fip_idents,
+                 make_meta('floating-ip-address', text='10.1.0.1')),
+                (transformer.delete_floating_ip_address, fip_idents, None),
+                (transformer.delete_instance_ip_virtual_machine_interface,
+                 ip_idents, None),
+                (transformer.delete_floating_ip_virtual_machine_interface,
+                 fip_idents, None),
+                (transformer.delete_virtual_machine_service_instance,
+                 {'virtual-machine': fq_name('vm'),
+                  'service-instance': 'si'}, None),
+                (transformer.add_virtual_machine_interface_virtual_machine,
+                 {'virtual-machine-interface': vmi_name,
+                  'virtual-machine': fq_name('vm-2')}, None)]:
+            transformer.current_vmi_set = set()
+            func(idents, meta)
+            self.assertEqual(transformer.current_vmi_set, set([vmi_name]),
+                             func.__name__)
+
+        # an address of no interface changes no vrf assign table
+        transformer.current_vmi_set = set()
+        transformer.add_instance_ip_address(
+            {'instance-ip': 'ip-2'},
+            make_meta('instance-ip-address', text='10.0.0.2'))
+        self.assertEqual(transformer.current_vmi_set, set())
+    # end test_current_vmi_set
+
+    def test_service_instance_interfaces(self):
+        transformer = self._transformer
+        transformer.add_virtual_machine_service_instance(
+            {'virtual-machine': fq_name('vm'), 'service-instance': 'si'},
+            None)
+        self.assertEqual(transformer.current_vmi_set, set([self._vmi.name]))
+        transformer.current_vmi_set = set()
+        transformer.add_service_instance_interfaces('si')
+        self.assertEqual(transformer.current_vmi_set, set([self._vmi.name]))
+    # end test_service_instance_interfaces
+# end class TestVirtualMachineInterfaceIndex
+
+
+class TestVrfAssignTable(STIndexTestCase):
+
+    def setUp(self):
+        super(TestVrfAssignTable, self).setUp()
+        for idx in range(4):
+            self.create_network('vn-%d' % idx)
+        VirtualMachineST.locate(fq_name('vm'), 'si')
+        # a left interface on each network, and one that is not a service
+        # interface
+        for idx in range(4):
+            self.create_interface('vmi-%d' % idx, fq_name('vn-%d' % idx),
+                                  'left', 'vm')
+        self.create_interface('vmi-plain', fq_name('vn-0'))
+        self.create_policy('policy-0', [fq_name('vn-0'), fq_name('vn-1')],
+                           [make_rule('local', fq_name('vn-1'))])
+        self.create_policy('policy-1', [fq_name('vn-2'), fq_name('vn-3')],
+                           [make_rule('local', fq_name('vn-3'))])
+    # end setUp
+
+    def test_recreate_for_changed_networks(self):
+        recreated = []
+        entries = PolicyEntriesType([make_rule('local', fq_name('vn-1'))])
+        entries.policy_rule[0].action_list.simple_action = 'deny'
+        with mock.patch.object(VirtualMachineInterfaceST,
+                               'recreate_vrf_assign_table',
+                               lambda vmi: recreated.append(vmi.name)):
+            self.process([('updateResult',
+                           {'network-policy': fq_name('policy-0')},
+                           [make_meta('network-policy-entries', entries)])])
+            self.assertEqual(sorted(recreated),
+                             [fq_name('vmi-0'), fq_name('vmi-1')])
+
+            del recreated[:]
+            self.process([('updateResult',
+                           {'instance-ip': 'ip-1'},
+                           [make_meta('instance-ip-address',
+                                      text='10.0.0.1')])])
+            self.assertEqual(recreated, [])
+
+            self._transformer.add_instance_ip_virtual_machine_interface(
+                {'virtual-machine-interface': fq_name('vmi-2'),
+                 'instance-ip': 'ip-1'}, None)
+            self.process([('updateResult',
+                           {'instance-ip': 'ip-1'},
+                           [make_meta('instance-ip-address',
+                                      text='10.0.0.2')])])
+            self.assertEqual(recreated, [fq_name('vmi-2')])
+    # end test_recreate_for_changed_networks
+
+    def test_retry_failed_update(self):
+        self.create_network('vn-4')
+        vmi = self.create_interface('vmi-4', fq_name('vn-4'), 'left', 'vm')
+        vmi.add_instance_ip('ip-1')
+        # the table last written is not the one that gets computed
+        vmi.vrf_table = 'stale'
+        update = self._vnc_lib.virtual_machine_interface_update
+        update.reset_mock()
+        update.side_effect = Exception('api server down')
+        result = [('updateResult', {'instance-ip': 'ip-1'},
+                   [make_meta('instance-ip-address', text='10.0.0.1')])]
+        self.assertRaises(Exception, self.process, result)
+        self.assertEqual(update.call_count, 1)
+
+        # a later update that changes nothing of the interface retries it,
+        # until it goes through
+        update.side_effect = NoIdError('other-uuid')
+        unrelated = [('updateResult', {'instance-ip': 'ip-2'},
+                      [make_meta('instance-ip-address', text='10.0.0.2')])]
+        self.process(unrelated)
+        self.assertEqual(update.call_count, 2)
+        update.side_effect = None
+        self.process(unrelated)
+        self.assertEqual(update.call_count, 3)
+        self.assertEqual(vmi.vrf_table, 'null')
+        self.process(unrelated)
+        self.assertEqual(update.call_count, 3)
+    # end test_retry_failed_update
+# end class TestVrfAssignTable
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -20,6 +20,7 @@ import requests
 import ConfigParser
 import cgitb
 
+import bisect
 import copy
 import argparse
 import socket
@@ -314,10 +315,10 @@ class VirtualNetworkST(DBBaseST):
                     nid = props.network_id
             if nid:
                 cls._cassandra.free_vn_id(nid - 1)
-            for policy in NetworkPolicyST.values():
-                if name in policy.analyzer_vn_set:
-                    analyzer_vn_set |= policy.networks_back_ref
-                    policy.analyzer_vn_set.discard(name)
+            for policy_name in list(NetworkPolicyST.get_by_analyzer_vn(name)):
+                policy = NetworkPolicyST.get(policy_name)
+                analyzer_vn_set |= policy.networks_back_ref
+                policy.delete_analyzer_vn(name)
 
             vn.route_table_refs = set()
             vn.update_route_table()
@@ -1119,6 +1120,13 @@ class RouteTargetST(DBBaseST):
 
 class NetworkPolicyST(DBBaseST):
     _dict = {}
+    # names of the policies by the analyzers they mirror to, the networks
+    # of those analyzers, the services they apply and the policies they
+    # refer to
+    _analyzer_dict = {}
+    _analyzer_vn_dict = {}
+    _service_dict = {}
+    _policy_dict = {}
     obj_type = 'network_policy'
 
     def __init__(self, name, obj=None):
@@ -1127,6 +1135,8 @@ class NetworkPolicyST(DBBaseST):
         self.internal = False
         self.rules = []
         self.analyzer_vn_set = set()
+        self.analyzers = set()
+        self.services = set()
         self.policies = set()
         if obj:
             self.add_rules(obj.get_network_policy_entries())
@@ -1140,26 +1150,106 @@ class NetworkPolicyST(DBBaseST):
                 vn.add_policy(name, vnp)
     # end __init__
 
+    @classmethod
+    def delete(cls, name):
+        policy = cls.get(name)
+        if policy is None:
+            return
+        policy._set_refs(set(), set(), set(), set())
+        del cls._dict[name]
+    # end delete
+
+    @classmethod
+    def reset(cls):
+        super(NetworkPolicyST, cls).reset()
+        cls._analyzer_dict = {}
+        cls._analyzer_vn_dict = {}
+        cls._service_dict = {}
+        cls._policy_dict = {}
+    # end reset
+
+    @staticmethod
+    def _update_dict(ref_dict, name, old_refs, new_refs):
+        for ref in old_refs - new_refs:
+            ref_dict[ref].discard(name)
+            if not ref_dict[ref]:
+                del ref_dict[ref]
+        for ref in new_refs - old_refs:
+            ref_dict.setdefault(ref, set()).add(name)
+    # end _update_dict
+
+    def _set_refs(self, analyzer_vn_set, analyzers, services, policies):
+        self._update_dict(self._analyzer_vn_dict, self.name,
+                          self.analyzer_vn_set, analyzer_vn_set)
+        self._update_dict(self._analyzer_dict, self.name,
+                          self.analyzers, analyzers)
+        self._update_dict(self._service_dict, self.name,
+                          self.services, services)
+        self._update_dict(self._policy_dict, self.name,
+                          self.policies, policies)
+        self.analyzer_vn_set = analyzer_vn_set
+        self.analyzers = analyzers
+        self.services = services
+        self.policies = policies
+    # end _set_refs
+
+    def add_analyzer_vn(self, vn_name):
+        self._set_refs(self.analyzer_vn_set | set([vn_name]), self.analyzers,
+                       self.services, self.policies)
+    # end add_analyzer_vn
+
+    def delete_analyzer_vn(self, vn_name):
+        self._set_refs(self.analyzer_vn_set - set([vn_name]), self.analyzers,
+                       self.services, self.policies)
+    # end delete_analyzer_vn
+
+    @classmethod
+    def get_by_analyzer(cls, analyzer_name):
+        return cls._analyzer_dict.get(analyzer_name, set())
+    # end get_by_analyzer
+
+    @classmethod
+    def get_by_analyzer_vn(cls, vn_name):
+        return cls._analyzer_vn_dict.get(vn_name, set())
+    # end get_by_analyzer_vn
+
+    @classmethod
+    def get_by_service(cls, si_name):
+        return cls._service_dict.get(si_name, set())
+    # end get_by_service
+
+    @classmethod
+    def get_by_policy(cls, policy_name):
+        return cls._policy_dict.get(policy_name, set())
+    # end get_by_policy
+
     def add_rules(self, entries):
         network_set = self.networks_back_ref | self.analyzer_vn_set
         if entries is None:
             self.rules = []
         else:
             self.rules = entries.policy_rule
-        self.policies = set()
-        self.analyzer_vn_set = set()
+        policies = set()
+        analyzer_vn_set = set()
+        analyzers = set()
+        services = set()
         for prule in self.rules:
             if (prule.action_list and prule.action_list.mirror_to and
                     prule.action_list.mirror_to.analyzer_name):
+                analyzer_name = prule.action_list.mirror_to.analyzer_name
+                analyzers.add(analyzer_name)
                 (vn, _) = VirtualNetworkST.get_analyzer_vn_and_ip(
-                    prule.action_list.mirror_to.analyzer_name)
+                    analyzer_name)
                 if vn:
-                    self.analyzer_vn_set.add(vn)
+                    analyzer_vn_set.add(vn)
+            if prule.action_list and prule.action_list.apply_service:
+                services |= set(prule.action_list.apply_service)
             for addr in prule.src_addresses + prule.dst_addresses:
                 if addr.network_policy:
-                    self.policies.add(addr.network_policy)
+                    policies.add(addr.network_policy)
         # end for prule
-        
+        self._set_refs(analyzer_vn_set, analyzers, services, policies)
+
         network_set |= self.analyzer_vn_set
         return network_set & set(n for n in VirtualNetworkST)
     #end add_rules
@@ -1904,10 +1994,18 @@ class ServiceChain(DBBaseST):
 
 
 class AclRuleListST(object):
+    # Rules are indexed by analyzer (dynamic ACLs only), protocol and source
+    # and destination address. The rules of an index entry are grouped by
+    # source port range, and each group keeps only the destination port
+    # ranges that are not within another one of the group, sorted by start
+    # port. Their end ports are then sorted too, and whether a port range
+    # is within one of them takes a bisect.
+    _PORT_END_ANY = float('inf')
 
     def __init__(self, rule_list=None, dynamic=False):
         self._list = rule_list or []
         self.dynamic = dynamic
+        self._reindex()
     # end __init__
 
     def get_list(self):
@@ -1917,6 +2015,7 @@ class AclRuleListST(object):
     def append(self, rule):
         if not self._rule_is_subset(rule):
             self._list.append(rule)
+            self._index_rule(rule)
             return True
         return False
     # end append
@@ -1936,28 +2035,90 @@ class AclRuleListST(object):
                     rhs.subnet.ip_prefix_len <= lhs.subnet.ip_prefix_len)
         return False
 
+    @staticmethod
+    def _address_key(addr):
+        if addr.subnet is None:
+            return ('vn', addr.virtual_network)
+        return ('subnet', addr.subnet.ip_prefix, addr.subnet.ip_prefix_len)
+
+    def _address_keys(self, addr):
+        # keys of the addresses that addr is a subset of
+        if addr.subnet is None:
+            return set([('vn', addr.virtual_network), ('vn', 'any')])
+        prefix = addr.subnet.ip_prefix
+        return set(('subnet', prefix, plen)
+                   for plen in self._prefix_lens.get(prefix, [])
+                   if plen <= addr.subnet.ip_prefix_len)
+
+    def _rule_key(self, rule, protocol, src_key, dst_key):
+        analyzer = None
+        if self.dynamic:
+            analyzer = rule.action_list.mirror_to.analyzer_name
+        return (analyzer, protocol, src_key, dst_key)
+
+    def _port_end(self, port):
+        if port.end_port == -1:
+            return self._PORT_END_ANY
+        return port.end_port
+
+    def _reindex(self):
+        self._index = {}
+        self._prefix_lens = {}
+        for rule in self._list:
+            self._index_rule(rule)
+    # end _reindex
+
+    def _index_rule(self, rule):
+        match = rule.match_condition
+        for addr in [match.src_address, match.dst_address]:
+            if addr.subnet is not None:
+                self._prefix_lens.setdefault(addr.subnet.ip_prefix, set()).add(
+                    addr.subnet.ip_prefix_len)
+        key = self._rule_key(rule, match.protocol,
+                             self._address_key(match.src_address),
+                             self._address_key(match.dst_address))
+        src_ports = (match.src_port.start_port,
+                     self._port_end(match.src_port))
+        starts, ends = self._index.setdefault(key, {}).setdefault(
+            src_ports, ([], []))
+        start = match.dst_port.start_port
+        end = self._port_end(match.dst_port)
+        pos = bisect.bisect_right(starts, start)
+        if pos and ends[pos - 1] >= end:
+            return
+        # drop the ranges that are within the new one
+        pos = bisect.bisect_left(starts, start)
+        last = bisect.bisect_right(ends, end, pos)
+        starts[pos:last] = [start]
+        ends[pos:last] = [end]
+    # end _index_rule
+
     def _rule_is_subset(self, rule):
-        for elem in self._list:
-            lhs = rule.match_condition
-            rhs = elem.match_condition
-            if (self._port_is_subset(lhs.src_port, rhs.src_port) and
-                self._port_is_subset(lhs.dst_port, rhs.dst_port) and
-                rhs.protocol in [lhs.protocol, 'any'] and
-                self._address_is_subset(lhs.src_address, rhs.src_address) and
-                self._address_is_subset(lhs.dst_address, rhs.dst_address)):
-
-                if not self.dynamic:
-                    return True
-                if (rule.action_list.mirror_to.analyzer_name ==
-                        elem.action_list.mirror_to.analyzer_name):
-                    return True
-        # end for elem
+        lhs = rule.match_condition
+        src_keys = self._address_keys(lhs.src_address)
+        dst_keys = self._address_keys(lhs.dst_address)
+        for protocol in set([lhs.protocol, 'any']):
+            for src_key in src_keys:
+                for dst_key in dst_keys:
+                    groups = self._index.get(
+                        self._rule_key(rule, protocol, src_key, dst_key))
+                    if not groups:
+                        continue
+                    for (start, end), (starts, ends) in groups.iteritems():
+                        if (lhs.src_port.start_port < start or
+                                lhs.src_port.end_port > end):
+                            continue
+                        pos = bisect.bisect_right(starts,
+                                                  lhs.dst_port.start_port)
+                        if pos and ends[pos - 1] >= lhs.dst_port.end_port:
+                            return True
         return False
     # end _rule_is_subset
 
     def update_acl_entries(self, acl_entries):
         old_list = AclRuleListST(acl_entries.get_acl_rule(), self.dynamic)
         self._list[:] = [rule for rule in self._list if old_list.append(rule)]
+        self._reindex()
         acl_entries.set_acl_rule(old_list.get_list())
     # end update_acl_entries
 # end AclRuleListST
@@ -2040,7 +2201,11 @@ class BgpRouterST(DBBaseST):
 class VirtualMachineInterfaceST(DBBaseST):
     _dict = {}
     _vn_dict = {}
+    _ip_dict = {}
     _service_vmi_list = []
+    # names of the interfaces whose vrf assign table is to be recreated,
+    # an interface stays in it until the update of the table goes through
+    _vrf_assign_retry_set = set()
     obj_type = 'virtual_machine_interface'
 
     def __init__(self, name, obj=None):
@@ -2076,6 +2241,9 @@ class VirtualMachineInterfaceST(DBBaseST):
         vmi = cls.get(name)
         if vmi is None:
             return
+        for ip_name in vmi.instance_ips | vmi.floating_ips:
+            vmi._delete_ip(ip_name)
+        cls._vrf_assign_retry_set.discard(name)
         try:
             if vmi.virtual_network and vmi.virtual_network in cls._vn_dict:
                 cls._vn_dict[vmi.virtual_network].remove(vmi)
@@ -2089,16 +2257,53 @@ class VirtualMachineInterfaceST(DBBaseST):
     def get_vmi_on_network(cls, network_name):
         return cls._vn_dict.get(network_name, [])
 
+    @classmethod
+    def reset(cls):
+        super(VirtualMachineInterfaceST, cls).reset()
+        cls._ip_dict = {}
+        cls._vrf_assign_retry_set = set()
+    # end reset
+
+    @classmethod
+    def get_by_ip(cls, ip_name):
+        return cls._ip_dict.get(ip_name, set())
+
     @classmethod
     def get_service_interfaces(cls):
         return cls._service_vmi_list
 
+    @classmethod
+    def recreate_vrf_assign_tables(cls, vmi_names):
+        # the interfaces whose update failed before are retried along with
+        # the ones asked for
+        cls._vrf_assign_retry_set |= vmi_names
+        for vmi_name in list(cls._vrf_assign_retry_set):
+            cls._vrf_assign_retry_set.discard(vmi_name)
+            vmi = cls.get(vmi_name)
+            if vmi is not None:
+                vmi.recreate_vrf_assign_table()
+    # end recreate_vrf_assign_tables
+
+    def _add_ip(self, ip_name):
+        self._ip_dict.setdefault(ip_name, set()).add(self.name)
+    # end _add_ip
+
+    def _delete_ip(self, ip_name):
+        vmi_set = self._ip_dict.get(ip_name, set())
+        vmi_set.discard(self.name)
+        if not vmi_set:
+            self._ip_dict.pop(ip_name, None)
+    # end _delete_ip
+
     def add_instance_ip(self, ip_name):
         self.instance_ips.add(ip_name)
+        self._add_ip(ip_name)
     # end add_instance_ip
     
     def delete_instance_ip(self, ip_name):
         self.instance_ips.discard(ip_name)
+        if ip_name not in self.floating_ips:
+            self._delete_ip(ip_name)
     # end delete_instance_ip
 
     def get_any_instance_ip_address(self):
@@ -2111,10 +2316,13 @@ class VirtualMachineInterfaceST(DBBaseST):
 
     def add_floating_ip(self, ip_name):
         self.floating_ips.add(ip_name)
+        self._add_ip(ip_name)
     # end add_floating_ip
 
     def delete_floating_ip(self, ip_name):
         self.floating_ips.discard(ip_name)
+        if ip_name not in self.instance_ips:
+            self._delete_ip(ip_name)
     # end delete_floating_ip
 
     def set_service_interface_type(self, service_interface_type):
@@ -2246,20 +2454,17 @@ class VirtualMachineInterfaceST(DBBaseST):
         if not vm_obj.service_instance:
             return network_set
         si_name = vm_obj.service_instance
-        for policy in NetworkPolicyST.values():
-            for prule in policy.rules:
-                if prule.action_list is not None:
-                    if si_name in prule.action_list.apply_service:
-                        network_set |= policy.networks_back_ref
-                    elif (prule.action_list.mirror_to and
-                          si_name == prule.action_list.mirror_to.analyzer_name):
-                        (vn, _) = VirtualNetworkST.get_analyzer_vn_and_ip(
-                            si_name)
-                        if vn:
-                            policy.analyzer_vn_set.add(vn)
-                        network_set |= policy.networks_back_ref
-            # end for prule
-        # end for policy
+        for policy_name in NetworkPolicyST.get_by_service(si_name):
+            policy = NetworkPolicyST.get(policy_name)
+            network_set |= policy.networks_back_ref
+        analyzer_policies = NetworkPolicyST.get_by_analyzer(si_name)
+        if analyzer_policies:
+            (vn, _) = VirtualNetworkST.get_analyzer_vn_and_ip(si_name)
+            for policy_name in list(analyzer_policies):
+                policy = NetworkPolicyST.get(policy_name)
+                if vn:
+                    policy.add_analyzer_vn(vn)
+                network_set |= policy.networks_back_ref
         return network_set
     # end rebake
 
@@ -2357,9 +2562,11 @@ class VirtualMachineInterfaceST(DBBaseST):
         vrf_table_pickle = jsonpickle.encode(vrf_table)
         if vrf_table_pickle != self.vrf_table:
             self.obj.set_vrf_assign_table(vrf_table)
+            self._vrf_assign_retry_set.add(self.name)
             try:
                 _vnc_lib.virtual_machine_interface_update(self.obj)
                 self.vrf_table = vrf_table_pickle
+                self._vrf_assign_retry_set.discard(self.name)
             except NoIdError as e:
                 if e._unknown_id == self.uuid:
                     VirtualMachineInterfaceST.delete(self.name)
@@ -2847,9 +3054,9 @@ class SchemaTransformer(object):
         if virtual_network:
             del virtual_network.policies[policy_name]
             self.current_network_set.add(network_name)
-        for pol in NetworkPolicyST.values():
-            if policy_name in pol.policies:
-                self.current_network_set |= pol.networks_back_ref
+        for pol_name in NetworkPolicyST.get_by_policy(policy_name):
+            pol = NetworkPolicyST.get(pol_name)
+            self.current_network_set |= pol.networks_back_ref
     # end delete_virtual_network_network_policy
 
     def delete_project_virtual_network(self, idents, meta):
@@ -2974,9 +3181,9 @@ class SchemaTransformer(object):
         virtual_network.add_policy(policy_name, vnp)
         self.current_network_set |= (
             policy.networks_back_ref | policy.analyzer_vn_set)
-        for pol in NetworkPolicyST.values():
-            if policy_name in pol.policies:
-                self.current_network_set |= pol.networks_back_ref
+        for pol_name in NetworkPolicyST.get_by_policy(policy_name):
+            pol = NetworkPolicyST.get(pol_name)
+            self.current_network_set |= pol.networks_back_ref
     # end add_virtual_network_network_policy
 
     def add_virtual_network_network_ipam(self, idents, meta):
@@ -3017,6 +3224,7 @@ class SchemaTransformer(object):
         vmi = VirtualMachineInterfaceST.get(vmi_name)
         if vmi is not None:
             vmi.delete_instance_ip(ip_name)
+            self.current_vmi_set.add(vmi_name)
     # end delete_instance_ip_virtual_machine_interface
 
     def add_instance_ip_address(self, idents, meta):
@@ -3024,11 +3232,13 @@ class SchemaTransformer(object):
         address = meta.text
 
         ip = InstanceIpST.locate(ip_name, address)
+        self.current_vmi_set |= VirtualMachineInterfaceST.get_by_ip(ip_name)
     # end add_instance_ip_address
 
     def delete_instance_ip_address(self, idents, meta):
         ip_name = idents['instance-ip']
         InstanceIpST.delete(ip_name)
+        self.current_vmi_set |= VirtualMachineInterfaceST.get_by_ip(ip_name)
     # end delete_instance_ip_address
 
     def add_floating_ip_virtual_machine_interface(self, idents, meta):
@@ -3046,17 +3256,20 @@ class SchemaTransformer(object):
         vmi = VirtualMachineInterfaceST.get(vmi_name)
         if vmi is not None:
             vmi.delete_floating_ip(ip_name)
+            self.current_vmi_set.add(vmi_name)
     # end delete_floating_ip_virtual_machine_interface
 
     def add_floating_ip_address(self, idents, meta):
         ip_name = idents['floating-ip']
         address = meta.text
         FloatingIpST.locate(ip_name, address)
+        self.current_vmi_set |= VirtualMachineInterfaceST.get_by_ip(ip_name)
     # end add_floating_ip_address
 
     def delete_floating_ip_address(self, idents, meta):
         ip_name = idents['floating-ip']
         FloatingIpST.delete(ip_name)
+        self.current_vmi_set |= VirtualMachineInterfaceST.get_by_ip(ip_name)
     # end delete_floating_ip_address
 
     def add_virtual_machine_interface_properties(self, idents, meta):
@@ -3076,6 +3289,7 @@ class SchemaTransformer(object):
         vmi = VirtualMachineInterfaceST.locate(vmi_name)
         if vmi is not None:
             vmi.set_virtual_machine(vm_name)
+            self.current_vmi_set.add(vmi_name)
         vm = VirtualMachineST.get(vm_name)
         if vm is not None:
             vm.add_interface(vmi_name)
@@ -3113,21 +3327,25 @@ class SchemaTransformer(object):
             if vmi.virtual_network:
                 network_set.add(vmi.virtual_network)
 
-        for policy in NetworkPolicyST.values():
-            for rule in policy.rules:
-                if (rule.action_list is not None and
-                    rule.action_list.mirror_to is not None and
-                    rule.action_list.mirror_to.analyzer_name is not None):
-                    if rule.action_list.mirror_to.analyzer_name == si_name:
-                        self.current_network_set |= policy.networks_back_ref
-                        self.current_network_set |= network_set
-                        break
+        analyzer_policies = NetworkPolicyST.get_by_analyzer(si_name)
+        if analyzer_policies:
+            (vn_analyzer, _) = VirtualNetworkST.get_analyzer_vn_and_ip(si_name)
+            for policy_name in list(analyzer_policies):
+                policy = NetworkPolicyST.get(policy_name)
+                if vn_analyzer:
+                    policy.add_analyzer_vn(vn_analyzer)
+                self.current_network_set |= policy.networks_back_ref
+            self.current_network_set |= network_set
+        self.current_vmi_set |= vm.interfaces
     # end add_virtual_machine_service_instance
 
     def delete_virtual_machine_service_instance(self, idents, meta):
         vm_name = idents['virtual-machine']
         si_name = idents['service-instance']
-        vm = VirtualMachineST.delete(vm_name)
+        vm = VirtualMachineST.get(vm_name)
+        if vm is not None:
+            self.current_vmi_set |= vm.interfaces
+        VirtualMachineST.delete(vm_name)
         si = ServiceInstanceST.get(si_name)
         if si:
             si.virtual_machines.remove(vm_name)
@@ -3197,6 +3415,7 @@ class SchemaTransformer(object):
         si = ServiceInstanceST.locate(si_name)
         if si:
             self.current_network_set |= si.add_properties(si_props)
+            self.add_service_instance_interfaces(si_name)
     # end add_service_instance_properties
 
     def delete_service_instance_properties(self, idents, meta):
@@ -3204,8 +3423,17 @@ class SchemaTransformer(object):
         si = ServiceInstanceST.get(si_name)
         if si:
             self.current_network_set |= si.delete_properties()
+            self.add_service_instance_interfaces(si_name)
     # end delete_service_instance_properties
 
+    def add_service_instance_interfaces(self, si_name):
+        # the vrf assign table of the interfaces depends on the service mode
+        for vm_name in VirtualMachineST.get_by_service_instance(si_name):
+            vm = VirtualMachineST.get(vm_name)
+            if vm is not None:
+                self.current_vmi_set |= vm.interfaces
+    # end add_service_instance_interfaces
+
     def add_virtual_network_route_table(self, idents, meta):
         network_name = idents['virtual-network']
         route_table_name = idents['route-table']
@@ -3285,6 +3513,7 @@ class SchemaTransformer(object):
         something_done = False
         result_list = parse_poll_result(poll_result_str)
         self.current_network_set = set()
+        self.current_vmi_set = set()
 
         # first pass thru the ifmap message and build data model
         for (result_type, idents, metas) in result_list:
@@ -3314,6 +3543,11 @@ class SchemaTransformer(object):
         if not something_done:
             return
 
+        # networks of the analyzers of the policies, looked up once per
+        # poll, and the networks of the service interfaces to update
+        analyzer_vns = {}
+        vmi_network_set = set(self.current_network_set)
+
         # Second pass to construct ACL entries and connectivity table
         for network_name in self.current_network_set:
             virtual_network = VirtualNetworkST.get(network_name)
@@ -3435,20 +3669,21 @@ class SchemaTransformer(object):
             # This VN could be the VN for an analyzer interface. If so, we need
             # to create a link from all VNs containing a policy with that
             # analyzer
-            for policy in NetworkPolicyST.values():
-                for prule in policy.rules:
-                    if (prule.action_list is None or
-                        prule.action_list.mirror_to is None or
-                        prule.action_list.mirror_to.analyzer_name is None):
-                        continue
-                    (vn_analyzer, _) = VirtualNetworkST.get_analyzer_vn_and_ip(
-                        prule.action_list.mirror_to.analyzer_name)
-                    if vn_analyzer != network_name:
-                        continue
-                    for net_name in policy.networks_back_ref:
-                        net = VirtualNetworkST.get(net_name)
-                        if net is not None:
-                            virtual_network.add_connection(net_name)
+            for policy_name in NetworkPolicyST.get_by_analyzer_vn(network_name):
+                policy = NetworkPolicyST.get(policy_name)
+                for analyzer_name in policy.analyzers:
+                    if analyzer_name not in analyzer_vns:
+                        (analyzer_vns[analyzer_name], _) = \
+                            VirtualNetworkST.get_analyzer_vn_and_ip(
+                                analyzer_name)
+                    if analyzer_vns[analyzer_name] == network_name:
+                        break
+                else:
+                    continue
+                for net_name in policy.networks_back_ref:
+                    net = VirtualNetworkST.get(net_name)
+                    if net is not None:
+                        virtual_network.add_connection(net_name)
 
             # Derive connectivity changes between VNs
             new_connections = virtual_network.expand_connections()
@@ -3501,6 +3736,14 @@ class SchemaTransformer(object):
                         service_chain.delete()
             # for remote_vn_name
 
+            # the service interfaces of the chains of this VN may need a
+            # different vrf assign table
+            for service_chain_list in (virtual_network.service_chains.values() +
+                                       old_service_chains.values()):
+                for service_chain in service_chain_list or []:
+                    vmi_network_set.add(service_chain.left_vn)
+                    vmi_network_set.add(service_chain.right_vn)
+
             virtual_network.update_route_table()
         # end for self.current_network_set
         for network_name in self.current_network_set:
@@ -3508,8 +3751,15 @@ class SchemaTransformer(object):
             virtual_network.uve_send()
         # end for self.current_network_set
 
-        for vmi in VirtualMachineInterfaceST.get_service_interfaces():
-            vmi.recreate_vrf_assign_table()
+        # Only the service interfaces on the networks that changed, or whose
+        # own config changed, need their vrf assign table recreated
+        vmi_set = set(self.current_vmi_set)
+        for network_name in vmi_network_set:
+            for vmi in VirtualMachineInterfaceST.get_vmi_on_network(
+                    network_name):
+                if vmi.service_interface_type in ['left', 'right']:
+                    vmi_set.add(vmi.name)
+        VirtualMachineInterfaceST.recreate_vrf_assign_tables(vmi_set)
     # end process_poll_result
 
     def sandesh_ri_build(self, vn_name, ri_name):
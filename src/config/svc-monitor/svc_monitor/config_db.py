@@ -11,6 +11,8 @@ from cfgm_common import svc_info
 
 class DBBaseSM(DBBase):
     obj_type = __name__
+    # subclasses with many instances may define __slots__
+    __slots__ = ()
 
 class LoadbalancerPoolSM(DBBaseSM):
     _dict = {}
@@ -184,6 +186,10 @@ class HealthMonitorSM(DBBaseSM):
 class VirtualMachineSM(DBBaseSM):
     _dict = {}
     obj_type = 'virtual_machine'
+    __slots__ = ('uuid', 'name', 'fq_name', 'display_name',
+                 'service_instance', 'virtual_router',
+                 'virtual_machine_interfaces', 'virtualization_type',
+                 'proj_fq_name', 'index')
 
     def __init__(self, uuid, obj_dict=None):
         self.uuid = uuid
@@ -257,6 +263,10 @@ class VirtualRouterSM(DBBaseSM):
 class VirtualMachineInterfaceSM(DBBaseSM):
     _dict = {}
     obj_type = 'virtual_machine_interface'
+    __slots__ = ('uuid', 'name', 'fq_name', 'params', 'if_type',
+                 'virtual_ip', 'virtual_network', 'virtual_machine',
+                 'loadbalancer_pool', 'logical_interface', 'instance_ip',
+                 'floating_ip', 'interface_route_table', 'security_group')
 
     def __init__(self, uuid, obj_dict=None):
         self.uuid = uuid
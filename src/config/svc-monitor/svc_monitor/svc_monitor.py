@@ -214,6 +214,7 @@ class SvcMonitor(object):
                 dependency_tracker.evaluate(obj_type, obj)
             elif oper_info['oper'] == 'DELETE':
                 obj_id = oper_info['uuid']
+                self._cassandra.cache_uuid_to_fq_name_del(obj_id)
                 obj = obj_class.get(obj_id)
                 if obj is None:
                     return
@@ -647,7 +647,7 @@ class DepTrackTester(unittest.TestCase):
         self.assertEqual(len(dependency_tracker.resources), 2)
         self.assertTrue("blue" in dependency_tracker.resources)
         self.assertTrue("green" in dependency_tracker.resources)
-        self.assertEqual(dependency_tracker.resources["green"], ["fake-green-uuid-1", "fake-green-uuid-0"])
+        self.assertEqual(dependency_tracker.resources["green"], ["fake-green-uuid-0", "fake-green-uuid-1"])
         self.assertEqual(dependency_tracker.resources["blue"], ["fake-blue-uuid"])
         RedSM.delete("fake-red-uuid")
         GreenSM.delete("fake-green-uuid-0")
@@ -695,7 +695,7 @@ class DepTrackTester(unittest.TestCase):
         self.assertTrue("green" in dependency_tracker.resources)
         self.assertTrue("white" in dependency_tracker.resources)
         self.assertTrue("purple" in dependency_tracker.resources)
-        self.assertEqual(dependency_tracker.resources["green"], ["fake-green-uuid-1", "fake-green-uuid-0"])
+        self.assertEqual(dependency_tracker.resources["green"], ["fake-green-uuid-0", "fake-green-uuid-1"])
         self.assertEqual(dependency_tracker.resources["blue"], ["fake-blue-uuid"])
         self.assertEqual(dependency_tracker.resources["purple"], ["fake-purple-uuid"])
         self.assertEqual(dependency_tracker.resources["white"], ["fake-white-uuid"])
@@ -746,7 +746,7 @@ class DepTrackTester(unittest.TestCase):
         self.assertTrue("blue" in dependency_tracker.resources)
         self.assertTrue("green" in dependency_tracker.resources)
         self.assertTrue("red" in dependency_tracker.resources)
-        self.assertEqual(dependency_tracker.resources["green"], ["fake-green-uuid-1", "fake-green-uuid-0"])
+        self.assertEqual(dependency_tracker.resources["green"], ["fake-green-uuid-0", "fake-green-uuid-1"])
         self.assertEqual(dependency_tracker.resources["blue"], ["fake-blue-uuid"])
         self.assertEqual(dependency_tracker.resources["red"], ["fake-red-uuid"])
         RedSM.delete("fake-red-uuid")
@@ -1154,4 +1154,60 @@ class DepTrackTester(unittest.TestCase):
         WhiteSM.delete("fake-white-uuid")
         PurpleSM.delete("fake-purple-uuid")
     # end test_basic_dep_track_update_3
+
+    def test_dep_track_skips_missing_refs(self):
+        reaction_map = {
+            "blue": {
+                'self': ['green'],
+            },
+            "green": {
+                'self': [],
+                'blue': [],
+            },
+        }
+        BlueSM._cassandra.read = self.blue_read_with_multi_refs
+        dependency_tracker = DependencyTracker(DBBase._OBJ_TYPE_MAP, reaction_map)
+        RedSM.locate("fake-red-uuid")
+        blue = BlueSM.locate("fake-blue-uuid")
+        # fake-green-uuid-0 is not in the cache, the other ref is still
+        # walked
+        GreenSM.locate("fake-green-uuid-1",
+                       {'fq_name': ['fake-green-uuid-1'],
+                        'parent_type': 'red',
+                        'parent_uuid': 'fake-red-uuid'})
+        dependency_tracker.evaluate('blue', blue)
+        self.assertEqual(dependency_tracker.resources,
+                         {'blue': ['fake-blue-uuid'],
+                          'green': ['fake-green-uuid-1']})
+        RedSM.delete("fake-red-uuid")
+        GreenSM.delete("fake-green-uuid-1")
+        BlueSM.delete("fake-blue-uuid")
+    # end test_dep_track_skips_missing_refs
+
+    def test_dep_track_skips_unknown_types(self):
+        reaction_map = {
+            "red": {
+                'self': ['blue', 'yellow'],
+            },
+            "blue": {
+                'self': [],
+                'red': [],
+            },
+        }
+        dependency_tracker = DependencyTracker(DBBase._OBJ_TYPE_MAP, reaction_map)
+        red = RedSM.locate("fake-red-uuid")
+        BlueSM.locate("fake-blue-uuid")
+        # yellow is neither in the reaction map nor a known class
+        dependency_tracker.evaluate('red', red)
+        self.assertEqual(dependency_tracker.resources,
+                         {'red': ['fake-red-uuid'], 'blue': ['fake-blue-uuid']})
+        RedSM.delete("fake-red-uuid")
+        BlueSM.delete("fake-blue-uuid")
+    # end test_dep_track_skips_unknown_types
+
+    def test_obj_type_map_cached(self):
+        obj_type_map = RedSM.get_obj_type_map()
+        self.assertIs(DBBaseTM.get_obj_type_map(), obj_type_map)
+        self.assertEqual(obj_type_map['green'], GreenSM)
+    # end test_obj_type_map_cached
 #end DepTrackTester(unittest.TestCase):
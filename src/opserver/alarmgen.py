@@ -45,6 +45,8 @@ from sandesh.alarmgen_ctrl.ttypes import PartitionOwnershipReq, \
     AlarmgenPartition, AlarmgenPartionInfo, AlarmgenUpdate, \
     UVETableInfoReq, UVETableInfoResp, UVEObjectInfo, UVEStructInfo, \
     UVETablePerfReq, UVETablePerfResp, UVETableInfo
+from sandesh.uveserver.ttypes import UVEValueCacheReq, UVEValueCacheResp, \
+    UVEValueCacheStats
 
 from sandesh.discovery.ttypes import CollectorTrace
 from cpuinfo import CpuInfoData
@@ -115,6 +117,8 @@ class AGKeyInfo(object):
         # key of struct name, value of content dict
 
         self.current_dict = {}
+        # False until all alarms have been evaluated against the contents
+        self.alarms_evaluated = False
         self.update({})
         
     def update_single(self, typ, val):
@@ -184,6 +188,38 @@ class Controller(object):
                  'http_port': sandesh._http_server.get_port(),
                  'timestamp': timestamp}
         return base64.b64encode(json.dumps(token))
+
+    @staticmethod
+    def alarm_key(uai):
+        # Contents of an alarm that are compared to find if it has
+        # changed. timestamp and token are not part of it
+        return (uai.type, uai.severity, uai.ack,
+                tuple((ae.rule, ae.value) for ae in uai.description))
+
+    @staticmethod
+    def alarm_inputs_changed(deps, prev_uve, uve, chg_types):
+        """
+        Find if any of the UVE contents that an alarm plugin reads have
+        changed.
+        Args:
+            deps      : UVE_DEPENDENCIES of the plugin
+            prev_uve  : UVE contents before the change
+            uve       : UVE contents after the change
+            chg_types : UVE structs that were added, removed or changed
+        """
+        if deps is None:
+            return True
+        for typ, attrs in deps.iteritems():
+            if typ not in chg_types:
+                continue
+            # The plugin may check the presence of the struct itself
+            if attrs is None or typ not in prev_uve or typ not in uve:
+                return True
+            for attr in attrs:
+                if prev_uve[typ].get(attr) != uve[typ].get(attr):
+                    return True
+        return False
+
     @staticmethod
     def alarm_encode(alarms):
         res = {}
@@ -284,6 +320,8 @@ class Controller(object):
         self._workers = {}
         self._uveq = {}
         self._uveqf = {}
+        # partition -> [redis connection, acq_time synced to redis]
+        self._agp_out = {}
 
         self.disc = None
         self._libpart_name = self._hostname + ":" + self._instance_id
@@ -322,6 +360,7 @@ class Controller(object):
         UVETableAlarmReq.handle_request = self.handle_UVETableAlarmReq 
         UVETableInfoReq.handle_request = self.handle_UVETableInfoReq
         UVETablePerfReq.handle_request = self.handle_UVETablePerfReq
+        UVEValueCacheReq.handle_request = self.handle_UVEValueCacheReq
 
     def libpart_cb(self, part_list):
 
@@ -440,15 +479,10 @@ class Controller(object):
         return disc_instances, coll_delete, chg_res            
 
     @staticmethod
-    def send_agg_uve(redish, inst, part, acq_time, rows):
-        """ 
-        This function writes aggregated UVEs to redis
-
-        Each row has a UVE key, one of it's structs type names and the structs value
-        If type is "None", it means that the UVE is being removed
-        If value is none, it mean that struct of the UVE is being removed
-
-        The key and typename information is also published on a redis channel
+    def sync_agg_part(redish, inst, part, acq_time):
+        """
+        This function removes the aggregated UVEs left in redis by an
+        earlier ownership of the partition, if any
         """
         old_acq_time = redish.hget("AGPARTS:%s" % inst, part)
         if old_acq_time is None:
@@ -468,51 +502,101 @@ class Controller(object):
                 ppe3.hset("AGPARTS:%s" % inst, part, acq_time)
                 pperes3 = ppe3.execute()
 
-        pub_list = []        
+    @staticmethod
+    def send_agg_uve(redish, inst, part, acq_time, rows):
+        """ 
+        This function writes aggregated UVEs to redis
+
+        Each row has a UVE key, one of it's structs type names and the structs value
+        If type is "None", it means that the UVE is being removed
+        If value is none, it mean that struct of the UVE is being removed
+
+        The rows are coalesced, with the last row for a key and type winning,
+        and written in a single transaction. The key and typename information
+        is then published on a redis channel in a single message.
+        The caller is expected to have called sync_agg_part for the partition.
+        """
+        # key -> [UVE deleted, OrderedDict of type -> value]
+        outrows = OrderedDict()
+        for row in rows:
+            if row.typ is None:
+                outrows[row.key] = [True, OrderedDict()]
+            else:
+                if row.key not in outrows:
+                    outrows[row.key] = [False, OrderedDict()]
+                outrows[row.key][1][row.typ] = row.val
+
+        pub_list = []
+        check_keys = []
         ppe = redish.pipeline()
-        check_keys = set()
-        for row in rows: 
-            vjson = json.dumps(row.val)
-            typ = row.typ
-            key = row.key
-            pub_list.append({"key":key,"type":typ})
-            if typ is None:
+        ppe.hset("AGPARTS:%s" % inst, part, acq_time)
+        for key, (deleted, types) in outrows.iteritems():
+            vkey = "AGPARTVALUES:%s:%d:%s" % (inst, part, key)
+            if deleted:
                 # The entire contents of the UVE should be removed
+                pub_list.append({"key":key,"type":None})
                 ppe.srem("AGPARTKEYS:%s:%d" % (inst, part), key)
-                ppe.delete("AGPARTVALUES:%s:%d:%s" % (inst, part, key))
-            else:
-                if row.val is None:
+                ppe.delete(vkey)
+            if not types:
+                continue
+            vals = {}
+            for typ, val in types.iteritems():
+                pub_list.append({"key":key,"type":typ})
+                if val is None:
                     # Remove the given struct from the UVE
-                    ppe.hdel("AGPARTVALUES:%s:%d:%s" % (inst, part, key), typ)
-                    check_keys.add(key)
+                    ppe.hdel(vkey, typ)
                 else:
-                    ppe.sadd("AGPARTKEYS:%s:%d" % (inst, part), key)
-                    ppe.hset("AGPARTVALUES:%s:%d:%s" % (inst, part, key),
-                        typ, vjson)
-        ppe.execute()
-        
-        # Find the keys that have no content (all structs have been deleted) 
-        ppe4 = redish.pipeline()
-        check_keys_list = list(check_keys)
-        for kk in check_keys_list:
-           ppe4.exists("AGPARTVALUES:%s:%d:%s" % (inst, part, kk))
-        pperes4 = ppe4.execute()
+                    vals[typ] = json.dumps(val)
+            if vals:
+                ppe.sadd("AGPARTKEYS:%s:%d" % (inst, part), key)
+                ppe.hmset(vkey, vals)
+            if len(vals) != len(types):
+                check_keys.append(key)
+        # Find the keys that have no content (all structs have been deleted)
+        for key in check_keys:
+            ppe.exists("AGPARTVALUES:%s:%d:%s" % (inst, part, key))
+        ppe.publish('AGPARTPUB:%s:%d' % (inst, part), json.dumps(pub_list))
+        pperes = ppe.execute()
 
         # From the index, removes keys for which there are now no contents
-        ppe5 = redish.pipeline()
-        idx = 0
-        for res in pperes4:
-            if not res:
-                ppe5.srem("AGPARTKEYS:%s:%d" % (inst, part), check_keys_list[idx])
-                # TODO: alarmgen should have already figured out if all structs of 
+        if check_keys:
+            empty_keys = [key for key, res in \
+                zip(check_keys, pperes[-len(check_keys)-1:-1]) if not res]
+            if empty_keys:
+                # TODO: alarmgen should have already figured out if all structs of
                 #       the UVE are gone, and should have sent a UVE delete
                 #       We should not need to figure this out again
-                assert()
-            idx += 1
-        ppe5.execute()
+                redish.srem("AGPARTKEYS:%s:%d" % (inst, part), *empty_keys)
+
+    def send_agg_part(self, part, outp):
+        """
+        This function writes the output of a UVE processing cycle of a
+        partition to redis, over the redis connection of the partition
+        """
+        acq_time = self._workers[part].acq_time()
+        if part not in self._agp_out:
+            self._agp_out[part] = [redis.StrictRedis(
+                    host="127.0.0.1",
+                    port=self._conf.redis_server_port(),
+                    password=self._conf.redis_password(),
+                    db=2), None]
+        redish, synced = self._agp_out[part]
+        if synced != acq_time:
+            Controller.sync_agg_part(redish, self._instance_id, part,
+                acq_time)
+            self._agp_out[part][1] = acq_time
+        rows = []
+        for ku,vu in outp.iteritems():
+            if vu is None:
+                # This message has no type!
+                # Its used to indicate a delete of the entire UVE
+                rows.append(OutputRow(key=ku, typ=None, val=None))
+                continue
+            for kt,vt in vu.iteritems():
+                rows.append(OutputRow(key=ku, typ=kt, val=vt))
+        Controller.send_agg_uve(redish, self._instance_id, part,
+            acq_time, rows)
 
-        redish.publish('AGPARTPUB:%s:%d' % (inst, part), json.dumps(pub_list))
-        
     def run_uve_processing(self):
         """
         This function runs in its own gevent, and provides state compression
@@ -523,11 +607,6 @@ class Controller(object):
         set should not grow in an unbounded manner (like a queue can)
         """
 
-        if self.disc:
-            max_out_rows = 20
-        else:
-            max_out_rows = 2
-        lredis = None
         while True:
             for part in self._uveqf.keys():
                 self._logger.error("Stop UVE processing for %d" % part)
@@ -560,52 +639,15 @@ class Controller(object):
                         self.handle_uve_notifq(part, pendingset[part])
                     else:
                         try:
-                            if lredis is None:
-                                lredis = redis.StrictRedis(
-                                        host="127.0.0.1",
-                                        port=self._conf.redis_server_port(),
-                                        password=self._conf.redis_password(),
-                                        db=2)
-                  
                             if len(outp):
-                                rows = []
-                                for ku,vu in outp.iteritems():
-                                    if vu is None:
-                                        # This message has no type!
-                                        # Its used to indicate a delete of the entire UVE
-                                        rows.append(OutputRow(key=ku, typ=None, val=None))
-                                        if len(rows) >= max_out_rows:
-                                            Controller.send_agg_uve(lredis,
-                                                self._instance_id,
-                                                part,
-                                                self._workers[part].acq_time(),
-                                                rows)
-                                            rows[:] = []
-                                        continue
-                                    for kt,vt in vu.iteritems():
-                                        rows.append(OutputRow(key=ku, typ=kt, val=vt))
-                                        if len(rows) >= max_out_rows:
-                                            Controller.send_agg_uve(lredis,
-                                                self._instance_id,
-                                                part,
-                                                self._workers[part].acq_time(),
-                                                rows)
-                                            rows[:] = []
-                                # Flush all remaining rows
-                                if len(rows):
-                                    Controller.send_agg_uve(lredis,
-                                        self._instance_id,
-                                        part,
-                                        self._workers[part].acq_time(),
-                                        rows)
-                                    rows[:] = []
-
+                                self.send_agg_part(part, outp)
                         except Exception as ex:
                             template = "Exception {0} in uve proc. Arguments:\n{1!r}"
                             messag = template.format(type(ex).__name__, ex.args)
                             self._logger.error("%s : traceback %s" % \
                                               (messag, traceback.format_exc()))
-                            lredis = None
+                            if part in self._agp_out:
+                                del self._agp_out[part]
                             # We need to requeue
                             self.handle_uve_notifq(part, pendingset[part])
                             gevent.sleep(1)
@@ -618,22 +660,21 @@ class Controller(object):
                 gevent.sleep(0)
              
     def stop_uve_partition(self, part):
-        for tk in self.ptab_info[part].keys():
-            for rkey in self.ptab_info[part][tk].keys():
-                uk = tk + ":" + rkey
-                if tk in self.tab_alarms:
-                    if uk in self.tab_alarms[tk]:
-                        del self.tab_alarms[tk][uk]
-                        ustruct = UVEAlarms(name = rkey, deleted = True)
-                        alarm_msg = AlarmTrace(data=ustruct, \
-                                table=tk, sandesh=self._sandesh)
-                        self._logger.error('send del alarm for stop: %s' % \
-                                (alarm_msg.log()))
-                        alarm_msg.send(sandesh=self._sandesh)
-                del self.ptab_info[part][tk][rkey]
-                self._logger.error("UVE %s deleted in stop" % (uk))
-            del self.ptab_info[part][tk]
+        for tk, rkey in self.ptab_info[part].keys():
+            uk = tk + ":" + rkey
+            if tk in self.tab_alarms:
+                if uk in self.tab_alarms[tk]:
+                    del self.tab_alarms[tk][uk]
+                    ustruct = UVEAlarms(name = rkey, deleted = True)
+                    alarm_msg = AlarmTrace(data=ustruct, \
+                            table=tk, sandesh=self._sandesh)
+                    self._logger.error('send del alarm for stop: %s' % \
+                            (alarm_msg.log()))
+                    alarm_msg.send(sandesh=self._sandesh)
+            self._logger.error("UVE %s deleted in stop" % (uk))
         del self.ptab_info[part]
+        if part in self._agp_out:
+            del self._agp_out[part]
 
     def handle_uve_notif(self, part, uves):
         """
@@ -652,94 +693,100 @@ class Controller(object):
         self._logger.debug("Changed part %d UVEs : %s" % (part, str(uves)))
         success = True
         output = {}
-        for uv,types in uves.iteritems():
-            tab = uv.split(':',1)[0]
-            if tab not in self.tab_perf:
-                self.tab_perf[tab] = AGTabStats()
 
-            uve_name = uv.split(':',1)[1]
-            prevt = UTCTimestampUsec() 
+        # Read all the changed UVEs together
+        prevt = UTCTimestampUsec()
+        key_filters = {}
+        for uv,types in uves.iteritems():
             filters = {}
             if types:
                 filters["cfilt"] = {}
                 for typ in types.keys():
                     filters["cfilt"][typ] = set()
+            key_filters[uv] = filters
+        failures, uve_datas = self._us.get_uves(key_filters)
+        if failures:
+            success = False
+        get_time = (UTCTimestampUsec() - prevt) / max(len(uves), 1)
 
-            failures, uve_data = self._us.get_uve(uv, True, filters)
+        for uv,types in uves.iteritems():
+            tab = uv.split(':',1)[0]
+            if tab not in self.tab_perf:
+                self.tab_perf[tab] = AGTabStats()
 
-            if failures:
-                success = False
-            self.tab_perf[tab].record_get(UTCTimestampUsec() - prevt)
+            uve_name = uv.split(':',1)[1]
+            uve_data = uve_datas.get(uv, {})
+            self.tab_perf[tab].record_get(get_time)
             # Handling Agg UVEs
             if not part in self.ptab_info:
                 self._logger.error("Creating UVE table for part %s" % str(part))
                 self.ptab_info[part] = {}
 
-            if not tab in self.ptab_info[part]:
-                self.ptab_info[part][tab] = {}
-
-            if uve_name not in self.ptab_info[part][tab]:
-                self.ptab_info[part][tab][uve_name] = AGKeyInfo(part)
+            ptkey = (tab, uve_name)
+            if ptkey not in self.ptab_info[part]:
+                self.ptab_info[part][ptkey] = AGKeyInfo(part)
+            prev_uve = dict(self.ptab_info[part][ptkey].values())
             prevt = UTCTimestampUsec()
             output[uv] = {}
             touched = False
             if not types:
-                self.ptab_info[part][tab][uve_name].update(uve_data)
-                if len(self.ptab_info[part][tab][uve_name].removed()):
+                self.ptab_info[part][ptkey].update(uve_data)
+                if len(self.ptab_info[part][ptkey].removed()):
                     touched = True
                     self._logger.info("UVE %s removed structs %s" % (uve_name, \
-                            self.ptab_info[part][tab][uve_name].removed()))
-                    for rems in self.ptab_info[part][tab][uve_name].removed():
+                            self.ptab_info[part][ptkey].removed()))
+                    for rems in self.ptab_info[part][ptkey].removed():
                         output[uv][rems] = None
-                if len(self.ptab_info[part][tab][uve_name].changed()):
+                if len(self.ptab_info[part][ptkey].changed()):
                     touched = True
                     self._logger.debug("UVE %s changed structs %s" % (uve_name, \
-                            self.ptab_info[part][tab][uve_name].changed()))
-                    for chgs in self.ptab_info[part][tab][uve_name].changed():
+                            self.ptab_info[part][ptkey].changed()))
+                    for chgs in self.ptab_info[part][ptkey].changed():
                         output[uv][chgs] = \
-                                self.ptab_info[part][tab][uve_name].values()[chgs]
-                if len(self.ptab_info[part][tab][uve_name].added()):
+                                self.ptab_info[part][ptkey].values()[chgs]
+                if len(self.ptab_info[part][ptkey].added()):
                     touched = True
                     self._logger.debug("UVE %s added structs %s" % (uve_name, \
-                            self.ptab_info[part][tab][uve_name].added()))
-                    for adds in self.ptab_info[part][tab][uve_name].added():
+                            self.ptab_info[part][ptkey].added()))
+                    for adds in self.ptab_info[part][ptkey].added():
                         output[uv][adds] = \
-                                self.ptab_info[part][tab][uve_name].values()[adds]
+                                self.ptab_info[part][ptkey].values()[adds]
             else:
                 for typ in types:
                     val = None
                     if typ in uve_data:
                         val = uve_data[typ]
-                    self.ptab_info[part][tab][uve_name].update_single(typ, val)
-                    if len(self.ptab_info[part][tab][uve_name].removed()):
+                    self.ptab_info[part][ptkey].update_single(typ, val)
+                    if len(self.ptab_info[part][ptkey].removed()):
                         touched = True
                         self._logger.info("UVE %s removed structs %s" % (uve_name, \
-                                self.ptab_info[part][tab][uve_name].removed()))
-                        for rems in self.ptab_info[part][tab][uve_name].removed():
+                                self.ptab_info[part][ptkey].removed()))
+                        for rems in self.ptab_info[part][ptkey].removed():
                             output[uv][rems] = None
-                    if len(self.ptab_info[part][tab][uve_name].changed()):
+                    if len(self.ptab_info[part][ptkey].changed()):
                         touched = True
                         self._logger.debug("UVE %s changed structs %s" % (uve_name, \
-                                self.ptab_info[part][tab][uve_name].changed()))
-                        for chgs in self.ptab_info[part][tab][uve_name].changed():
+                                self.ptab_info[part][ptkey].changed()))
+                        for chgs in self.ptab_info[part][ptkey].changed():
                             output[uv][chgs] = \
-                                    self.ptab_info[part][tab][uve_name].values()[chgs]
-                    if len(self.ptab_info[part][tab][uve_name].added()):
+                                    self.ptab_info[part][ptkey].values()[chgs]
+                    if len(self.ptab_info[part][ptkey].added()):
                         touched = True
                         self._logger.debug("UVE %s added structs %s" % (uve_name, \
-                                self.ptab_info[part][tab][uve_name].added()))
-                        for adds in self.ptab_info[part][tab][uve_name].added():
+                                self.ptab_info[part][ptkey].added()))
+                        for adds in self.ptab_info[part][ptkey].added():
                             output[uv][adds] = \
-                                    self.ptab_info[part][tab][uve_name].values()[adds]
+                                    self.ptab_info[part][ptkey].values()[adds]
+            chg_types = set(output[uv].keys())
             if not touched:
                 del output[uv]
-            local_uve = self.ptab_info[part][tab][uve_name].values()
+            local_uve = self.ptab_info[part][ptkey].values()
             
             self.tab_perf[tab].record_pub(UTCTimestampUsec() - prevt)
 
             if len(local_uve.keys()) == 0:
                 self._logger.info("UVE %s deleted in proc" % (uv))
-                del self.ptab_info[part][tab][uve_name]
+                del self.ptab_info[part][ptkey]
                 output[uv] = None
                 
                 # Both alarm and non-alarm contents are gone.
@@ -748,6 +795,7 @@ class Controller(object):
             
             # Withdraw the alarm if the UVE has no non-alarm structs
             if len(local_uve.keys()) == 1 and "UVEAlarms" in local_uve:
+                self.ptab_info[part][ptkey].alarms_evaluated = False
                 if tab in self.tab_alarms:
                     if uv in self.tab_alarms[tab]:
                         del self.tab_alarms[tab][uv]
@@ -768,11 +816,27 @@ class Controller(object):
             # if "UVEAlarms" in uve_data:
             #     del uve_data["UVEAlarms"]
 
-            results = self.mgrs[tab].map_method("__call__", uv, local_uve)
+            # Only the plugins whose inputs have changed are called, unless
+            # the alarms of this UVE have not been evaluated yet
+            evaluated = self.ptab_info[part][ptkey].alarms_evaluated
+            results = []
+            for extn in self.mgrs[tab][tab]:
+                if evaluated and not Controller.alarm_inputs_changed(
+                        getattr(extn.obj, 'UVE_DEPENDENCIES', None),
+                        prev_uve, local_uve, chg_types):
+                    continue
+                try:
+                    results.append(extn.obj(uv, local_uve))
+                except Exception:
+                    self._logger.error("Alarm[%s] %s failed for %s : %s" % \
+                        (tab, extn.name, uv, traceback.format_exc()))
+            self.ptab_info[part][ptkey].alarms_evaluated = True
             self.tab_perf[tab].record_call(UTCTimestampUsec() - prevt)
             new_uve_alarms = {}
+            called = set()
             for res in results:
                 nm, sev, errs = res
+                called.add(nm)
                 self._logger.debug("Alarm[%s] %s: %s" % (tab, nm, str(errs)))
                 elems = []
                 for ae in errs:
@@ -786,15 +850,16 @@ class Controller(object):
             del_types = []
             if self.tab_alarms[tab].has_key(uv):
                 for nm, uai in self.tab_alarms[tab][uv].iteritems():
-                    uai2 = copy.deepcopy(uai)
-                    uai2.timestamp = 0
-                    uai2.token = ""
+                    # This plugin was not called, the alarm stays as it is
+                    if nm not in called:
+                        continue
                     # This type was present earlier, but is now gone
                     if not new_uve_alarms.has_key(nm):
                         del_types.append(nm)
                     else:
                         # This type has no new information
-                        if uai2 == new_uve_alarms[nm]:
+                        if Controller.alarm_key(uai) == \
+                                Controller.alarm_key(new_uve_alarms[nm]):
                             del new_uve_alarms[nm]
             if len(del_types) != 0  or \
                     len(new_uve_alarms) != 0:
@@ -803,8 +868,9 @@ class Controller(object):
                 self._logger.debug("Alarm[%s] Updated %s" % \
                         (tab, str(new_uve_alarms))) 
                 # These alarm types are new or updated
-                for nm, uai2 in new_uve_alarms.iteritems():
-                    uai = copy.deepcopy(uai2)
+                # The UVEAlarmInfo objects kept in tab_alarms are never
+                # modified, they are replaced when the alarm changes
+                for nm, uai in new_uve_alarms.iteritems():
                     uai.timestamp = UTCTimestampUsec()
                     uai.token = Controller.token(self._sandesh, uai.timestamp)
                     if not self.tab_alarms[tab].has_key(uv):
@@ -820,9 +886,8 @@ class Controller(object):
                             deleted = True)
                     del self.tab_alarms[tab][uv]
                 else:
-                    alm_copy = copy.deepcopy(self.tab_alarms[tab][uv])
                     ustruct = UVEAlarms(name = uve_name,
-                            alarms = alm_copy.values(),
+                            alarms = self.tab_alarms[tab][uv].values(),
                             deleted = False)
                 alarm_msg = AlarmTrace(data=ustruct, table=tab, \
                         sandesh=self._sandesh)
@@ -844,16 +909,16 @@ class Controller(object):
         for part in parts:
             if part not in self.ptab_info:
                 continue
+            tab_uves = {}
+            for (tab, uk), uv in self.ptab_info[part].iteritems():
+                types = []
+                for tk,tv in uv.values().iteritems():
+                    types.append(UVEStructInfo(type = tk,
+                            content = json.dumps(tv)))
+                tab_uves.setdefault(tab, []).append(UVEObjectInfo(
+                        name = uk, structs = types))
             tables = []
-            for tab in self.ptab_info[part].keys():
-                uvel = []
-                for uk,uv in self.ptab_info[part][tab].iteritems():
-                    types = []
-                    for tk,tv in uv.values().iteritems():
-                        types.append(UVEStructInfo(type = tk,
-                                content = json.dumps(tv)))
-                    uvel.append(UVEObjectInfo(
-                            name = uk, structs = types))
+            for tab, uvel in tab_uves.iteritems():
                 tables.append(UVETableInfo(table = tab, uves = uvel))
             resp = UVETableInfoResp(partition = part)
             resp.tables = tables
@@ -910,6 +975,12 @@ class Controller(object):
                 mr = True
             resp.response(req.context(), mr)
             np = np + 1
+
+    def handle_UVEValueCacheReq(self, req):
+        stats = UVEValueCacheStats()
+        self._us.fill_value_cache_stats(stats)
+        resp = UVEValueCacheResp(stats=stats)
+        resp.response(req.context())
     
     def partition_change(self, partno, enl):
         """
@@ -941,7 +1012,7 @@ class Controller(object):
                         self.handle_resource_check,
                         self._instance_id,
                         self._conf.redis_server_port(),
-                        cdisc)
+                        cdisc, self._conf.kafka_consumer())
                 ph.start()
                 self._workers[partno] = ph
                 tout = 600
@@ -1008,10 +1079,11 @@ class Controller(object):
             the previous time period over all partitions
             and send it out
         '''
-        self.tab_perf_prev = copy.deepcopy(self.tab_perf)
-        for kt in self.tab_perf.keys():
-            #self.tab_perf_prev[kt] = copy.deepcopy(self.tab_perf[kt])
-            self.tab_perf[kt].reset()
+        # Start new counters for the next period
+        self.tab_perf_prev = self.tab_perf
+        self.tab_perf = {}
+        for kt in self.tab_perf_prev.keys():
+            self.tab_perf[kt] = AGTabStats()
 
         s_partitions = set()
         s_keys = set()
@@ -1019,15 +1091,15 @@ class Controller(object):
         for pk,pc in self._workers.iteritems():
             s_partitions.add(pk)
             din, dout = pc.stats()
-            for ktab,tab in dout.iteritems():
-                au_keys = []
-                for uk,uc in tab.iteritems():
-                    s_keys.add(uk)
-                    n_updates += uc
-                    ukc = UVEKeyInfo()
-                    ukc.key = uk
-                    ukc.count = uc
-                    au_keys.append(ukc)
+            tab_keys = {}
+            for (ktab, uk), uc in dout.iteritems():
+                s_keys.add(uk)
+                n_updates += uc
+                ukc = UVEKeyInfo()
+                ukc.key = uk
+                ukc.count = uc
+                tab_keys.setdefault(ktab, []).append(ukc)
+            for ktab, au_keys in tab_keys.iteritems():
                 au_obj = AlarmgenUpdate(name=self._sandesh._source + ':' + \
                         self._sandesh._node_type + ':' + \
                         self._sandesh._module + ':' + \
@@ -1040,17 +1112,15 @@ class Controller(object):
                 self._logger.debug('send key stats: %s' % (au_obj.log()))
                 au_obj.send(sandesh=self._sandesh)
 
-            for ktab,tab in din.iteritems():
-                au_notifs = []
-                for kcoll,coll in tab.iteritems():
-                    for kgen,gen in coll.iteritems():
-                        for tk,tc in gen.iteritems():
-                            tkc = UVETypeInfo()
-                            tkc.type= tk
-                            tkc.count = tc
-                            tkc.generator = kgen
-                            tkc.collector = kcoll
-                            au_notifs.append(tkc)
+            tab_notifs = {}
+            for (ktab, kcoll, kgen, tk), tc in din.iteritems():
+                tkc = UVETypeInfo()
+                tkc.type= tk
+                tkc.count = tc
+                tkc.generator = kgen
+                tkc.collector = kcoll
+                tab_notifs.setdefault(ktab, []).append(tkc)
+            for ktab, au_notifs in tab_notifs.iteritems():
                 au_obj = AlarmgenUpdate(name=self._sandesh._source + ':' + \
                         self._sandesh._node_type + ':' + \
                         self._sandesh._module + ':' + \
@@ -1101,6 +1171,8 @@ class Controller(object):
             if self._workers.has_key(pt):
                 resp.enabled = True
                 resp.offset = self._workers[pt]._partoffset
+                resp.ingest_rate, resp.ingest_lag = \
+                    self._workers[pt].ingest_stats()
                 resp.uves = []
                 for kcoll,coll in self._workers[pt].contents().iteritems():
                     uci = UVECollInfo()
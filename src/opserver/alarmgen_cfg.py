@@ -30,6 +30,12 @@ contrail-alarm-gen  --log_level SYS_DEBUG
                     --redis_uve_list 127.0.0.1:6379
                     --alarmgen_list 127.0.0.1:0
                     --kafka_broker_list 127.0.0.1:9092
+                    --kafka_fetch_size 16384
+                    --kafka_max_fetch_size 131072
+                    --kafka_batch_size 10
+                    --kafka_batch_timeout 0.5
+                    --kafka_commit_count 10
+                    --kafka_commit_interval 1.0
                     --zk_list 127.0.0.1:2181
                     --conf_file /etc/contrail/contrail-alarm-gen.conf
 
@@ -78,6 +84,15 @@ log_file = /var/log/contrail/contrail-alarm-gen.log
             'disc_server_port'   : 5998,
         }
 
+        kafka_opts = {
+            'kafka_fetch_size'      : 16384,
+            'kafka_max_fetch_size'  : 131072,
+            'kafka_batch_size'      : 10,
+            'kafka_batch_timeout'   : 0.5,
+            'kafka_commit_count'    : 10,
+            'kafka_commit_interval' : 1.0,
+        }
+
         config = None
         if args.conf_file:
             config = ConfigParser.SafeConfigParser()
@@ -88,6 +103,8 @@ log_file = /var/log/contrail/contrail-alarm-gen.log
                 redis_opts.update(dict(config.items('REDIS')))
             if 'DISCOVERY' in config.sections():
                 disc_opts.update(dict(config.items('DISCOVERY')))
+            if 'KAFKA' in config.sections():
+                kafka_opts.update(dict(config.items('KAFKA')))
         # Override with CLI options
         # Don't surpress add_help here so it will handle -h
         parser = argparse.ArgumentParser(
@@ -101,6 +118,7 @@ log_file = /var/log/contrail/contrail-alarm-gen.log
 
         defaults.update(redis_opts)
         defaults.update(disc_opts)
+        defaults.update(kafka_opts)
         parser.set_defaults(**defaults)
         parser.add_argument("--host_ip",
             help="Host IP address")
@@ -142,6 +160,18 @@ log_file = /var/log/contrail/contrail-alarm-gen.log
         parser.add_argument("--kafka_broker_list",
             help="List of bootstrap kafka brokers in ip:port format",
             nargs="+")
+        parser.add_argument("--kafka_fetch_size", type=int,
+            help="Initial size in bytes of the kafka fetch buffer")
+        parser.add_argument("--kafka_max_fetch_size", type=int,
+            help="Max size in bytes of the kafka fetch buffer")
+        parser.add_argument("--kafka_batch_size", type=int,
+            help="Max number of UVE notifications read from kafka together")
+        parser.add_argument("--kafka_batch_timeout", type=float,
+            help="Seconds to wait for a batch of UVE notifications")
+        parser.add_argument("--kafka_commit_count", type=int,
+            help="Commit kafka offsets after these many notifications")
+        parser.add_argument("--kafka_commit_interval", type=float,
+            help="Commit kafka offsets at least this often, in seconds")
         parser.add_argument("--zk_list",
             help="List of zookeepers in ip:port format",
             nargs="+")
@@ -187,6 +217,14 @@ log_file = /var/log/contrail/contrail-alarm-gen.log
     def kafka_broker_list(self):
         return self._args.kafka_broker_list
 
+    def kafka_consumer(self):
+        return {'fetch_size':self._args.kafka_fetch_size,
+            'max_fetch_size':self._args.kafka_max_fetch_size,
+            'batch_size':self._args.kafka_batch_size,
+            'batch_timeout':self._args.kafka_batch_timeout,
+            'commit_count':self._args.kafka_commit_count,
+            'commit_interval':self._args.kafka_commit_interval }
+
     def zk_list(self):
         return self._args.zk_list;
 
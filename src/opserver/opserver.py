@@ -68,6 +68,15 @@ from generator_introspect_util import GeneratorIntrospectUtil
 from stevedore import hook
 from partition_handler import PartInfo, UveStreamer, UveCacheProcessor
 
+# Longest wait for a query completion notification before the status
+# of the query is checked again
+_QUERY_STATUS_WAIT = 1
+
+# Query result rows are read from redis in windows of this many rows,
+# and written out in pieces of about this many bytes
+_QUERY_RESULT_WINDOW = 1000
+_QUERY_RESULT_CHUNK_SIZE = 64 * 1024
+
 _ERRORS = {
     errno.EBADMSG: 400,
     errno.ENOBUFS: 403,
@@ -102,9 +111,24 @@ def obj_to_dict(obj):
 # end obj_to_dict
 
 
+_redis_query_pools = {}
+
+
+def redis_query_conn(host, port, redis_password):
+    # The query helpers share a connection pool per query redis, rather
+    # than connecting on every status check and result chunk
+    key = (host, port, redis_password)
+    pool = _redis_query_pools.get(key)
+    if pool is None:
+        pool = redis.ConnectionPool(db=0, host=host, port=port,
+                                    password=redis_password)
+        _redis_query_pools[key] = pool
+    return redis.StrictRedis(connection_pool=pool)
+# end redis_query_conn
+
+
 def redis_query_start(host, port, redis_password, qid, inp):
-    redish = redis.StrictRedis(db=0, host=host, port=port,
-                                   password=redis_password)
+    redish = redis_query_conn(host, port, redis_password)
     for key, value in inp.items():
         redish.hset("QUERY:" + qid, key, json.dumps(value))
     query_metadata = {}
@@ -126,8 +150,7 @@ def redis_query_start(host, port, redis_password, qid, inp):
 
 
 def redis_query_status(host, port, redis_password, qid):
-    redish = redis.StrictRedis(db=0, host=host, port=port,
-                               password=redis_password)
+    redish = redis_query_conn(host, port, redis_password)
     resp = {"progress": 0}
     chunks = []
     # For now, the number of chunks will be always 1
@@ -151,60 +174,57 @@ def redis_query_status(host, port, redis_password, qid):
 
 
 def redis_query_chunk_iter(host, port, redis_password, qid, chunk_id):
-    redish = redis.StrictRedis(db=0, host=host, port=port,
-                               password=redis_password)
+    # Yields the result rows of the query in windows of at most
+    # _QUERY_RESULT_WINDOW rows. Each RESULT list is deleted in the
+    # same round trip that starts reading the next one.
+    redish = redis_query_conn(host, port, redis_password)
 
     iters = 0
-    fin = False
-
-    while not fin:
-        #import pdb; pdb.set_trace()
+    done_key = None
+    while True:
+        key = "RESULT:" + qid + ":" + str(iters)
+        pipe = redish.pipeline(transaction=False)
+        if done_key is not None:
+            pipe.delete(done_key)
         # Keep the result line valid while it is being read
-        redish.persist("RESULT:" + qid + ":" + str(iters))
-        elems = redish.lrange("RESULT:" + qid + ":" + str(iters), 0, -1)
-        yield elems
-        if elems == []:
-            fin = True
-        else:
-            redish.delete("RESULT:" + qid + ":" + str(iters), 0, -1)
+        pipe.persist(key)
+        pipe.lrange(key, 0, _QUERY_RESULT_WINDOW - 1)
+        elems = pipe.execute()[-1]
+        if not elems:
+            return
+        start = 0
+        while True:
+            yield elems
+            if len(elems) < _QUERY_RESULT_WINDOW:
+                break
+            start += _QUERY_RESULT_WINDOW
+            elems = redish.lrange(key, start, start + _QUERY_RESULT_WINDOW - 1)
+            if not elems:
+                break
+        done_key = key
         iters += 1
-
-    return
 # end redis_query_chunk_iter
 
 
 def redis_query_chunk(host, port, redis_password, qid, chunk_id):
+    # Writes out the rows as {"value": [...]}, one line per window of
+    # rows, in pieces of about _QUERY_RESULT_CHUNK_SIZE bytes
     res_iter = redis_query_chunk_iter(host, port, redis_password, qid, chunk_id)
 
-    dli = u''
-    starter = True
-    fin = False
-    yield u'{"value": ['
-    outcount = 0
-    while not fin:
-
-        #import pdb; pdb.set_trace()
-        # Keep the result line valid while it is being read
-        elems = res_iter.next()
-
-        fin = True
-        for elem in elems:
-            fin = False
-            outcount += 1
-            if starter:
-                dli += '\n' + elem
-                starter = False
-            else:
-                dli += ', ' + elem
-        if not fin:
-            yield dli + '\n'
-            dli = u''
-
-    if outcount == 0:
-        yield '\n' + u']}'
-    else:
-        yield u']}'
-    return
+    out = ['{"value": [\n']
+    outsize = len(out[0])
+    sep = ''
+    for elems in res_iter:
+        line = sep + ', '.join(elems) + '\n'
+        sep = ', '
+        out.append(line)
+        outsize += len(line)
+        if outsize >= _QUERY_RESULT_CHUNK_SIZE:
+            yield ''.join(out)
+            out = []
+            outsize = 0
+    out.append(']}')
+    yield ''.join(out)
 # end redis_query_chunk
 
 
@@ -257,16 +277,8 @@ def redis_query_result_dict(host, port, redis_password, qid):
 
     if (prg < 0) or (prg == 100):
 
-        done = False
         gen = redis_query_result(host, port, redis_password, qid)
-        result = u''
-        while not done:
-            try:
-                result += gen.next()
-                #import pdb; pdb.set_trace()
-            except StopIteration:
-                done = True
-        res = (json.loads(result))['value']
+        res = list(OpServerUtils.iter_query_result(gen))
 
     return prg, res
 # end redis_query_result_dict
@@ -1109,28 +1121,39 @@ class OpServer(object):
         # In Sync mode, Keep polling query status until final result is
         # available
         try:
-            self._logger.info("Polling %s for query result" % ("REPLY:" + qid))
+            self._logger.info("Waiting on %s for query result" % ("REPLY:" + qid))
+            # The query engine publishes on the reply key once the final
+            # status is in place. Subscribe before reading the status, so
+            # that the notification cannot be missed; the status is still
+            # re-read every _QUERY_STATUS_WAIT secs to report progress.
+            redish = redis_query_conn(host='127.0.0.1',
+                                      port=int(self._args.redis_query_port),
+                                      redis_password=self._args.redis_password)
+            pubsub = redish.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe("REPLY:" + qid)
             prg = 0
             done = False
-            while not done:
-                gevent.sleep(1)
-                resp = redis_query_status(host='127.0.0.1',
-                                          port=int(
-                                              self._args.redis_query_port),
-                                          redis_password=self._args.redis_password,
-                                          qid=qid)
-
-                # We want to print progress only if it has changed
-                if int(resp["progress"]) == prg:
-                    continue
-
-                self._logger.info(
-                    "Query Progress is %s time %d" % (str(resp), time.time()))
-                prg = int(resp["progress"])
-
-                # Either there was an error, or the query is complete
-                if (prg < 0) or (prg == 100):
-                    done = True
+            try:
+                while not done:
+                    resp = redis_query_status(host='127.0.0.1',
+                                              port=int(
+                                                  self._args.redis_query_port),
+                                              redis_password=self._args.redis_password,
+                                              qid=qid)
+
+                    # We want to print progress only if it has changed
+                    if int(resp["progress"]) != prg:
+                        self._logger.info("Query Progress is %s time %d" % \
+                                          (str(resp), time.time()))
+                        prg = int(resp["progress"])
+
+                    # Either there was an error, or the query is complete
+                    if (prg < 0) or (prg == 100):
+                        done = True
+                    else:
+                        pubsub.get_message(timeout=_QUERY_STATUS_WAIT)
+            finally:
+                pubsub.close()
 
             if prg < 0:
                 cod = -prg
@@ -1221,9 +1244,9 @@ class OpServer(object):
             abort(code, msg)
         queries = {}
         try:
-            redish = redis.StrictRedis(db=0, host='127.0.0.1',
-                                       port=int(self._args.redis_query_port),
-                                       password=self._args.redis_password)
+            redish = redis_query_conn(host='127.0.0.1',
+                                      port=int(self._args.redis_query_port),
+                                      redis_password=self._args.redis_password)
             pending_queries = redish.lrange('QUERYQ', 0, -1)
             pending_queries_info = []
             for query_id in pending_queries:
@@ -77,6 +77,7 @@ class OpServerUtils(object):
     POST_HEADERS = {'Content-type': 'application/json; charset="UTF-8"',
                     'Expect': '202-accepted'}
     POST_HEADERS_SYNC = {'Content-type': 'application/json; charset="UTF-8"'}
+    RESULT_READ_SIZE = 64 * 1024
     TunnelType = enum(INVALID=0, MPLS_GRE=1, MPLS_UDP=2, VXLAN=3)
 
     @staticmethod
@@ -188,11 +189,17 @@ class OpServerUtils(object):
     # end parse_start_end_time
 
     @staticmethod
-    def post_url_http(url, params, sync=False):
-        if sync:
+    def post_url_http(url, params, sync=False, stream=False):
+        # With stream set, the response itself is returned, so that the
+        # result can be read with parse_query_result as it arrives
+        if sync and not stream:
             hdrs = OpServerUtils.POST_HEADERS_SYNC
             stm = False
             pre = True
+        elif sync:
+            hdrs = OpServerUtils.POST_HEADERS_SYNC
+            stm = True
+            pre = False
         else:
             hdrs = OpServerUtils.POST_HEADERS
             stm = True
@@ -211,6 +218,8 @@ class OpServerUtils(object):
             print "Connection to %s failed %s" % (url, str(e))
             return None
         if (response.status_code == 202) or (response.status_code) == 200:
+            if stream:
+                return response
             return response.text
         else:
             print "HTTP error code: %d" % response.status_code
@@ -232,28 +241,64 @@ class OpServerUtils(object):
     # end get_url_http
 
     @staticmethod
-    def parse_query_result(result):
-        done = False
-        resit = result.iter_lines()
-        while not done:
-            try:
-                ln = resit.next()
-                if ln == '{"value": [':
-                    continue
-                if ln == ']}':
-                    done = True
+    def iter_query_result(chunks):
+        """
+        Decodes the rows of a query result ({"value": [row, ...]}) from
+        an iterable of text chunks, yielding each row as soon as it has
+        been read, without holding the whole result in memory.
+        """
+        decoder = json.JSONDecoder()
+        ws = ' \t\r\n,'
+        buf = ''
+        idx = None
+        eof = False
+        chunks = iter(chunks)
+        while True:
+            if idx is None:
+                # Look for the start of the row list
+                start = buf.find('[')
+                if start >= 0:
+                    idx = start + 1
                     continue
-                if ln[0] == ',':
-                    out_line = '[ {} ' + ln + ' ]'
-                else:
-                    out_line = '[ {} , ' + ln + ' ]'
-
-                out_list = json.loads(out_line)
-                out_list.pop(0)
-                for i in out_list:
-                    yield i
-            except Exception as e:
-                print "Error parsing %s results: %s" % (ln, str(e))
+            else:
+                while idx < len(buf) and buf[idx] in ws:
+                    idx += 1
+                if idx < len(buf):
+                    if buf[idx] == ']':
+                        return
+                    try:
+                        row, end = decoder.raw_decode(buf, idx)
+                    except ValueError:
+                        if eof:
+                            raise
+                    else:
+                        # A row that ends the buffer may be cut short
+                        if end < len(buf) or eof:
+                            yield row
+                            idx = end
+                            continue
+            if eof:
+                raise ValueError('Query result is truncated')
+            try:
+                chunk = chunks.next()
+            except StopIteration:
+                eof = True
+                continue
+            if idx is not None:
+                buf = buf[idx:] + chunk
+                idx = 0
+            else:
+                buf += chunk
+    # end iter_query_result
+
+    @staticmethod
+    def parse_query_result(result):
+        try:
+            for row in OpServerUtils.iter_query_result(
+                    result.iter_content(OpServerUtils.RESULT_READ_SIZE)):
+                yield row
+        except Exception as e:
+            print "Error parsing results: %s" % str(e)
         return
     # end parse_query_result
 
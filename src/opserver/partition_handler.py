@@ -9,11 +9,11 @@ from kafka import KafkaClient, KeyedProducer, SimpleConsumer, common
 from uveserver import UVEServer
 import os
 import json
-import copy
 import traceback
 import uuid
 import struct
 import socket
+import time
 import discoveryclient.client as client 
 from sandesh_common.vns.constants import ALARM_PARTITION_SERVICE_NAME
 from pysandesh.util import UTCTimestampUsec
@@ -31,11 +31,23 @@ def sse_pack(d):
             buffer += '%s: %s\n' % (k, d[k])
     return buffer + '\n'
 
+def stream_put(q, sse, event, data):
+    """Put a message on a UVE stream queue. SSE clients get the data
+    as JSON, the in-process consumer (UveCacheProcessor) gets it as is"""
+    if sse:
+        q.put(sse_pack({'event': event, 'data': json.dumps(data)}))
+    else:
+        q.put({'event': event, 'data': data})
+
 class UveCacheProcessor(gevent.Greenlet):
+    """Keeps the aggregated UVEs of all partitions, as read from the
+    in-process UveStreamer queue. Messages on that queue are not
+    serialized, and their UVE keys are (table, key) tuples"""
     def __init__(self, logger, q, partitions):
         gevent.Greenlet.__init__(self)
         self._logger = logger
         self._q = q
+        # (table, key) tuples of the UVEs of each partition
         self._partkeys = {}
         for partno in range(0,partitions):
             self._partkeys[partno] = set()
@@ -56,8 +68,7 @@ class UveCacheProcessor(gevent.Greenlet):
                         del tfilter[k]
                 if len(tfilter) == 0:
                     tfilter["UVEAlarms"] = set(["alarms"])
-            barekey = key.split(":",1)[1]
-            table = key.split(":",1)[0]
+            table, barekey = key.split(":",1)
              
             if table not in self._uvedb:
                 return failures, rsp
@@ -109,23 +120,20 @@ class UveCacheProcessor(gevent.Greenlet):
 
     def _run(self):
         for telem in self._q:
-            elem = json.loads(telem['data'])
+            elem = telem['data']
             if telem['event'] == 'clear':
                 # remove all keys of this partition
                 partno = elem['partition']
-                for key in self._partkeys[partno]:
-                    barekey = key.split(":",1)[1]
-                    table = key.split(":",1)[0]
+                for table, barekey in self._partkeys[partno]:
                     del self._uvedb[table][barekey]
-                    self._partkeys[partno].remove("%s:%s" % \
-                        (table, barekey))
+                self._partkeys[partno] = set()
 
             elif telem['event'] == 'sync' or telem['event'] == 'update':
                 partno = elem['partition']
-                self._partkeys[partno].add(elem['key'])
+                tkey = elem['key']
+                self._partkeys[partno].add(tkey)
 
-                barekey = elem['key'].split(":",1)[1]
-                table = elem['key'].split(":",1)[0]
+                table, barekey = tkey
                 if table not in self._uvedb:
                     self._uvedb[table] = {}
                 if barekey not in self._uvedb[table]:
@@ -133,8 +141,7 @@ class UveCacheProcessor(gevent.Greenlet):
 
                 if elem['type'] is None:
                     # delete the entire UVE
-                    self._partkeys[partno].remove("%s:%s" % \
-                        (table, barekey))
+                    self._partkeys[partno].remove(tkey)
                     del self._uvedb[table][barekey]
                 else:
                     typ = elem['type']
@@ -160,6 +167,17 @@ class UveStreamPart(gevent.Greenlet):
         self._rpass = rpass
         self._sse = sse
 
+    def _put_uve(self, event, key, typ, value=None):
+        data = {'partition': self._partno, 'type': typ}
+        if self._sse:
+            data['key'] = key
+        else:
+            data['key'] = tuple(key.split(":", 1))
+        # The type is None when the UVE is deleted
+        if typ is not None:
+            data['value'] = value
+        stream_put(self._q, self._sse, event, data)
+
     def syncpart(self, redish):
         inst = self._pi.instance_id
         part = self._partno
@@ -171,13 +189,7 @@ class UveStreamPart(gevent.Greenlet):
         idx=0
         for res in pperes:
             for tk,tv in res.iteritems():
-                msg = {'event': 'sync', 'data':\
-                    json.dumps({'partition':self._partno,
-                        'key':keys[idx], 'type':tk, 'value':json.loads(tv)})}
-                if self._sse:
-                    self._q.put(sse_pack(msg))
-                else:
-                    self._q.put(msg)
+                self._put_uve('sync', keys[idx], tk, json.loads(tv))
             idx += 1
         
     def _run(self):
@@ -219,23 +231,15 @@ class UveStreamPart(gevent.Greenlet):
                     idx = 0
                     for elem in elems:
                         if elem["type"] is None:
-                            msg = {'event': 'update', 'data':\
-                                json.dumps({'partition':part,
-                                    'key':elem["key"], 'type':None})}
+                            self._put_uve('update', elem["key"], None)
                         else:
                             vjson = pperes[idx]
                             if vjson is None:
                                 vdata = None
                             else:
                                 vdata = json.loads(vjson)
-                            msg = {'event': 'update', 'data':\
-                                json.dumps({'partition':part,
-                                    'key':elem["key"], 'type':elem["type"],
-                                    'value':vdata})}
-                        if self._sse:
-                            self._q.put(sse_pack(msg))
-                        else:
-                            self._q.put(msg)
+                            self._put_uve('update', elem["key"],
+                                elem["type"], vdata)
                         idx += 1
             except gevent.GreenletExit:
                 break
@@ -269,12 +273,8 @@ class UveStreamer(gevent.Greenlet):
     def _run(self):
         inputs = [ self._rfile ]
         outputs = [ ]
-        msg = {'event': 'init', 'data':\
-            json.dumps({'partitions':self._partitions})}
-        if self._sse:
-            self._q.put(sse_pack(msg))
-        else:
-            self._q.put(msg)
+        stream_put(self._q, self._sse, 'init',
+            {'partitions':self._partitions})
         while True:
             try:
                 if self._rfile is not None:
@@ -303,20 +303,12 @@ class UveStreamer(gevent.Greenlet):
                 break
         for part, pi in self._agp.iteritems():
             self.partition_stop(part)
-        msg = {'event': 'stop', 'data':json.dumps(None)}
-        if self._sse:
-            self._q.put(sse_pack(msg))
-        else:
-            self._q.put(msg)
+        stream_put(self._q, self._sse, 'stop', None)
 
     def partition_start(self, partno, pi):
         self._logger.error("Starting agguve part %d using %s" %( partno, pi))
-        msg = {'event': 'clear', 'data':\
-            json.dumps({'partition':partno, 'acq_time':pi.acq_time})}
-        if self._sse:
-            self._q.put(sse_pack(msg))
-        else:
-            self._q.put(msg)
+        stream_put(self._q, self._sse, 'clear',
+            {'partition':partno, 'acq_time':pi.acq_time})
         self._parts[partno] = UveStreamPart(partno, self._logger,
             self._q, pi, self._rpass, self._sse)
         self._parts[partno].start()
@@ -328,7 +320,27 @@ class UveStreamer(gevent.Greenlet):
         del self._parts[partno]
             
 class PartitionHandler(gevent.Greenlet):
-    def __init__(self, brokers, group, topic, logger, limit):
+    # Kafka consumer settings:
+    #  fetch_size      : initial size of the fetch buffer, in bytes
+    #  max_fetch_size  : size that the fetch buffer can grow to, in bytes
+    #  batch_size      : max number of messages handled together
+    #  batch_timeout   : seconds to wait for a batch of messages
+    #  commit_count    : commit offsets after these many messages ...
+    #  commit_interval : ... or when this many seconds have passed
+    #                    since the last commit
+    KAFKA_DEFAULTS = {
+        'fetch_size'      : 4096*4,
+        'max_fetch_size'  : 4096*32,
+        'batch_size'      : 10,
+        'batch_timeout'   : 0.5,
+        'commit_count'    : 10,
+        'commit_interval' : 1.0,
+    }
+    # seconds over which the ingest rate is measured
+    INGEST_PERIOD = 5
+
+    def __init__(self, brokers, group, topic, logger, limit,
+                 kafka_cfg=None):
         gevent.Greenlet.__init__(self)
         self._brokers = brokers
         self._group = group
@@ -338,6 +350,32 @@ class PartitionHandler(gevent.Greenlet):
         self._uvedb = {}
         self._partoffset = 0
         self._kfk = None
+        self._kafka_cfg = dict(self.KAFKA_DEFAULTS)
+        if kafka_cfg:
+            self._kafka_cfg.update(kafka_cfg)
+        self._ingest_count = 0
+        self._ingest_time = time.time()
+        self._ingest_rate = 0.0
+        self._ingest_lag = 0
+
+    def ingest_stats(self):
+        """ Messages read per second over the last INGEST_PERIOD, and
+            number of messages in the topic not read yet
+        """
+        return self._ingest_rate, self._ingest_lag
+
+    def _record_ingest(self, consumer, count, now):
+        self._ingest_count += count
+        if now - self._ingest_time < self.INGEST_PERIOD:
+            return
+        self._ingest_rate = self._ingest_count / (now - self._ingest_time)
+        self._ingest_count = 0
+        self._ingest_time = now
+        try:
+            self._ingest_lag = consumer.pending()
+        except Exception as ex:
+            self._logger.error("%s could not get pending count: %s" % \
+                (self._topic, str(ex)))
 
     def msg_handler(self, mlist):
         self._logger.info("%s Reading %s" % (self._topic, str(mlist)))
@@ -350,7 +388,11 @@ class PartitionHandler(gevent.Greenlet):
                 self._logger.error("New KafkaClient %s" % self._topic)
                 self._kfk = KafkaClient(self._brokers , "kc-" + self._topic)
                 try:
-                    consumer = SimpleConsumer(self._kfk, self._group, self._topic, buffer_size = 4096*4, max_buffer_size=4096*32)
+                    kcfg = self._kafka_cfg
+                    consumer = SimpleConsumer(self._kfk, self._group,
+                        self._topic, auto_commit=False,
+                        buffer_size=kcfg['fetch_size'],
+                        max_buffer_size=kcfg['max_fetch_size'])
                     #except:
                 except Exception as ex:
                     template = "Consumer Failure {0} occured. Arguments:\n{1!r}"
@@ -381,13 +423,26 @@ class PartitionHandler(gevent.Greenlet):
                 if self._limit:
                     raise gevent.GreenletExit
 
+                # Offsets are committed once enough messages have been
+                # handled, or once enough time has passed
+                uncommitted = 0
+                commit_time = time.time()
                 while True:
                     try:
-                        mlist = consumer.get_messages(10,timeout=0.5)
+                        mlist = consumer.get_messages(kcfg['batch_size'],
+                            timeout=kcfg['batch_timeout'])
                         if not self.msg_handler(mlist):
                             raise gevent.GreenletExit
-                        consumer.commit()
+                        uncommitted += len(mlist)
                         pcount += len(mlist) 
+                        now = time.time()
+                        if uncommitted >= kcfg['commit_count'] or \
+                                (uncommitted and now - commit_time >= \
+                                    kcfg['commit_interval']):
+                            consumer.commit()
+                            uncommitted = 0
+                            commit_time = now
+                        self._record_ingest(consumer, len(mlist), now)
                     except TypeError as ex:
                         self._logger.error("Type Error: %s trace %s" % \
                                 (str(ex.args), traceback.format_exc()))
@@ -426,12 +481,23 @@ class UveStreamProc(PartitionHandler):
     #  aginst    : instance_id of alarmgen
     #  rport     : redis server port
     #  disc      : discovery client to publish to
+    #  kafka_cfg : kafka consumer settings, see PartitionHandler
     def __init__(self, brokers, partition, uve_topic, logger, callback,
-            host_ip, rsc, aginst, rport, disc = None):
+            host_ip, rsc, aginst, rport, disc = None, kafka_cfg = None):
         super(UveStreamProc, self).__init__(brokers, "workers",
-            uve_topic, logger, False)
+            uve_topic, logger, False, kafka_cfg)
+        # types of each UVE of the partition, by (coll, gen, tab, key)
+        # Each type has [<notification count>, <agg uuid as bytes>]
         self._uvedb = {}
+        # (tab, key) of the UVEs of each (coll, gen)
+        self._genkeys = {}
+        # generators of each synced collector
+        self._collgens = {}
+        # collector, generator, table and type names, shared by all keys
+        self._names = {}
+        # notification counts by (tab, coll, gen, type)
         self._uvein = {}
+        # notification counts by (tab, UVE key)
         self._uveout = {}
         self._callback = callback
         self._partno = partition
@@ -448,6 +514,12 @@ class UveStreamProc(PartitionHandler):
     def acq_time(self):
         return self._acq_time
 
+    def _intern(self, name):
+        return self._names.setdefault(name, name)
+
+    def _new_type(self, count):
+        return [count, uuid.uuid1(self._ip_code).bytes]
+
     def resource_check(self, msgs):
         '''
         This function compares the known collectors with the
@@ -471,7 +543,7 @@ class UveStreamProc(PartitionHandler):
     def stop_partition(self, kcoll=None):
         clist = []
         if not kcoll:
-            clist = self._uvedb.keys()
+            clist = self._collgens.keys()
             # If all collectors are being cleared, clear resoures too
             self.disc_rset = set()
             if self._disc:
@@ -491,16 +563,13 @@ class UveStreamProc(PartitionHandler):
         chg = {}
         for coll in clist:
             partdb[coll] = {}
-            for gen in self._uvedb[coll].keys():
+            for gen in self._collgens.pop(coll):
                 partdb[coll][gen] = {}
-                for tab in self._uvedb[coll][gen].keys():
-                    for rkey in self._uvedb[coll][gen][tab].keys():
-                        uk = tab + ":" + rkey
-                        chg[uk] = None
-                        partdb[coll][gen][uk] = \
-                            set(self._uvedb[coll][gen][tab][rkey].keys())
-                        
-            del self._uvedb[coll]
+                for tab, rkey in self._genkeys.pop((coll, gen), ()):
+                    uk = tab + ":" + rkey
+                    chg[uk] = None
+                    partdb[coll][gen][uk] = \
+                        set(self._uvedb.pop((coll, gen, tab, rkey)).keys())
         self._logger.error("Stopping part %d UVEs %s" % \
                 (self._partno,str(chg.keys())))
         self._callback(self._partno, chg)
@@ -514,23 +583,27 @@ class UveStreamProc(PartitionHandler):
                 (self._partno, str(cbdb.keys())))
         uves  = {}
         for kcoll,coll in cbdb.iteritems():
-            self._uvedb[kcoll] = {}
+            kcoll = self._intern(kcoll)
+            # Drop what is left of an earlier sync of this collector
+            for kgen in self._collgens.pop(kcoll, ()):
+                for tab, rkey in self._genkeys.pop((kcoll, kgen), ()):
+                    del self._uvedb[(kcoll, kgen, tab, rkey)]
+            gens = set()
+            self._collgens[kcoll] = gens
             for kgen,gen in coll.iteritems():
-                self._uvedb[kcoll][kgen] = {}
+                kgen = self._intern(kgen)
+                gens.add(kgen)
+                keys = self._genkeys.setdefault((kcoll, kgen), set())
                 for kk in gen.keys():
-                    tabl = kk.split(":",1)
-                    tab = tabl[0]
-                    rkey = tabl[1]
-                    if not tab in self._uvedb[kcoll][kgen]:
-                        self._uvedb[kcoll][kgen][tab] = {}
-                    self._uvedb[kcoll][kgen][tab][rkey] = {}
+                    tab, rkey = kk.split(":",1)
+                    tab = self._intern(tab)
+                    keys.add((tab, rkey))
+                    types = {}
+                    self._uvedb[(kcoll, kgen, tab, rkey)] = types
 
                     uves[kk] = {}
                     for typ, contents in gen[kk].iteritems():
-                        self._uvedb[kcoll][kgen][tab][rkey][typ] = {}
-                        self._uvedb[kcoll][kgen][tab][rkey][typ]["c"] = 0
-                        self._uvedb[kcoll][kgen][tab][rkey][typ]["u"] = \
-                                uuid.uuid1(self._ip_code)
+                        types[self._intern(typ)] = self._new_type(0)
                         uves[kk][typ] = contents
                     
         self._logger.error("Starting part %d UVEs %s" % \
@@ -538,17 +611,31 @@ class UveStreamProc(PartitionHandler):
         self._callback(self._partno, uves)
 
     def contents(self):
-        return self._uvedb
+        ''' Return the UVE types of this partition as
+            collector -> generator -> table -> key -> type -> {"c","u"}
+            This is built on every call, and is meant for introspect.
+        '''
+        db = {}
+        for coll, gens in self._collgens.iteritems():
+            db[coll] = {}
+            for gen in gens:
+                db[coll][gen] = {}
+                for tab, rkey in self._genkeys.get((coll, gen), ()):
+                    types = self._uvedb[(coll, gen, tab, rkey)]
+                    db[coll][gen].setdefault(tab, {})[rkey] = dict(
+                        (typ, {"c": tc[0], "u": uuid.UUID(bytes=tc[1])}) \
+                        for typ, tc in types.iteritems())
+        return db
 
     def stats(self):
         ''' Return the UVEKey-Count stats collected over 
             the last time period for this partition, and 
             the incoming UVE Notifs as well.
-            Also, the stats should be cleared to prepare
-            for the next period of collection.
+            Keys are (table, UVE key) and (table, coll, gen, type).
+            New counters are started for the next period of collection.
         '''
-        ret_out = copy.deepcopy(self._uveout)
-        ret_in  = copy.deepcopy(self._uvein)
+        ret_out = self._uveout
+        ret_in  = self._uvein
         self._uveout = {}
         self._uvein = {}
         return ret_in, ret_out
@@ -574,27 +661,20 @@ class UveStreamProc(PartitionHandler):
             coll = uv["coll"]
             gen = uv["gen"]
 
-            if not self._uvedb.has_key(coll):
+            if not self._collgens.has_key(coll):
                 # This partition is not synced yet.
                 # Ignore this message
                 self._logger.debug("%s Ignoring UVE %s" % (self._topic, str(om)))
                 return True
 
-            if not self._uvedb[coll].has_key(gen):
-                self._uvedb[coll][gen] = {}
+            coll = self._intern(coll)
+            gen = self._intern(gen)
+            self._collgens[coll].add(gen)
 
             if (uv["message"] == "UVEUpdate"):
-                tabl = uv["key"].split(":",1)
-                tab = tabl[0]
-                rkey = tabl[1]
-                
-                if tab not in self._uvedb[coll][gen]:
-                    self._uvedb[coll][gen][tab] = {}
-
-                if not rkey in self._uvedb[coll][gen][tab]:
-                    self._uvedb[coll][gen][tab][rkey] = {}
-         
-                removed = False
+                tab, rkey = uv["key"].split(":",1)
+                tab = self._intern(tab)
+                ukey = (coll, gen, tab, rkey)
 
                 # uv["type"] and uv["value"] can be decoded as follows:
 
@@ -616,62 +696,49 @@ class UveStreamProc(PartitionHandler):
                     # TODO: Handling of delete UVE case
                     return False
                 
+                typ = self._intern(uv["type"])
+                types = self._uvedb.get(ukey)
                 if uv["value"] is None:
-                    if uv["type"] in self._uvedb[coll][gen][tab][rkey]:
-                        del self._uvedb[coll][gen][tab][rkey][uv["type"]]
-                    if not len(self._uvedb[coll][gen][tab][rkey]):
-                        del self._uvedb[coll][gen][tab][rkey]
-                    removed = True
-
-                if not removed: 
-                    if uv["type"] in self._uvedb[coll][gen][tab][rkey]:
-                        self._uvedb[coll][gen][tab][rkey][uv["type"]]["c"] +=1
+                    if types is not None:
+                        if typ in types:
+                            del types[typ]
+                        if not len(types):
+                            del self._uvedb[ukey]
+                            self._genkeys[(coll, gen)].discard((tab, rkey))
+                else:
+                    if types is None:
+                        types = {}
+                        self._uvedb[ukey] = types
+                        self._genkeys.setdefault((coll, gen), set()).add(
+                            (tab, rkey))
+                    if typ in types:
+                        types[typ][0] += 1
                     else:
-                        self._uvedb[coll][gen][tab][rkey][uv["type"]] = {}
-                        self._uvedb[coll][gen][tab][rkey][uv["type"]]["c"] = 1
-                        self._uvedb[coll][gen][tab][rkey][uv["type"]]["u"] = \
-                            uuid.uuid1(self._ip_code)
+                        types[typ] = self._new_type(1)
                 chg[uv["key"]] = { uv["type"] : uv["value"] }
 
                 # Record stats on UVE Keys being processed
-                if not self._uveout.has_key(tab):
-                    self._uveout[tab] = {}
-                if self._uveout[tab].has_key(uv["key"]):
-                    self._uveout[tab][uv["key"]] += 1
-                else:
-                    self._uveout[tab][uv["key"]] = 1
+                okey = (tab, uv["key"])
+                self._uveout[okey] = self._uveout.get(okey, 0) + 1
 
                 # Record stats on the input UVE Notifications
-                if not self._uvein.has_key(tab):
-                    self._uvein[tab] = {}
-                if not self._uvein[tab].has_key(coll):
-                    self._uvein[tab][coll] = {}
-                if not self._uvein[tab][coll].has_key(gen):
-                    self._uvein[tab][coll][gen] = {}
-                if not self._uvein[tab][coll][gen].has_key(uv["type"]):
-                    self._uvein[tab][coll][gen][uv["type"]] = 1
-                else:
-                    self._uvein[tab][coll][gen][uv["type"]] += 1
+                ikey = (tab, coll, gen, typ)
+                self._uvein[ikey] = self._uvein.get(ikey, 0) + 1
 
             else:
-                # Record stats on UVE Keys being processed
-                for tab in self._uvedb[coll][gen].keys():
-                    for rkey in self._uvedb[coll][gen][tab].keys():
-                        uk = tab + ":" + rkey
-
-                        if not self._uveout.has_key(tab):
-                            self._uveout[tab] = {}
+                for tab, rkey in self._genkeys.pop((coll, gen), ()):
+                    uk = tab + ":" + rkey
 
-                        if self._uveout[tab].has_key(uk):
-                            self._uveout[tab][uk] += 1
-                        else:
-                            self._uveout[tab][uk] = 1
-                
-                        # when a generator is delelted, we need to 
-                        # notify for *ALL* its UVEs
-                        chg[uk] = None
+                    # Record stats on UVE Keys being processed
+                    okey = (tab, uk)
+                    self._uveout[okey] = self._uveout.get(okey, 0) + 1
+            
+                    # when a generator is delelted, we need to 
+                    # notify for *ALL* its UVEs
+                    chg[uk] = None
+                    del self._uvedb[(coll, gen, tab, rkey)]
 
-                del self._uvedb[coll][gen]
+                self._collgens[coll].discard(gen)
 
         except Exception as ex:
             template = "An exception of type {0} in uve proc . Arguments:\n{1!r}"
@@ -8,6 +8,13 @@ class AlarmBase(object):
     SYS_EMERG, SYS_ALERT, SYS_CRIT, SYS_ERR,\
         SYS_WARN, SYS_NOTICE, SYS_INFO, SYS_DEBUG = range(8)
 
+    # UVE contents that the alarm is evaluated from, as a dict with the
+    # UVE Type as key and a list of UVE Attrs (or None for all the Attrs
+    # of the Type) as value. The alarm is only evaluated again when one
+    # of these changes. None means that the alarm is evaluated on every
+    # change of the UVE.
+    UVE_DEPENDENCIES = None
+
     def __init__(self):
         pass
 
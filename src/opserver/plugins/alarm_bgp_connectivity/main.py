@@ -4,6 +4,8 @@ from  opserver.plugins.alarm_base import AlarmBase
 class BgpConnectivity(AlarmBase):
     """Not enough BGP peers are up in BgpRouterState.num_up_bgp_peer"""
 
+    UVE_DEPENDENCIES = {"BgpRouterState": ["num_up_bgp_peer", "num_bgp_peer"]}
+
     def __call__(self, uve_key, uve_data):
         err_list = []
         if not uve_data.has_key("BgpRouterState"):
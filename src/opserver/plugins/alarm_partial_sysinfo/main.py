@@ -23,20 +23,32 @@ class PartialSysinfo(AlarmBase):
 
 class PartialSysinfoCompute(PartialSysinfo):
     """Basic System Information is absent for this node in VrouterAgent.build_info"""
+
+    UVE_DEPENDENCIES = {"VrouterAgent": ["build_info"]}
+
     def __call__(self, uve_key, uve_data):
        return super(PartialSysinfoCompute,self).__call__(uve_key, uve_data)
 
 class PartialSysinfoAnalytics(PartialSysinfo):
     """Basic System Information is absent for this node in CollectorState.build_info"""
+
+    UVE_DEPENDENCIES = {"CollectorState": ["build_info"]}
+
     def __call__(self, uve_key, uve_data):
        return super(PartialSysinfoAnalytics,self).__call__(uve_key, uve_data)
 
 class PartialSysinfoConfig(PartialSysinfo):
     """Basic System Information is absent for this node in ModuleCpuState.build_info"""
+
+    UVE_DEPENDENCIES = {"ModuleCpuState": ["build_info"]}
+
     def __call__(self, uve_key, uve_data):
        return super(PartialSysinfoConfig,self).__call__(uve_key, uve_data)
 
 class PartialSysinfoControl(PartialSysinfo):
     """Basic System Information is absent for this node in BgpRouterState.build_info"""
+
+    UVE_DEPENDENCIES = {"BgpRouterState": ["build_info"]}
+
     def __call__(self, uve_key, uve_data):
        return super(PartialSysinfoControl,self).__call__(uve_key, uve_data)
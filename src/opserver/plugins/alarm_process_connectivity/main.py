@@ -4,6 +4,8 @@ from  opserver.plugins.alarm_base import AlarmBase
 class ProcessConnectivity(AlarmBase):
     """Process(es) are reporting non-functional components in NodeStatus.process_status"""
 
+    UVE_DEPENDENCIES = {"NodeStatus": ["process_status"]}
+
     def __call__(self, uve_key, uve_data):
         err_list = []
         if not uve_data.has_key("NodeStatus"):
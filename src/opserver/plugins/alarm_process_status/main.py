@@ -4,6 +4,8 @@ from opserver.plugins.alarm_base import AlarmBase
 class ProcessStatus(AlarmBase):
     """NodeMgr reports abnormal status for process(es) in NodeStatus.process_info"""
 
+    UVE_DEPENDENCIES = {"NodeStatus": ["process_info"]}
+
     def __call__(self, uve_key, uve_data):
         err_list = []
         if not uve_data.has_key("NodeStatus"):
@@ -4,6 +4,8 @@ from  opserver.plugins.alarm_base import AlarmBase
 class VrouterInterface(AlarmBase):
     """VrouterAgent has interfaces in error state in VrouterAgent.error_intf_list"""
 
+    UVE_DEPENDENCIES = {"VrouterAgent": ["error_intf_list"]}
+
     def __call__(self, uve_key, uve_data):
         err_list = []
         if not uve_data.has_key("VrouterAgent"):
@@ -4,6 +4,8 @@ from  opserver.plugins.alarm_base import AlarmBase
 class XmppConnectivity(AlarmBase):
     """Not enough XMPP peers are up in BgpRouterState.num_up_bgp_peer"""
 
+    UVE_DEPENDENCIES = {"BgpRouterState": ["num_up_xmpp_peer", "num_xmpp_peer"]}
+
     def __call__(self, uve_key, uve_data):
         err_list = []
         if not uve_data.has_key("BgpRouterState"):
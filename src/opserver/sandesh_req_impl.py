@@ -7,11 +7,14 @@
 #
 
 from sandesh.redis.ttypes import RedisUveInfo, RedisUVERequest, RedisUVEResponse
+from sandesh.uveserver.ttypes import UVEValueCacheStats, UVEValueCacheReq, \
+    UVEValueCacheResp
 
 class OpserverSandeshReqImpl(object):
     def __init__(self, opserver):
         self._opserver = opserver
         RedisUVERequest.handle_request = self.handle_redis_uve_info_req
+        UVEValueCacheReq.handle_request = self.handle_uve_value_cache_req
     # end __init__
 
     def handle_redis_uve_info_req(self, req):
@@ -22,4 +25,12 @@ class OpserverSandeshReqImpl(object):
         redis_uve_resp.response(req.context())
     # end handle_redis_uve_info_req
 
+    def handle_uve_value_cache_req(self, req):
+        stats = UVEValueCacheStats()
+        uve_server = self._opserver.get_uve_server()
+        uve_server.fill_value_cache_stats(stats)
+        uve_value_cache_resp = UVEValueCacheResp(stats)
+        uve_value_cache_resp.response(req.context())
+    # end handle_uve_value_cache_req
+
 # end class OpserverSandeshReqImpl
@@ -108,12 +108,11 @@ class StatQuerier(object):
         
         print json.dumps(query_dict)
         resp = OpServerUtils.post_url_http(
-            query_url, json.dumps(query_dict), sync = True)
+            query_url, json.dumps(query_dict), sync = True, stream = True)
 
         res = None
         if resp is not None:
-            res = json.loads(resp)
-            res = res['value']
+            res = OpServerUtils.parse_query_result(resp)
 
         return res
     # end query
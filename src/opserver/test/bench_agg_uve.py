@@ -0,0 +1,92 @@
+#
+# Copyright (c) 2015 Juniper Networks, Inc. All rights reserved.
+#
+
+"""
+Benchmark of the aggregated UVE writes of alarmgen. Writes the output
+of UVE processing cycles of one partition to a redis server with
+Controller.send_agg_uve, the way run_uve_processing does. With --batch,
+the rows of a cycle are split into writes of that many rows each, which
+is how the output used to be flushed (2 rows, or 20 with discovery).
+
+    python bench_agg_uve.py [--redis-port 6379] [--uves 1000] [--types 3]
+                            [--cycles 10] [--batch 0]
+"""
+import argparse
+import sys
+import time
+
+import redis
+
+from opserver.alarmgen import Controller, OutputRow
+
+INST = "bench"
+PART = 0
+
+
+def make_rows(uves, types, cycle):
+    rows = []
+    for idx in range(uves):
+        key = "ObjectVRouter:vrouter-%d" % idx
+        for tidx in range(types):
+            rows.append(OutputRow(key=key, typ="Type%d" % tidx,
+                val={"in_tpkts": 1000 * cycle + idx,
+                     "out_tpkts": 900 * cycle + idx,
+                     "name": key}))
+    return rows
+# end make_rows
+
+
+def cleanup(redish):
+    keys = redish.smembers("AGPARTKEYS:%s:%d" % (INST, PART))
+    ppe = redish.pipeline()
+    for key in keys:
+        ppe.delete("AGPARTVALUES:%s:%d:%s" % (INST, PART, key))
+    ppe.delete("AGPARTKEYS:%s:%d" % (INST, PART))
+    ppe.delete("AGPARTS:%s" % INST)
+    ppe.execute()
+# end cleanup
+
+
+def main(args_str=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--redis-host', default='127.0.0.1',
+                        help='Redis server to write to')
+    parser.add_argument('--redis-port', type=int, default=6379,
+                        help='Port of the redis server')
+    parser.add_argument('--redis-password', default=None,
+                        help='Password of the redis server')
+    parser.add_argument('--uves', type=int, default=1000,
+                        help='Number of UVEs changed in every cycle')
+    parser.add_argument('--types', type=int, default=3,
+                        help='Number of structs changed per UVE')
+    parser.add_argument('--cycles', type=int, default=10,
+                        help='Number of UVE processing cycles')
+    parser.add_argument('--batch', type=int, default=0,
+                        help='Rows per write, 0 for all rows of a cycle')
+    args = parser.parse_args(args_str)
+
+    redish = redis.StrictRedis(host=args.redis_host, port=args.redis_port,
+                               password=args.redis_password, db=2)
+    cleanup(redish)
+    acq_time = int(time.time() * 1000000)
+    Controller.sync_agg_part(redish, INST, PART, acq_time)
+
+    elapsed = 0.0
+    nrows = 0
+    for cycle in range(args.cycles):
+        rows = make_rows(args.uves, args.types, cycle)
+        batch = args.batch or len(rows)
+        start = time.time()
+        for idx in range(0, len(rows), batch):
+            Controller.send_agg_uve(redish, INST, PART, acq_time,
+                                    rows[idx:idx + batch])
+        elapsed += time.time() - start
+        nrows += len(rows)
+    cleanup(redish)
+    print 'rows: %d in %.2fs (%.0f rows/s)' % (
+        nrows, elapsed, nrows / max(elapsed, 1e-9))
+# end main
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,130 @@
+#
+# Copyright (c) 2015 Juniper Networks, Inc. All rights reserved.
+#
+
+"""
+Microbenchmark of alarm evaluation in alarmgen. Replays UVE struct
+changes of the vrouters of one partition through
+Controller.handle_uve_notif with the alarm plugins of ObjectVRouter.
+Most of the changes are to the stats struct, which none of the alarms
+read. With --all-plugins the UVE dependencies of the plugins are
+ignored, and every plugin is called on every change.
+
+    python bench_alarmgen.py [--uves 1000] [--rounds 20] [--all-plugins]
+"""
+import argparse
+import logging
+import sys
+import time
+from collections import namedtuple
+
+import mock
+
+from opserver import alarmgen
+from opserver.alarmgen import Controller, AGTabStats
+from opserver.plugins.alarm_partial_sysinfo.main import PartialSysinfoCompute
+from opserver.plugins.alarm_process_connectivity.main import \
+    ProcessConnectivity
+from opserver.plugins.alarm_process_status.main import ProcessStatus
+from opserver.plugins.alarm_vrouter_interface.main import VrouterInterface
+
+Extension = namedtuple("Extension", ["name", "obj"])
+
+PART = 0
+TABLE = "ObjectVRouter"
+
+
+class UVEServerBench(object):
+    def __init__(self):
+        self.uves = {}
+
+    def get_uve(self, key, flat, filters=None):
+        uve = self.uves.get(key, {})
+        if filters and "cfilt" in filters:
+            uve = dict((typ, val) for typ, val in uve.iteritems() \
+                       if typ in filters["cfilt"])
+        return False, uve
+
+    def get_uves(self, key_filters, flat=True):
+        return False, dict((key, self.get_uve(key, flat, filters)[1]) \
+                           for key, filters in key_filters.iteritems())
+# end UVEServerBench
+
+
+def make_uve(idx, rnd):
+    procs = [{"process_name": "contrail-vrouter-agent",
+              "process_state": "PROCESS_STATE_RUNNING"},
+             {"process_name": "contrail-vrouter-nodemgr",
+              "process_state": "PROCESS_STATE_RUNNING"}]
+    return {
+        "NodeStatus": {
+            "process_info": procs,
+            "process_status": [{"module_id": "contrail-vrouter-agent",
+                                "state": "Functional"}]},
+        "VrouterAgent": {
+            "build_info": "build-%d" % idx,
+            # every tenth vrouter has an interface in error
+            "error_intf_list": ["tap%d" % idx] if idx % 10 == 0 else []},
+        "VrouterStatsAgent": {
+            "in_tpkts": 1000 * rnd + idx,
+            "out_tpkts": 900 * rnd + idx,
+            "cpu_share": (rnd + idx) % 100}}
+# end make_uve
+
+
+def make_controller(us, all_plugins):
+    ctrl = Controller.__new__(Controller)
+    ctrl._logger = logging.getLogger("bench_alarmgen")
+    ctrl._sandesh = mock.MagicMock()
+    ctrl._us = us
+    ctrl.ptab_info = {PART: {}}
+    ctrl.tab_perf = {TABLE: AGTabStats()}
+    ctrl.tab_alarms = {TABLE: {}}
+    plugins = [PartialSysinfoCompute(), ProcessConnectivity(),
+               ProcessStatus(), VrouterInterface()]
+    if all_plugins:
+        for plugin in plugins:
+            plugin.UVE_DEPENDENCIES = None
+    ctrl.mgrs = {TABLE: {TABLE: [Extension(plugin.__class__.__name__,
+                                           plugin) for plugin in plugins]}}
+    return ctrl
+# end make_controller
+
+
+def main(args_str=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--uves', type=int, default=1000,
+                        help='Number of vrouter UVEs in the partition')
+    parser.add_argument('--rounds', type=int, default=20,
+                        help='Number of times each UVE changes')
+    parser.add_argument('--all-plugins', action='store_true',
+                        help='Call every plugin on every change')
+    args = parser.parse_args(args_str)
+
+    logging.basicConfig(level=logging.WARNING)
+    # alarms are not sent anywhere
+    alarmgen.AlarmTrace = mock.MagicMock()
+    alarmgen.UTCTimestampUsec = lambda: int(time.time() * 1000000)
+    Controller.token = staticmethod(lambda sandesh, timestamp: "")
+
+    us = UVEServerBench()
+    ctrl = make_controller(us, args.all_plugins)
+    keys = [TABLE + ":vrouter-%d" % idx for idx in range(args.uves)]
+    for idx, key in enumerate(keys):
+        us.uves[key] = make_uve(idx, 0)
+    ctrl.handle_uve_notif(PART, dict((key, None) for key in keys))
+
+    start = time.time()
+    for rnd in range(1, args.rounds + 1):
+        for idx, key in enumerate(keys):
+            us.uves[key] = make_uve(idx, rnd)
+            ctrl.handle_uve_notif(PART, {key: {"VrouterStatsAgent": {}}})
+    elapsed = time.time() - start
+    changes = args.uves * args.rounds
+    print 'changes: %d in %.2fs (%.0f UVEs/s per partition)' % (
+        changes, elapsed, changes / max(elapsed, 1e-9))
+    print 'alarms raised: %d' % len(ctrl.tab_alarms[TABLE])
+# end main
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -5,6 +5,7 @@
 #
 
 import gevent
+from gevent.queue import Queue
 import json
 import signal
 import logging
@@ -16,9 +17,11 @@ from collections import namedtuple
 from kafka.common import OffsetAndMessage,Message
 
 from opserver.uveserver import UVEServer
-from opserver.partition_handler import PartitionHandler, UveStreamProc
-from opserver.alarmgen import Controller
+from opserver.partition_handler import PartitionHandler, UveStreamProc, \
+    UveStreamPart, UveCacheProcessor, PartInfo, stream_put
+from opserver.alarmgen import Controller, OutputRow
 from opserver.alarmgen_cfg import CfgParser
+from opserver.plugins.alarm_base import AlarmBase
 
 logging.basicConfig(level=logging.DEBUG,
     format='%(asctime)s %(levelname)s %(message)s')
@@ -117,6 +120,110 @@ class TestPartitionHandler(unittest.TestCase):
             raise res
         self.assertEqual(db, self.test_spec[-1].o.uvedb)
 
+    def test_01_ingest_stats(self):
+        config = CfgParser('--kafka_batch_size 100 '
+                           '--kafka_commit_interval 2.5')
+        config.parse()
+        ph = PartitionHandler('no-brokers', 'workers', 'uve-1', logging,
+            False, config.kafka_consumer())
+        self.assertEqual(ph._kafka_cfg['batch_size'], 100)
+        self.assertEqual(ph._kafka_cfg['commit_interval'], 2.5)
+        self.assertEqual(ph._kafka_cfg['fetch_size'], 16384)
+
+        consumer = mock.Mock()
+        consumer.pending.return_value = 42
+        start = ph._ingest_time
+        ph._record_ingest(consumer, 30, start + 1)
+        self.assertEqual(ph.ingest_stats(), (0.0, 0))
+        ph._record_ingest(consumer, 20, start + PartitionHandler.INGEST_PERIOD)
+        self.assertEqual(ph.ingest_stats(),
+            (50.0 / PartitionHandler.INGEST_PERIOD, 42))
+
+    def test_02_uve_tables(self):
+        chgs = []
+        ph = UveStreamProc('no-brokers', 1, "uve-1", logging,
+            lambda part, chg: chgs.append(chg), "127.0.0.1", None, "0", 0)
+        ph.start_partition({"127.0.0.1:0":
+            {"gen1": {"ObjectXX:uve1": {"type1": {}}}}})
+        self.assertEqual(chgs.pop(), {"ObjectXX:uve1": {"type1": {}}})
+
+        def kmsg(**kwargs):
+            return OffsetAndMessage(offset=0, message=Message(magic=0,
+                attributes=0, key='', value=json.dumps(kwargs)))
+        self.assertTrue(ph.msg_handler_single(kmsg(message="UVEUpdate",
+            key="ObjectXX:uve1", type="type1", gen="gen1",
+            coll="127.0.0.1:0", value={})))
+        self.assertTrue(ph.msg_handler_single(kmsg(message="UVEUpdate",
+            key="ObjectYY:uve2", type="type2", gen="gen2",
+            coll="127.0.0.1:0", value={})))
+        # Not synced with this collector yet
+        self.assertTrue(ph.msg_handler_single(kmsg(message="UVEUpdate",
+            key="ObjectYY:uve3", type="type2", gen="gen2",
+            coll="127.0.0.5:0", value={})))
+        self.assertEqual(chgs, [{"ObjectXX:uve1": {"type1": {}}},
+                                {"ObjectYY:uve2": {"type2": {}}}])
+        contents = ph.contents()
+        self.assertEqual(contents["127.0.0.1:0"]["gen1"]["ObjectXX"]["uve1"]\
+            ["type1"]["c"], 1)
+        self.assertEqual(contents["127.0.0.1:0"]["gen2"]["ObjectYY"]["uve2"]\
+            ["type2"]["c"], 1)
+        self.assertEqual(ph.stats(),
+            ({("ObjectXX", "127.0.0.1:0", "gen1", "type1"): 1,
+              ("ObjectYY", "127.0.0.1:0", "gen2", "type2"): 1},
+             {("ObjectXX", "ObjectXX:uve1"): 1,
+              ("ObjectYY", "ObjectYY:uve2"): 1}))
+        self.assertEqual(ph.stats(), ({}, {}))
+
+        # All UVEs of a deleted generator change
+        del chgs[:]
+        self.assertTrue(ph.msg_handler_single(kmsg(message="GenDelete",
+            gen="gen2", coll="127.0.0.1:0")))
+        self.assertEqual(chgs, [{"ObjectYY:uve2": None}])
+        self.assertEqual(ph.stop_partition(),
+            {"127.0.0.1:0": {"gen1": {"ObjectXX:uve1": set(["type1"])}}})
+        self.assertEqual(ph.contents(), {})
+
+# Tests for the in-process feed of aggregated UVEs to UveCacheProcessor
+class TestUveCacheProcessor(unittest.TestCase):
+
+    def feed(self, sse, msgs):
+        q = Queue()
+        part = UveStreamPart(1, logging, q,
+            PartInfo(ip_address="127.0.0.1", instance_id="0",
+                     acq_time=1, port=0), None, sse)
+        for msg in msgs:
+            part._put_uve(*msg)
+        stream_put(q, sse, 'stop', None)
+        return q
+
+    def test_00_update(self):
+        cache = UveCacheProcessor(logging, self.feed(False, [
+            ('sync', 'ObjectXX:uve1', 'type1', {'xx': 1}),
+            ('sync', 'ObjectXX:uve2', 'type2', {'yy': 2}),
+            ('update', 'ObjectXX:uve1', 'type3', {'zz': 3}),
+            ('update', 'ObjectXX:uve2', None)]), 2)
+        cache._run()
+        self.assertEqual(cache.get_uve('ObjectXX:uve1'),
+            (False, {'type1': {'xx': 1}, 'type3': {'zz': 3}}))
+        self.assertEqual(cache.get_uve('ObjectXX:uve2'), (False, {}))
+        self.assertEqual(cache._partkeys[1], set([('ObjectXX', 'uve1')]))
+
+        # clearing the partition removes all its UVEs
+        cache._q = Queue()
+        stream_put(cache._q, False, 'clear', {'partition': 1, 'acq_time': 2})
+        stream_put(cache._q, False, 'stop', None)
+        cache._run()
+        self.assertEqual(cache.get_uve('ObjectXX:uve1'), (False, {}))
+        self.assertEqual(cache._partkeys[1], set())
+
+    def test_01_sse(self):
+        q = self.feed(True, [('update', 'ObjectXX:uve1', 'type1', {'xx': 1})])
+        event, data = q.get().strip().split('\n')
+        self.assertEqual(event, 'event: update')
+        self.assertEqual(json.loads(data[len('data: '):]),
+            {'partition': 1, 'key': 'ObjectXX:uve1', 'type': 'type1',
+             'value': {'xx': 1}})
+
 class Mock_base(collections.Callable,collections.MutableMapping):
     def __init__(self, *args, **kwargs):
         self.store = dict()
@@ -156,6 +263,16 @@ class Mock_get_uve(Mock_base):
             return False, {}
         return False, self.store[key]
 
+class Mock_get_uves(Mock_get_uve):
+    def __init__(self, *args, **kwargs):
+        Mock_get_uve.__init__(self, *args, **kwargs)
+
+    def __call__(self, key_filters, flat=True):
+        uves = {}
+        for key, filters in key_filters.iteritems():
+            _, uves[key] = Mock_get_uve.__call__(self, key, flat, filters)
+        return False, uves
+
 class Mock_get_messages(Mock_base):
     def __init__(self, *args, **kwargs):
         Mock_base.__init__(self, *args, **kwargs)
@@ -171,6 +288,24 @@ class Mock_get_messages(Mock_base):
         else:
             return [None]
 
+MockExtension = namedtuple("MockExtension", ["name", "obj"])
+
+class MockAlarm(AlarmBase):
+    # Raised when any of the attributes it depends on is 1
+    def __init__(self, name, deps):
+        self.name = name
+        self.UVE_DEPENDENCIES = deps
+        self.calls = 0
+
+    def __call__(self, uve_key, uve_data):
+        self.calls += 1
+        err_list = []
+        for typ, attrs in (self.UVE_DEPENDENCIES or {}).iteritems():
+            for attr in attrs:
+                if uve_data.get(typ, {}).get(attr) == 1:
+                    err_list.append(("%s.%s != 1" % (typ, attr), "1"))
+        return self.name, AlarmBase.SYS_WARN, err_list
+
 # Tests for all AlarmGenerator code, using mocks for 
 # external interfaces for UVEServer, Kafka, libpartition
 # and Discovery
@@ -240,13 +375,13 @@ class TestAlarmGen(unittest.TestCase):
         return result
 
     @mock.patch.object(UVEServer, 'get_part')
-    @mock.patch.object(UVEServer, 'get_uve')
+    @mock.patch.object(UVEServer, 'get_uves')
     @mock.patch('opserver.partition_handler.SimpleConsumer', autospec=True)
     # Test partition Initialization, including boot-straping using UVEServer
     # Test partition shutdown as well
     def test_00_init(self,
             mock_SimpleConsumer,
-            mock_get_uve, mock_get_part):
+            mock_get_uves, mock_get_part):
 
         m_get_part = Mock_get_part() 
         m_get_part[(1,("127.0.0.1",0,0))] = "127.0.0.1:0", \
@@ -254,9 +389,9 @@ class TestAlarmGen(unittest.TestCase):
                 { "ObjectXX:uve1" : {"type1":{}}  }}
         mock_get_part.side_effect = m_get_part
 
-        m_get_uve = Mock_get_uve()
+        m_get_uve = Mock_get_uves()
         m_get_uve["ObjectXX:uve1"] = {"type1": {"xx": 0}}
-        mock_get_uve.side_effect = m_get_uve
+        mock_get_uves.side_effect = m_get_uve
 
         m_get_messages = Mock_get_messages()
         mock_SimpleConsumer.return_value.get_messages.side_effect = \
@@ -264,24 +399,24 @@ class TestAlarmGen(unittest.TestCase):
 
         self._ag.disc_cb_coll([{"ip-address":"127.0.0.1","pid":0}])
         self._ag.libpart_cb([1])
-        self.assertTrue(self.checker_dict([1, "ObjectXX", "uve1"], self._ag.ptab_info))
+        self.assertTrue(self.checker_dict([1, ("ObjectXX", "uve1")], self._ag.ptab_info))
         self.assertTrue(self.checker_exact(\
-            self._ag.ptab_info[1]["ObjectXX"]["uve1"].values(), {"type1" : {"xx": 0}}))
+            self._ag.ptab_info[1][("ObjectXX", "uve1")].values(), {"type1" : {"xx": 0}}))
 
         # Shutdown partition
         self._ag.libpart_cb([])
-        self.assertTrue(self.checker_dict([1, "ObjectXX", "uve1"],\
+        self.assertTrue(self.checker_dict([1, ("ObjectXX", "uve1")],\
             self._ag.ptab_info, False))
         
 
     @mock.patch.object(UVEServer, 'get_part')
-    @mock.patch.object(UVEServer, 'get_uve')
+    @mock.patch.object(UVEServer, 'get_uves')
     @mock.patch('opserver.partition_handler.SimpleConsumer', autospec=True)
     # Test initialization followed by read from Kafka
     # Also test for deletetion of a boot-straped UVE
     def test_01_rxmsg(self,
             mock_SimpleConsumer,
-            mock_get_uve, mock_get_part):
+            mock_get_uves, mock_get_part):
 
         m_get_part = Mock_get_part() 
         m_get_part[(1,("127.0.0.1",0,0))] = "127.0.0.1:0", \
@@ -290,9 +425,9 @@ class TestAlarmGen(unittest.TestCase):
         mock_get_part.side_effect = m_get_part
 
         # Boostraped UVE ObjectXX:uve1 is not present!
-        m_get_uve = Mock_get_uve()
+        m_get_uve = Mock_get_uves()
         m_get_uve["ObjectYY:uve2"] = {"type2": {"yy": 1}}
-        mock_get_uve.side_effect = m_get_uve
+        mock_get_uves.side_effect = m_get_uve
 
         m_get_messages = Mock_get_messages()
         m_get_messages["ObjectYY:uve2"] = OffsetAndMessage(offset=0,
@@ -305,19 +440,19 @@ class TestAlarmGen(unittest.TestCase):
 
         self._ag.disc_cb_coll([{"ip-address":"127.0.0.1","pid":0}])
         self._ag.libpart_cb([1])
-        self.assertTrue(self.checker_dict([1, "ObjectXX", "uve1"], self._ag.ptab_info, False))
-        self.assertTrue(self.checker_dict([1, "ObjectYY", "uve2"], self._ag.ptab_info))
+        self.assertTrue(self.checker_dict([1, ("ObjectXX", "uve1")], self._ag.ptab_info, False))
+        self.assertTrue(self.checker_dict([1, ("ObjectYY", "uve2")], self._ag.ptab_info))
         self.assertTrue(self.checker_exact(\
-            self._ag.ptab_info[1]["ObjectYY"]["uve2"].values(), {"type2" : {"yy": 1}}))
+            self._ag.ptab_info[1][("ObjectYY", "uve2")].values(), {"type2" : {"yy": 1}}))
 
     @mock.patch.object(UVEServer, 'get_part')
-    @mock.patch.object(UVEServer, 'get_uve')
+    @mock.patch.object(UVEServer, 'get_uves')
     @mock.patch('opserver.partition_handler.SimpleConsumer', autospec=True)
     # Test late bringup of collector
     # Also test collector shutdown
     def test_02_collectorha(self,
             mock_SimpleConsumer,
-            mock_get_uve, mock_get_part):
+            mock_get_uves, mock_get_part):
 
         m_get_part = Mock_get_part() 
         m_get_part[(1,("127.0.0.1",0,0))] = "127.0.0.1:0", \
@@ -328,11 +463,11 @@ class TestAlarmGen(unittest.TestCase):
                 { "ObjectZZ:uve3" : { "type3":{}}  }}
         mock_get_part.side_effect = m_get_part
 
-        m_get_uve = Mock_get_uve()
+        m_get_uve = Mock_get_uves()
         m_get_uve["ObjectXX:uve1"] = {"type1": {"xx": 0}}
         m_get_uve["ObjectYY:uve2"] = {"type2": {"yy": 1}}
         m_get_uve["ObjectZZ:uve3"] = {"type3": {"zz": 2}}
-        mock_get_uve.side_effect = m_get_uve
+        mock_get_uves.side_effect = m_get_uve
 
         # When this message is read, 127.0.0.5 will not be present
         m_get_messages = Mock_get_messages()
@@ -348,25 +483,102 @@ class TestAlarmGen(unittest.TestCase):
         self._ag.libpart_cb([1])
 
         # Now bringup collector 127.0.0.5
-        self.assertTrue(self.checker_dict([1, "ObjectZZ", "uve3"], self._ag.ptab_info, False))
+        self.assertTrue(self.checker_dict([1, ("ObjectZZ", "uve3")], self._ag.ptab_info, False))
         self._ag.disc_cb_coll([{"ip-address":"127.0.0.1","pid":0}, {"ip-address":"127.0.0.5","pid":0}])
-        self.assertTrue(self.checker_dict([1, "ObjectZZ", "uve3"], self._ag.ptab_info))
+        self.assertTrue(self.checker_dict([1, ("ObjectZZ", "uve3")], self._ag.ptab_info))
 
-        self.assertTrue(self.checker_dict([1, "ObjectYY", "uve2"], self._ag.ptab_info, False))
+        self.assertTrue(self.checker_dict([1, ("ObjectYY", "uve2")], self._ag.ptab_info, False))
         # Feed the message in again
         m_get_messages["ObjectYY:uve2"] = OffsetAndMessage(offset=0,
                     message=Message(magic=0, attributes=0, key='',
                     value=('{"message":"UVEUpdate","key":"ObjectYY:uve2",'
                            '"type":"type2","gen":"gen1","coll":'
                            '"127.0.0.5:0","value":{}}')))
-        self.assertTrue(self.checker_dict([1, "ObjectYY", "uve2"], self._ag.ptab_info))
+        self.assertTrue(self.checker_dict([1, ("ObjectYY", "uve2")], self._ag.ptab_info))
 
         
         # Withdraw collector 127.0.0.1
-        self.assertTrue(self.checker_dict([1, "ObjectXX", "uve1"], self._ag.ptab_info))
+        self.assertTrue(self.checker_dict([1, ("ObjectXX", "uve1")], self._ag.ptab_info))
         del m_get_uve["ObjectXX:uve1"]
         self._ag.disc_cb_coll([{"ip-address":"127.0.0.5","pid":0}])
-        self.assertTrue(self.checker_dict([1, "ObjectXX", "uve1"], self._ag.ptab_info, False))
+        self.assertTrue(self.checker_dict([1, ("ObjectXX", "uve1")], self._ag.ptab_info, False))
+
+    @mock.patch.object(UVEServer, 'get_uves')
+    # Test that only the alarms whose UVE dependencies have changed
+    # are evaluated again
+    def test_03_alarm_deps(self, mock_get_uves):
+        m_get_uve = Mock_get_uves()
+        m_get_uve["ObjectXX:uve1"] = {"type1": {"xx": 0, "yy": 0},
+                                      "type2": {"zz": 0}}
+        mock_get_uves.side_effect = m_get_uve
+
+        alarms = [MockAlarm("AlarmXX", {"type1": ["xx"]}),
+                  MockAlarm("AlarmYY", {"type1": ["yy"]}),
+                  MockAlarm("AlarmAny", None)]
+        self._ag.mgrs["ObjectXX"] = {"ObjectXX":
+            [MockExtension(alarm.name, alarm) for alarm in alarms]}
+        self._ag.tab_alarms["ObjectXX"] = {}
+
+        # All alarms are evaluated the first time
+        self._ag.handle_uve_notif(1, {"ObjectXX:uve1": None})
+        self.assertEqual([alarm.calls for alarm in alarms], [1, 1, 1])
+        self.assertFalse("ObjectXX:uve1" in self._ag.tab_alarms["ObjectXX"])
+
+        m_get_uve["ObjectXX:uve1"] = {"type1": {"xx": 1, "yy": 0},
+                                      "type2": {"zz": 0}}
+        self._ag.handle_uve_notif(1, {"ObjectXX:uve1": None})
+        self.assertEqual([alarm.calls for alarm in alarms], [2, 1, 2])
+        self.assertEqual(
+            self._ag.tab_alarms["ObjectXX"]["ObjectXX:uve1"].keys(),
+            ["AlarmXX"])
+        token = self._ag.tab_alarms["ObjectXX"]["ObjectXX:uve1"]\
+            ["AlarmXX"].token
+
+        # The alarm is not updated when only other structs change
+        m_get_uve["ObjectXX:uve1"] = {"type1": {"xx": 1, "yy": 0},
+                                      "type2": {"zz": 1}}
+        self._ag.handle_uve_notif(1, {"ObjectXX:uve1": {"type2": {}}})
+        self.assertEqual([alarm.calls for alarm in alarms], [2, 1, 3])
+        self.assertEqual(self._ag.tab_alarms["ObjectXX"]["ObjectXX:uve1"]\
+            ["AlarmXX"].token, token)
+
+        m_get_uve["ObjectXX:uve1"] = {"type1": {"xx": 0, "yy": 0},
+                                      "type2": {"zz": 1}}
+        self._ag.handle_uve_notif(1, {"ObjectXX:uve1": {"type1": {}}})
+        self.assertEqual([alarm.calls for alarm in alarms], [3, 1, 4])
+        self.assertFalse("ObjectXX:uve1" in self._ag.tab_alarms["ObjectXX"])
+
+    # Test that the rows of a partition are coalesced and written
+    # in a single transaction and publish message
+    def test_04_agg_uve_write(self):
+        redish = mock.MagicMock()
+        ppe = redish.pipeline.return_value
+        # The last struct of uve3 has been removed
+        ppe.execute.return_value = [1, 1, 1, 1, 1, 1, 1, 0, 1]
+        rows = [OutputRow(key="ObjectXX:uve1", typ="type1", val={"xx": 0}),
+                OutputRow(key="ObjectXX:uve1", typ="type1", val={"xx": 1}),
+                OutputRow(key="ObjectXX:uve2", typ=None, val=None),
+                OutputRow(key="ObjectXX:uve2", typ="type2", val={"yy": 0}),
+                OutputRow(key="ObjectXX:uve3", typ="type3", val=None)]
+        Controller.send_agg_uve(redish, "0", 1, 100, rows)
+
+        self.assertEqual(redish.pipeline.call_count, 1)
+        self.assertEqual(ppe.execute.call_count, 1)
+        self.assertEqual(ppe.hmset.call_args_list,
+            [mock.call("AGPARTVALUES:0:1:ObjectXX:uve1",
+                       {"type1": json.dumps({"xx": 1})}),
+             mock.call("AGPARTVALUES:0:1:ObjectXX:uve2",
+                       {"type2": json.dumps({"yy": 0})})])
+        ppe.delete.assert_called_once_with("AGPARTVALUES:0:1:ObjectXX:uve2")
+        ppe.hdel.assert_called_once_with("AGPARTVALUES:0:1:ObjectXX:uve3",
+                                         "type3")
+        ppe.publish.assert_called_once_with("AGPARTPUB:0:1", mock.ANY)
+        self.assertEqual(json.loads(ppe.publish.call_args[0][1]),
+            [{"key": "ObjectXX:uve1", "type": "type1"},
+             {"key": "ObjectXX:uve2", "type": None},
+             {"key": "ObjectXX:uve2", "type": "type2"},
+             {"key": "ObjectXX:uve3", "type": "type3"}])
+        redish.srem.assert_called_once_with("AGPARTKEYS:0:1", "ObjectXX:uve3")
 
 def _term_handler(*_):
     raise IntSignal()
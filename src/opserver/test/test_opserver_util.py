@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2015 Juniper Networks, Inc. All rights reserved.
+#
+
+#
+# OpServerUtilsTest
+#
+# Unit Tests for the decoding of query results in OpServerUtils
+#
+
+import json
+import unittest
+
+from opserver.opserver_util import OpServerUtils
+
+
+def split(doc, size):
+    return [doc[idx:idx + size] for idx in range(0, len(doc), size)]
+# end split
+
+
+class OpServerUtilsTest(unittest.TestCase):
+
+    # rows with strings that hold the delimiters of the result, escapes
+    # and multi-byte characters, nested values and numbers
+    ROWS = [{"id": idx,
+             "name": u"vn-%d ]},[{ \"q\" \\ é中" % idx,
+             "escaped": u"\t\n\u0000/" * (idx % 3),
+             "nested": [idx, {"none": None, "float": idx / 4.0}],
+             "flag": idx % 2 == 0}
+            for idx in range(50)] + [12345, "last", []]
+
+    def result_doc(self, rows):
+        # separators as the opserver writes them, the rows of each redis
+        # chunk on their own line
+        return '{"value": [\n' + \
+            ', '.join(json.dumps(row) for row in rows[:20]) + '\n, ' + \
+            ', '.join(json.dumps(row, ensure_ascii=False).encode('utf-8')
+                      for row in rows[20:]) + '\n]}'
+    # end result_doc
+
+    def test_chunk_sizes(self):
+        doc = self.result_doc(self.ROWS)
+        self.assertEqual(json.loads(doc)['value'], self.ROWS)
+        for size in range(1, 40) + [64, 1000, 4096, len(doc)]:
+            rows = list(OpServerUtils.iter_query_result(split(doc, size)))
+            self.assertEqual(rows, self.ROWS, 'chunk size %d' % size)
+    # end test_chunk_sizes
+
+    def test_split_everywhere(self):
+        # the document cut in two at every position, which also cuts
+        # inside each string, escape and multi-byte character
+        rows = self.ROWS[:3] + self.ROWS[-3:]
+        doc = self.result_doc(rows)
+        for pos in range(len(doc) + 1):
+            result = list(OpServerUtils.iter_query_result(
+                [doc[:pos], doc[pos:]]))
+            self.assertEqual(result, rows, 'split at %d' % pos)
+    # end test_split_everywhere
+
+    def test_empty(self):
+        for doc in ['{"value": []}', '{"value": [\n]}', '{"value":[ \n ] }']:
+            for size in [1, 2, len(doc)]:
+                self.assertEqual(
+                    list(OpServerUtils.iter_query_result(split(doc, size))),
+                    [])
+    # end test_empty
+
+    def test_truncated(self):
+        doc = self.result_doc(self.ROWS)
+        # cut before the row list, inside a row and before the end of the
+        # row list
+        for end in [0, 5, 10, doc.index('"id": 3'), doc.index('}, {') + 1,
+                    len(doc) - 3]:
+            for size in [1, 7, len(doc)]:
+                chunks = split(doc[:end], size)
+                self.assertRaises(ValueError, list,
+                                  OpServerUtils.iter_query_result(chunks))
+    # end test_truncated
+
+    def test_truncated_rows(self):
+        # the rows read before the stream ends are returned before the
+        # error
+        doc = '{"value": [{"a": 1}, {"b": 2}, {"c"'
+        result = OpServerUtils.iter_query_result(split(doc, 3))
+        self.assertEqual(result.next(), {"a": 1})
+        self.assertEqual(result.next(), {"b": 2})
+        self.assertRaises(ValueError, result.next)
+    # end test_truncated_rows
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, list, OpServerUtils.iter_query_result(
+            ['{"value": [{"a": 1}, {"b": x}]}']))
+    # end test_invalid
+
+
+if __name__ == '__main__':
+    unittest.main()
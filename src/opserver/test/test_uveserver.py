@@ -30,6 +30,46 @@ class RedisMock(object):
     pass
 
 
+class RedisUveMock(object):
+    # sets and hashes of UVEs, as the collector writes them
+
+    class Pipeline(object):
+        def __init__(self, redish):
+            self._redish = redish
+            self._cmds = []
+
+        def smembers(self, key):
+            self._cmds.append(lambda: self._redish.smembers(key))
+
+        def hgetall(self, key):
+            self._cmds.append(lambda: self._redish.hgetall(key))
+
+        def execute(self):
+            return [cmd() for cmd in self._cmds]
+
+    def __init__(self):
+        self._data = {}
+        self.executes = 0
+
+    def add_uve(self, table, name, source, typ, attrs):
+        key = table + ':' + name
+        origin = source + ':Compute:contrail-vrouter-agent:0:' + typ
+        self._data.setdefault('TABLE:' + table, set()).add(
+            key + ':' + source + ':Compute:contrail-vrouter-agent:0:' + typ)
+        self._data.setdefault('ORIGINS:' + key, set()).add(origin)
+        self._data['VALUES:' + key + ':' + origin] = attrs
+
+    def smembers(self, key):
+        return set(self._data.get(key, set()))
+
+    def hgetall(self, key):
+        return dict(self._data.get(key, {}))
+
+    def pipeline(self, transaction=True):
+        self.executes += 1
+        return RedisUveMock.Pipeline(self)
+
+
 def MakeBasic(typ, val, aggtype=None):
     item = {}
     item['@type'] = typ
@@ -418,6 +458,104 @@ class UVEServerTest(unittest.TestCase):
             "UVEVirtualNetwork"]["in_stats"]["sample"]
         self.assertEqual(in_stats, res['UVEVirtualNetwork']['in_stats'])
 
+    def test_multi_uve_get(self):
+        logging.info("*** Running test_multi_uve_get ***")
+
+        redis_insts = [RedisUveMock(), RedisUveMock()]
+        for idx in range(5):
+            for r_idx, redish in enumerate(redis_insts):
+                redish.add_uve('ObjectVNTable', 'abc-corp:vn-%d' % idx,
+                    '10.10.10.1%d' % r_idx, 'UVEVirtualNetwork',
+                    {'total_acl_rules': '<total_acl_rules type="i32">%d'
+                     '</total_acl_rules>' % (idx + r_idx)})
+        uve_server = UVEServer(None, logging.getLogger(__name__))
+        for r_idx, redish in enumerate(redis_insts):
+            uve_server._redis_uve_map[('10.10.10.1%d' % r_idx, 6381)] = redish
+
+        uve_server._MULTI_UVE_BATCH_SIZE = 2
+        uves = dict((uve['name'], uve['value']) for uve in
+                    uve_server.multi_uve_get('ObjectVNTable', True))
+        self.assertEqual(len(uves), 5)
+        # 3 batches, each a pipeline for ORIGINS and one for VALUES
+        for redish in redis_insts:
+            self.assertEqual(redish.executes, 6)
+        for idx in range(5):
+            name = 'abc-corp:vn-%d' % idx
+            _, uve = uve_server.get_uve('ObjectVNTable:' + name, True)
+            self.assertEqual(uves[name], uve)
+            self.assertEqual(len(uve['UVEVirtualNetwork']['total_acl_rules']),
+                             2)
+
+    def test_get_uves(self):
+        logging.info("*** Running test_get_uves ***")
+
+        redis_insts = [RedisUveMock(), RedisUveMock()]
+        for idx in range(3):
+            for r_idx, redish in enumerate(redis_insts):
+                redish.add_uve('ObjectVRouter', 'vr-%d' % idx,
+                    '10.10.10.1%d' % r_idx, 'VrouterAgent',
+                    {'total_acl_rules': '<total_acl_rules type="i32">%d'
+                     '</total_acl_rules>' % (idx + r_idx)})
+                redish.add_uve('ObjectVRouter', 'vr-%d' % idx,
+                    '10.10.10.1%d' % r_idx, 'NodeStatus',
+                    {'status': '<status type="string">Up</status>'})
+        uve_server = UVEServer(None, logging.getLogger(__name__))
+        for r_idx, redish in enumerate(redis_insts):
+            uve_server._redis_uve_map[('10.10.10.1%d' % r_idx, 6381)] = redish
+
+        key_filters = {
+            'ObjectVRouter:vr-0': {},
+            'ObjectVRouter:vr-1': {'cfilt': {'NodeStatus': set()}},
+            'ObjectVRouter:vr-2': None,
+            'ObjectVRouter:vr-3': {}}
+        failures, uves = uve_server.get_uves(key_filters)
+        self.assertFalse(failures)
+        # one pipeline for ORIGINS and one for VALUES
+        for redish in redis_insts:
+            self.assertEqual(redish.executes, 2)
+        for key, filters in key_filters.iteritems():
+            _, uve = uve_server.get_uve(key, True, filters)
+            self.assertEqual(uves[key], uve)
+        self.assertEqual(uves['ObjectVRouter:vr-1'].keys(), ['NodeStatus'])
+        self.assertEqual(uves['ObjectVRouter:vr-3'], {})
+
+    def test_uve_value_cache(self):
+        logging.info("*** Running test_uve_value_cache ***")
+
+        redish = RedisUveMock()
+        redish.add_uve('ObjectVNTable', 'abc-corp:vn-0', '10.10.10.10',
+            'UVEVirtualNetwork',
+            {'total_acl_rules': '<total_acl_rules type="i32">3'
+             '</total_acl_rules>',
+             'connected_networks': '<connected_networks type="list">'
+             '<list type="string" size="1"><element>abc-corp:vn-1</element>'
+             '</list></connected_networks>'})
+        uve_server = UVEServer(None, logging.getLogger(__name__))
+        uve_server._redis_uve_map[('10.10.10.10', 6381)] = redish
+        name = 'ObjectVNTable:abc-corp:vn-0'
+
+        _, uve = uve_server.get_uve(name, True)
+        self.assertEqual(uve['UVEVirtualNetwork']['total_acl_rules'], 3)
+        self.assertEqual(uve['UVEVirtualNetwork']['connected_networks'],
+                         ['abc-corp:vn-1'])
+        _, cached_uve = uve_server.get_uve(name, True)
+        self.assertEqual(uve, cached_uve)
+        # stands in for the UVEValueCacheStats sandesh struct
+        stats = type('CacheStats', (object,), {})()
+        uve_server.fill_value_cache_stats(stats)
+        self.assertEqual((stats.entries, stats.hits, stats.misses), (2, 2, 2))
+        self.assertEqual((stats.flat_hits, stats.flat_misses), (2, 2))
+
+        # a new value in redis is parsed again
+        redish.add_uve('ObjectVNTable', 'abc-corp:vn-0', '10.10.10.10',
+            'UVEVirtualNetwork',
+            {'total_acl_rules': '<total_acl_rules type="i32">4'
+             '</total_acl_rules>'})
+        _, uve = uve_server.get_uve(name, True)
+        self.assertEqual(uve['UVEVirtualNetwork'], {'total_acl_rules': 4})
+        uve_server.fill_value_cache_stats(stats)
+        self.assertEqual((stats.hits, stats.misses), (2, 3))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -15,6 +15,8 @@ import xmltodict
 import redis
 import datetime
 import sys
+import time
+from collections import OrderedDict
 from opserver_util import OpServerUtils
 import re
 from gevent.coros import BoundedSemaphore
@@ -27,6 +29,12 @@ import traceback
 
 class UVEServer(object):
 
+    # number of UVEs read together by multi_uve_get
+    _MULTI_UVE_BATCH_SIZE = 1000
+    # bounds of the cache of parsed UVE attribute values
+    _VALUE_CACHE_SIZE = 50000
+    _VALUE_CACHE_AGE = 300
+
     def __init__(self, redis_uve_server, logger, redis_password=None, uvedbcache=None):
         self._local_redis_uve = redis_uve_server
         self._redis_uve_map = {}
@@ -37,6 +45,8 @@ class UVEServer(object):
         self._uve_reverse_map = {}
         for h,m in UVE_MAP.iteritems():
             self._uve_reverse_map[m] = h
+        self._value_cache = UVEValueCache(self._VALUE_CACHE_SIZE,
+                                          self._VALUE_CACHE_AGE)
 
     #end __init__
     def redis_instances(self):
@@ -79,6 +89,10 @@ class UVEServer(object):
             redis_uve_info.status = 'Connected'
     #end fill_redis_uve_info
 
+    def fill_value_cache_stats(self, stats):
+        self._value_cache.fill_stats(stats)
+    # end fill_value_cache_stats
+
     @staticmethod
     def merge_previous(state, key, typ, attr, prevdict):
         print "%s New    val is %s" % (attr, prevdict)
@@ -215,13 +229,98 @@ class UVEServer(object):
 	    ConnectionState.update(ConnectionType.REDIS_UVE,
 		r_ip + ":" + str(r_port), ConnectionStatus.DOWN)
  
+    def _uve_origins(self, origsets, filters):
+        # origins (<source>:<node-type>:<module>:<instance-id>:<type>)
+        # from the ORIGINS sets of a UVE that pass the filters
+        sfilter = filters.get('sfilt')
+        mfilter = filters.get('mfilt')
+        tfilter = filters.get('cfilt')
+        origins = set()
+        for origset in origsets:
+            for smt in origset:
+                tt = smt.rsplit(":",1)[1]
+                sm = smt.rsplit(":",1)[0]
+                source = sm.split(":", 1)[0]
+                mdule = sm.split(":", 1)[1]
+                if tfilter is not None:
+                    if tt not in tfilter:
+                        continue
+                if sfilter is not None:
+                    if sfilter != source:
+                        continue
+                if mfilter is not None:
+                    if mfilter != mdule:
+                        continue
+                origins.add(smt)
+        return origins
+    # end _uve_origins
+
+    def _uve_add_values(self, state, key, origs, odict, filters):
+        # add the attributes of one origin of a UVE read from its VALUES
+        # hash to state[key][type][attr][source]
+        tfilter = filters.get('cfilt')
+        ackfilter = filters.get('ackfilt')
+        state.setdefault(key, {})
+
+        values_key = "VALUES:" + key + ":" + origs
+        info = origs.rsplit(":", 1)
+        dsource = info[0]
+        typ = info[1]
+
+        afilter_list = set()
+        if tfilter is not None:
+            afilter_list = tfilter[typ]
+
+        for attr, value in odict.iteritems():
+            if len(afilter_list):
+                if attr not in afilter_list:
+                    continue
+
+            if typ not in state[key]:
+                state[key][typ] = {}
+
+            if value[0] == '<':
+                # shared with the cache, must not be modified
+                attrval = self._value_cache.get(values_key, attr, value)
+                if attrval['@type'] == 'list':
+                    sname = ParallelAggregator.get_list_name(attrval)
+                    if attrval['list']['@size'] == '0':
+                        continue
+                    if typ == 'UVEAlarms' and attr == 'alarms' and \
+                        ackfilter is not None:
+                        alarms = []
+                        for alarm in attrval['list'][sname]:
+                            ack_attr = alarm.get('ack')
+                            if ack_attr:
+                                ack = ack_attr['#text']
+                            else:
+                                ack = 'false'
+                            if ack == ackfilter:
+                                alarms.append(alarm)
+                        if not len(alarms):
+                            continue
+                        attrval = dict(attrval)
+                        attrval['list'] = dict(attrval['list'])
+                        attrval['list'][sname] = alarms
+                        attrval['list']['@size'] = str(len(alarms))
+            else:
+                continue
+
+            # print "Attr %s Value %s" % (attr, attrval)
+            if attr not in state[key][typ]:
+                state[key][typ][attr] = {}
+            if dsource in state[key][typ][attr]:
+                print "Found Dup %s:%s:%s:%s = %s" % \
+                    (key, typ, attr, dsource, state[
+                    key][typ][attr][dsource])
+            state[key][typ][attr][dsource] = attrval
+    # end _uve_add_values
+
     def get_uve(self, key, flat, filters=None, is_alarm=False, base_url=None):
 
         filters = filters or {}
         sfilter = filters.get('sfilt')
         mfilter = filters.get('mfilt')
-        tfilter = filters.get('cfilt')
-        ackfilter = filters.get('ackfilt')
 
         if flat and not sfilter and not mfilter and self._uvedbcache:
             return self._uvedbcache.get_uve(key, filters, is_alarm)
@@ -241,92 +340,18 @@ class UVEServer(object):
                 if not is_alarm:
                     ppe.smembers("ORIGINS:" + key)
                 pperes = ppe.execute()
-                origins = set()
-                for origset in pperes:
-                    for smt in origset:
-                        tt = smt.rsplit(":",1)[1]
-                        sm = smt.rsplit(":",1)[0]
-                        source = sm.split(":", 1)[0]
-                        mdule = sm.split(":", 1)[1]
-                        if tfilter is not None:
-                            if tt not in tfilter:
-                                continue
-                        if sfilter is not None:
-                            if sfilter != source:
-                                continue
-                        if mfilter is not None:
-                            if mfilter != mdule:
-                                continue
-                        origins.add(smt)
+                origins = self._uve_origins(pperes, filters)
 
                 ppeval = redish.pipeline()
                 for origs in origins:
                     ppeval.hgetall("VALUES:" + key + ":" + origs)
                 odictlist = ppeval.execute()
 
-                idx = 0    
-                for origs in origins:
-
-                    odict = odictlist[idx]
-                    idx = idx + 1
-
-                    info = origs.rsplit(":", 1)
-                    dsource = info[0]
-                    typ = info[1]
-
-                    afilter_list = set()
-                    if tfilter is not None:
-                        afilter_list = tfilter[typ]
-
-                    for attr, value in odict.iteritems():
-                        if len(afilter_list):
-                            if attr not in afilter_list:
-                                continue
-
-                        if typ not in state[key]:
-                            state[key][typ] = {}
-
-                        if value[0] == '<':
-                            snhdict = xmltodict.parse(value)
-                            if snhdict[attr]['@type'] == 'list':
-                                sname = ParallelAggregator.get_list_name(
-                                        snhdict[attr])
-                                if snhdict[attr]['list']['@size'] == '0':
-                                    continue
-                                elif snhdict[attr]['list']['@size'] == '1':
-                                    if not isinstance(
-                                        snhdict[attr]['list'][sname], list):
-                                        snhdict[attr]['list'][sname] = [
-                                            snhdict[attr]['list'][sname]]
-                                if typ == 'UVEAlarms' and attr == 'alarms' and \
-                                    ackfilter is not None:
-                                    alarms = []
-                                    for alarm in snhdict[attr]['list'][sname]:
-                                        ack_attr = alarm.get('ack')
-                                        if ack_attr:
-                                            ack = ack_attr['#text']
-                                        else:
-                                            ack = 'false'
-                                        if ack == ackfilter:
-                                            alarms.append(alarm)
-                                    if not len(alarms):
-                                        continue
-                                    snhdict[attr]['list'][sname] = alarms
-                                    snhdict[attr]['list']['@size'] = \
-                                        str(len(alarms))
-                        else:
-                            continue
-
-                        # print "Attr %s Value %s" % (attr, snhdict)
-                        if attr not in state[key][typ]:
-                            state[key][typ][attr] = {}
-                        if dsource in state[key][typ][attr]:
-                            print "Found Dup %s:%s:%s:%s:%s = %s" % \
-                                (key, typ, attr, source, mdule, state[
-                                key][typ][attr][dsource])
-                        state[key][typ][attr][dsource] = snhdict[attr]
+                for origs, odict in zip(origins, odictlist):
+                    self._uve_add_values(state, key, origs, odict, filters)
 
-                pa = ParallelAggregator(state, self._uve_reverse_map)
+                pa = ParallelAggregator(state, self._uve_reverse_map,
+                                        self._value_cache.flatten)
                 rsp = pa.aggregate(key, flat, base_url)
             except Exception as e:
                 self._logger.error("redis-uve failed %s for : %s tb %s" \
@@ -350,20 +375,154 @@ class UVEServer(object):
         return re.compile(regex)
     # end get_uve_regex
 
+    def _multi_uve_fetch(self, r_inst, keys, filters, is_alarm,
+                         key_filters=None):
+        # state of many UVEs from one redis instance: ORIGINS sets of all
+        # keys in one pipeline, then their VALUES hashes in another.
+        # key_filters, if given, has the filters of each key
+        try:
+            redish = self._redis_inst_get(r_inst)
+            nsets = 1 if is_alarm else 2
+            ppe = redish.pipeline(transaction=False)
+            for key in keys:
+                ppe.smembers("ALARM_ORIGINS:" + key)
+                if not is_alarm:
+                    ppe.smembers("ORIGINS:" + key)
+            pperes = ppe.execute()
+
+            key_origins = []
+            ppeval = redish.pipeline(transaction=False)
+            for idx, key in enumerate(keys):
+                if key_filters is not None:
+                    filters = key_filters[key]
+                origins = self._uve_origins(
+                    pperes[idx * nsets:(idx + 1) * nsets], filters)
+                for origs in origins:
+                    ppeval.hgetall("VALUES:" + key + ":" + origs)
+                    key_origins.append((key, origs, filters))
+            odictlist = ppeval.execute()
+
+            state = {}
+            for (key, origs, filters), odict in zip(key_origins, odictlist):
+                self._uve_add_values(state, key, origs, odict, filters)
+        except Exception as e:
+            self._logger.error("multi_uve_get failed %s for : %s tb %s" \
+                               % (str(e), str(r_inst), traceback.format_exc()))
+            self._redis_inst_down(r_inst)
+            return None
+        else:
+            self._redis_inst_up(r_inst, redish)
+            return state
+    # end _multi_uve_fetch
+
+    def _multi_uve_spawn(self, keys, filters, is_alarm, key_filters=None):
+        return [gevent.spawn(self._multi_uve_fetch, r_inst, keys, filters,
+                             is_alarm, key_filters)
+                for r_inst in self._redis_uve_map.keys()]
+    # end _multi_uve_spawn
+
+    def _multi_uve_join(self, fetches):
+        # merge the state from each redis instance in order, as get_uve
+        state = {}
+        gevent.joinall(fetches)
+        for fetch in fetches:
+            if not fetch.successful() or fetch.value is None:
+                continue
+            for key, types in fetch.value.iteritems():
+                kstate = state.setdefault(key, {})
+                for typ, attrs in types.iteritems():
+                    tstate = kstate.setdefault(typ, {})
+                    for attr, sources in attrs.iteritems():
+                        tstate.setdefault(attr, {}).update(sources)
+        return state
+    # end _multi_uve_join
+
     def multi_uve_get(self, table, flat, filters=None, is_alarm=False, base_url=None):
         # get_uve_list cannot handle attribute names very efficiently,
         # so we don't pass them here
         uve_list = self.get_uve_list(table, filters, False, is_alarm)
-        for uve_name in uve_list:
-            _,uve_val = self.get_uve(
-                table + ':' + uve_name, flat, filters, is_alarm, base_url)
-            if uve_val == {}:
-                continue
-            else:
-                uve = {'name': uve_name, 'value': uve_val}
-                yield uve
+        filters = filters or {}
+        if flat and not filters.get('sfilt') and not filters.get('mfilt') \
+                and self._uvedbcache:
+            # served from cache without going to redis
+            for uve_name in uve_list:
+                _,uve_val = self.get_uve(
+                    table + ':' + uve_name, flat, filters, is_alarm, base_url)
+                if uve_val == {}:
+                    continue
+                else:
+                    uve = {'name': uve_name, 'value': uve_val}
+                    yield uve
+            return
+
+        # Fetch UVEs in batches from all redis instances in parallel.
+        # While a batch is aggregated and returned, the next one is
+        # being fetched.
+        uve_list = list(uve_list)
+        batches = [uve_list[idx:idx + self._MULTI_UVE_BATCH_SIZE]
+                   for idx in range(0, len(uve_list),
+                                    self._MULTI_UVE_BATCH_SIZE)]
+        fetches = None
+        for idx, uve_names in enumerate(batches):
+            if fetches is None:
+                fetches = self._multi_uve_spawn(
+                    [table + ':' + name for name in uve_names],
+                    filters, is_alarm)
+            state = self._multi_uve_join(fetches)
+            fetches = None
+            if idx + 1 < len(batches):
+                fetches = self._multi_uve_spawn(
+                    [table + ':' + name for name in batches[idx + 1]],
+                    filters, is_alarm)
+            pa = ParallelAggregator(state, self._uve_reverse_map,
+                                    self._value_cache.flatten)
+            for uve_name in uve_names:
+                uve_val = pa.aggregate(table + ':' + uve_name, flat, base_url)
+                if uve_val == {}:
+                    continue
+                else:
+                    uve = {'name': uve_name, 'value': uve_val}
+                    yield uve
     # end multi_uve_get
 
+    def get_uves(self, key_filters, flat=True):
+        """
+        Read many UVEs, each with its own filters, in pipelined batches
+        from all redis instances in parallel.
+        Args:
+            key_filters : dict of UVE key (<Table>:<Name>) to the filters
+                          of that UVE, as for get_uve
+        Returns:
+            failures, and a dict of UVE key to the UVE contents, as
+            returned by get_uve
+        """
+        if flat and self._uvedbcache:
+            failures = False
+            uves = {}
+            for key, filters in key_filters.iteritems():
+                fail, uves[key] = self.get_uve(key, flat, filters)
+                failures = failures or fail
+            return failures, uves
+
+        key_filters = dict((key, filters or {}) for key, filters in \
+                           key_filters.iteritems())
+        keys = key_filters.keys()
+        failures = False
+        uves = {}
+        for idx in range(0, len(keys), self._MULTI_UVE_BATCH_SIZE):
+            batch = keys[idx:idx + self._MULTI_UVE_BATCH_SIZE]
+            fetches = self._multi_uve_spawn(batch, None, False, key_filters)
+            state = self._multi_uve_join(fetches)
+            for fetch in fetches:
+                if not fetch.successful() or fetch.value is None:
+                    failures = True
+            pa = ParallelAggregator(state, self._uve_reverse_map,
+                                    self._value_cache.flatten)
+            for key in batch:
+                uves[key] = pa.aggregate(key, flat)
+        return failures, uves
+    # end get_uves
+
     def get_uve_list(self, table, filters=None, parse_afilter=False,
                      is_alarm=False):
         filters = filters or {}
@@ -431,11 +590,107 @@ class UVEServer(object):
 # end UVEServer
 
 
+class UVEValueCache(object):
+    """
+    Parsed sandesh XML of UVE attribute values read from redis, by
+    VALUES key and attribute. An entry is used while the raw value in
+    redis is the same and it is not older than max_age seconds; least
+    recently used entries are evicted beyond max_entries. The flattened
+    form is kept with the parsed one once asked for.
+    Values returned are shared and must not be modified.
+    """
+
+    def __init__(self, max_entries, max_age):
+        self._max_entries = max_entries
+        self._max_age = max_age
+        # (values key, attr) -> [raw value, parsed, flattened, time]
+        self._entries = OrderedDict()
+        # id(parsed) -> entry, to find the flattened form
+        self._by_parsed = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flat_hits = 0
+        self.flat_misses = 0
+    # end __init__
+
+    @staticmethod
+    def parse(attr, value):
+        attrval = xmltodict.parse(value)[attr]
+        if attrval['@type'] == 'list':
+            sname = ParallelAggregator.get_list_name(attrval)
+            if attrval['list']['@size'] == '1':
+                if not isinstance(attrval['list'][sname], list):
+                    attrval['list'][sname] = [attrval['list'][sname]]
+        return attrval
+    # end parse
+
+    def _remove(self, ckey):
+        entry = self._entries.pop(ckey)
+        del self._by_parsed[id(entry[1])]
+    # end _remove
+
+    def get(self, values_key, attr, value):
+        ckey = (values_key, attr)
+        now = time.time()
+        entry = self._entries.get(ckey)
+        if entry is not None:
+            if entry[0] == value and now - entry[3] <= self._max_age:
+                self.hits += 1
+                # most recently used at the end
+                del self._entries[ckey]
+                self._entries[ckey] = entry
+                return entry[1]
+            self._remove(ckey)
+
+        self.misses += 1
+        attrval = UVEValueCache.parse(attr, value)
+        if self._max_entries <= 0:
+            return attrval
+        entry = [value, attrval, None, now]
+        self._entries[ckey] = entry
+        self._by_parsed[id(attrval)] = entry
+        while len(self._entries) > self._max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        return attrval
+    # end get
+
+    def flatten(self, attrval):
+        entry = self._by_parsed.get(id(attrval))
+        if entry is None or entry[1] is not attrval:
+            return OpServerUtils.uve_attr_flatten(attrval)
+        if entry[2] is None:
+            self.flat_misses += 1
+            entry[2] = OpServerUtils.uve_attr_flatten(attrval)
+        else:
+            self.flat_hits += 1
+        return entry[2]
+    # end flatten
+
+    def fill_stats(self, stats):
+        stats.entries = len(self._entries)
+        stats.max_entries = self._max_entries
+        stats.max_age = self._max_age
+        stats.hits = self.hits
+        stats.misses = self.misses
+        stats.evictions = self.evictions
+        lookups = self.hits + self.misses
+        stats.hit_rate = float(self.hits) / lookups if lookups else 0.0
+        stats.flat_hits = self.flat_hits
+        stats.flat_misses = self.flat_misses
+    # end fill_stats
+
+# end UVEValueCache
+
+
 class ParallelAggregator:
 
-    def __init__(self, state, rev_map = {}):
+    def __init__(self, state, rev_map = {}, flatten=None):
         self._state = state
         self._rev_map = rev_map
+        # flattens the value of an attribute from one source
+        self._flatten = flatten or OpServerUtils.uve_attr_flatten
 
     def _default_agg(self, oattr):
         itemset = set()
@@ -667,15 +922,13 @@ class ParallelAggregator:
                         if flat:
                             if (len(default_res) == 1):
                                 result[typ][objattr] =\
-                                    OpServerUtils.uve_attr_flatten(
-                                        default_res[0][0])
+                                    self._flatten(default_res[0][0])
                             else:
                                 nres = []
                                 for idx in range(len(default_res)):
                                     nres.append(default_res[idx])
                                     nres[idx][0] =\
-                                        OpServerUtils.uve_attr_flatten(
-                                            default_res[idx][0])
+                                        self._flatten(default_res[idx][0])
                                 result[typ][objattr] = nres
                         else:
                             result[typ][objattr] = default_res
@@ -514,6 +514,10 @@ public:
                 } else {
                     RedisAsyncConnection * rac = conns_[ret.inp.cnum].get();
                     string key = "REPLY:" + ret.inp.qp.qid;
+                    // The final status is in the reply list now; wake up
+                    // any opserver waiting for the query to finish
+                    RedisAsyncArgCommand(rac, NULL,
+                        list_of(string("PUBLISH"))(key)("done"));
                     RedisAsyncArgCommand(rac, NULL,
                         list_of(string("EXPIRE"))(key)("300"));
 
@@ -682,7 +686,10 @@ public:
 
         redisReply * reply = (redisReply *) redisCommand(c, "RPUSH %s %s",
             key.c_str(), stat);
-        
+        freeReplyObject(reply);
+
+        reply = (redisReply *) redisCommand(c, "PUBLISH %s %s",
+            key.c_str(), "done");
         freeReplyObject(reply);
         redisFree(c);
     }